@@ -0,0 +1,65 @@
+"""
+Measures how long it takes to build and zip bundles of synthetic nodes. Each
+board has 50 cards and each card links to the card after it, so zip() has
+card-to-card links to resolve. Then it builds the same bundle again to see how
+long an incremental bundle takes to zip when nothing changed.
+
+  python -m benchmarks.bundle [number of nodes...]
+"""
+import sys
+import time
+import shutil
+import tempfile
+
+import guru
+
+CARDS_PER_BOARD = 50
+
+
+def build(bundle, count):
+  for i in range(count):
+    board_index = i // CARDS_PER_BOARD
+    board = bundle.node(id="board%s" % board_index, title="Board %s" % board_index)
+    card = bundle.node(
+      id="card%s" % i,
+      url="https://www.example.com/cards/%s" % i,
+      title="Card %s" % i,
+      content='<p>This is card %s.</p><p><a href="https://www.example.com/cards/%s">next card</a></p>' % (i, i + 1),
+      clean_html=False
+    )
+    board.add_child(card)
+
+    # nodes are often looked up again, e.g. when a crawler finds a link to a page it's already seen.
+    bundle.node(id="card%s" % (i // 2))
+
+
+def run(count):
+  folder = tempfile.mkdtemp() + "/"
+  g = guru.Guru("user@example.com", "abcd1234", silent=True)
+  bundle = g.bundle("benchmark", folder=folder, incremental=True)
+
+  start = time.time()
+  build(bundle, count)
+  built = time.time()
+  bundle.zip()
+  zipped = time.time()
+
+  # building the same bundle again, nothing changed so zip() can skip most of its work.
+  bundle = g.bundle("benchmark", folder=folder, incremental=True)
+  build(bundle, count)
+  rezip_start = time.time()
+  bundle.zip()
+  rezipped = time.time()
+
+  print("%8d nodes: build %7.2fs, zip %7.2fs, unchanged zip %7.2fs" % (
+    len(bundle.nodes), built - start, zipped - built, rezipped - rezip_start))
+  shutil.rmtree(folder)
+
+
+def main(counts):
+  for count in counts:
+    run(count)
+
+
+if __name__ == "__main__":
+  main([int(c) for c in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,65 @@
+"""
+Measures how long it takes to parse, serialize, and clean up a card's html with
+each parser that's installed. The card has headings, paragraphs, lists, a table,
+images, and links, and the number of sections sets how big it is.
+
+  python -m benchmarks.html_parsers [number of sections...]
+"""
+import sys
+import timeit
+
+from guru.bundle import clean_up_html
+from guru.util import parse_html, get_html_parser, HTML_PARSERS
+
+ROUNDS = 10
+
+SECTION = """<h2 id="section-%(i)s" class="heading">Section %(i)s</h2>
+<p style="color: #333; margin: 10px">This is <span>section %(i)s</span> with <b>bold</b>, <i>italic</i>,
+and <a href="https://www.example.com/pages/%(i)s" data-track="1">a link</a>.</p>
+<ul><li>First item</li><li>Second item<ul><li>Nested item</li></ul></li></ul>
+<table class="ghq-table"><tr><td colspan="2">Cell</td></tr><tr><td>A</td><td>B</td></tr></table>
+<p><img src="https://www.example.com/images/%(i)s.png" alt="image %(i)s" width="200"/></p>
+"""
+
+
+def make_card(sections):
+  return "".join(SECTION % {"i": i} for i in range(sections))
+
+
+def available_parsers():
+  parsers = []
+  for parser in HTML_PARSERS:
+    try:
+      parse_html("<p>test</p>", parser)
+      parsers.append(parser)
+    except Exception:
+      print("%s isn't installed, skipping it" % parser)
+  return parsers
+
+
+def measure(func):
+  # timeit turns off garbage collection while it runs, otherwise the big trees
+  # from earlier rounds make the later ones look slower than they are.
+  return timeit.timeit(func, number=ROUNDS) / ROUNDS * 1000
+
+
+def run(sections, parsers):
+  html = make_card(sections)
+  for parser in parsers:
+    doc = parse_html(html, parser)
+    parse_time = measure(lambda: parse_html(html, parser))
+    serialize_time = measure(lambda: str(doc))
+    clean_time = measure(lambda: clean_up_html(html, parser))
+    print("%6d bytes, %-11s parse %7.2fms, serialize %7.2fms, clean_up_html %7.2fms" % (
+      len(html), parser, parse_time, serialize_time, clean_time))
+
+
+def main(counts):
+  parsers = available_parsers()
+  print("'auto' uses %s" % get_html_parser("auto"))
+  for count in counts:
+    run(count, parsers)
+
+
+if __name__ == "__main__":
+  main([int(c) for c in sys.argv[1:]] or [5, 50, 500])
@@ -0,0 +1,70 @@
+"""
+Measures how many API calls per second the SDK can make against a local
+stub server, comparing a new connection per call (how the Guru object used
+to make calls) with the Guru object's pooled, keep-alive session.
+
+  python -m benchmarks.transport [number of calls]
+"""
+import sys
+import json
+import time
+import threading
+import requests
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import guru
+
+
+class StubHandler(BaseHTTPRequestHandler):
+  # HTTP/1.1 lets clients keep the connection open between requests. headers and
+  # body are written separately so we turn off nagle's algorithm, otherwise kept-alive
+  # connections stall waiting on delayed ACKs.
+  protocol_version = "HTTP/1.1"
+  disable_nagle_algorithm = True
+
+  def do_GET(self):
+    body = json.dumps([{"id": "1111", "name": "General"}]).encode("utf-8")
+    self.send_response(200)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, *args):
+    pass
+
+
+def start_server():
+  server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+  thread = threading.Thread(target=server.serve_forever, daemon=True)
+  thread.start()
+  return server
+
+
+def run(label, func, count):
+  start = time.time()
+  for i in range(count):
+    func()
+  elapsed = time.time() - start
+  print("%-28s %6d calls in %6.2fs = %8.1f calls/second" % (label, count, elapsed, count / elapsed))
+
+
+def main(count=2000):
+  server = start_server()
+  base_url = "http://127.0.0.1:%s/api/v1" % server.server_address[1]
+
+  g = guru.Guru("user@example.com", "abcd1234", silent=True)
+  g.base_url = base_url
+  url = "%s/collections" % base_url
+
+  # this is how every call used to be made: a new connection each time.
+  run("new connection per call", lambda: requests.get(url, auth=("user@example.com", "abcd1234")).json(), count)
+  run("pooled guru session", lambda: g.get_collections(), count)
+
+  g.close()
+  server.shutdown()
+
+
+if __name__ == "__main__":
+  main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -1,5 +1,6 @@
 from guru.core import (
     Guru,
+    PaginationError,
     # collection colors:
     MAROON,
     RED,
@@ -23,6 +24,44 @@ from guru.core import (
     UNVERIFIED,
 )
 
+from guru.batch import (
+    Batch,
+    BatchResult
+)
+
+from guru.errors import (
+    GuruError
+)
+
+from guru.async_core import (
+    AsyncGuru
+)
+
+from guru.retry import (
+    RetryPolicy,
+    RateLimiter
+)
+
+from guru.cache import (
+    ResponseCache,
+    SqliteResponseCache,
+    CachedResponse
+)
+
+from guru.resource_store import (
+    ResourceStore
+)
+
+from guru.upload import (
+    UploadProgress
+)
+
+from guru.metadata_store import (
+    MetadataStore,
+    JsonMetadataStore,
+    SqliteMetadataStore
+)
+
 from guru.publish import (
     Publisher
 )
@@ -54,5 +93,7 @@ from guru.util import (
     format_timestamp,
     compare_datetime_string,
     save_json,
-    load_json
+    load_json,
+    parse_html,
+    HTML_PARSERS
 )
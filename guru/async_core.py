@@ -0,0 +1,130 @@
+import asyncio
+import inspect
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
+
+from guru.core import Guru
+
+# how many calls can be in flight at once by default.
+DEFAULT_CONCURRENCY = 50
+
+
+class AsyncGuru:
+  """
+  The AsyncGuru object lets you call the same methods as the Guru object from
+  asyncio code. Each method returns a coroutine so you can make lots of calls at once:
+
+  ```
+  import asyncio
+  import guru
+
+  async def main(slugs):
+    async with guru.AsyncGuru(concurrency=100) as g:
+      cards = await asyncio.gather(*[g.get_card(slug) for slug in slugs])
+
+      # the iter_* methods become async generators.
+      async for card in g.iter_cards(collection="Engineering"):
+        print(card.title)
+
+  asyncio.run(main(["Tbbqo5pc", "iMRxaK8c"]))
+  ```
+
+  This wraps a regular Guru object, so URLs are built and responses are turned into
+  Card, Folder, etc. objects the same way, and calls share its connection pool, retry
+  policy, rate limiter, and response cache. Parameters other than `concurrency` are
+  passed to the Guru constructor, so `dry_run=True` works the same way it does there.
+  You can also pass an existing Guru object as `guru`.
+
+  `concurrency` is the number of calls that can be in flight at once. The objects you
+  get back are the regular ones, so calling a method like `card.save()` is blocking.
+  """
+
+  def __init__(self, username="", api_token="", concurrency=DEFAULT_CONCURRENCY, guru=None, **kwargs):
+    # we need a connection for every call that's in flight.
+    kwargs.setdefault("pool_size", concurrency)
+
+    self.guru = guru or Guru(username, api_token, **kwargs)
+    self.concurrency = concurrency
+
+    # if you passed in a Guru object you might still be using it, so we only close ours.
+    self.__owns_guru = guru is None
+    self.__executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="guru")
+    # the semaphore is made in the event loop that uses it, see __get_semaphore().
+    self.__semaphore = None
+    self.__semaphore_loop = None
+
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, *args):
+    # waiting for calls to finish is blocking so we don't do it on the event loop's thread.
+    await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+  def close(self):
+    """
+    Shuts down the threads we use to make calls and closes the Guru object's connections,
+    unless you passed in the Guru object.
+    """
+    self.__executor.shutdown(wait=True)
+    if self.__owns_guru:
+      self.guru.close()
+
+  def __getattr__(self, name):
+    value = getattr(self.guru, name)
+    if name.startswith("_") or not callable(value):
+      return value
+
+    if inspect.isgeneratorfunction(value):
+      @functools.wraps(value)
+      def generator(*args, **kwargs):
+        return self.iterate(value, *args, **kwargs)
+      return generator
+
+    @functools.wraps(value)
+    async def method(*args, **kwargs):
+      return await self.run(value, *args, **kwargs)
+    return method
+
+  def __get_semaphore(self):
+    """
+    internal:
+    Returns the semaphore for the running event loop. Before python 3.10 a semaphore is
+    tied to the loop that's current when it's made, and after that to the first loop that
+    waits on it, so we make a new one if you use this object with asyncio.run() again.
+    """
+    loop = asyncio.get_running_loop()
+    if self.__semaphore_loop is not loop:
+      self.__semaphore = asyncio.Semaphore(self.concurrency)
+      self.__semaphore_loop = loop
+    return self.__semaphore
+
+  async def run(self, func, *args, **kwargs):
+    """
+    Calls a blocking function in one of our threads. The Guru object's methods
+    are wrapped this way, you can use this to do the same for your own functions.
+    """
+    async with self.__get_semaphore():
+      loop = asyncio.get_running_loop()
+      return await loop.run_in_executor(self.__executor, functools.partial(func, *args, **kwargs))
+
+  async def iterate(self, func, *args, **kwargs):
+    """Turns a blocking generator, like Guru.iter_cards(), into an async generator."""
+    items = func(*args, **kwargs)
+    done = object()
+    pending = None
+    try:
+      while True:
+        async with self.__get_semaphore():
+          pending = self.__executor.submit(next, items, done)
+          item = await asyncio.wrap_future(pending)
+        if item is done:
+          break
+        yield item
+    finally:
+      # if we were cancelled while a thread was getting the next item, the generator is
+      # still running and can't be closed until it's done. if it's done this closes it now.
+      if pending:
+        pending.add_done_callback(lambda future: items.close())
+      else:
+        items.close()
@@ -0,0 +1,117 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from guru.errors import GuruError
+
+
+# the exceptions a batch collects in its results. the SDK's own errors are BaseExceptions,
+# not Exceptions, so they're listed too.
+COLLECTED_ERRORS = (Exception, GuruError)
+
+
+def is_collected(error):
+  """
+  internal:
+  True if a call's exception goes in the BatchResult. The SDK also raises plain
+  BaseExceptions in lots of places so we collect those. Others, like KeyboardInterrupt,
+  are raised by wait().
+  """
+  return isinstance(error, COLLECTED_ERRORS) or type(error) is BaseException
+
+
+class BatchResult(list):
+  """
+  The list of results from Guru.map() or Guru.batch(). The results are in the same
+  order as the items or calls. If a call raised an exception its result is None and
+  the exception is in `errors`, which maps the call's index to the exception.
+
+  ```
+  cards = g.map(g.get_card, ["Tbbqo5pc", "iMRxaK8c", "not-a-card"])
+  for item, error in cards.failed:
+    print("couldn't load", item, error)
+  ```
+  """
+
+  def __init__(self, items=None):
+    super().__init__()
+    self.items = items or []
+    self.errors = {}
+
+  @property
+  def ok(self):
+    """True if every call succeeded."""
+    return not self.errors
+
+  @property
+  def failed(self):
+    """A list of (item, exception) pairs for the calls that raised exceptions."""
+    return [(self.items[index], self.errors[index]) for index in sorted(self.errors)]
+
+  def raise_errors(self):
+    """Raises the first exception, if there was one, for when you want a batch to be all or nothing."""
+    if self.errors:
+      raise self.errors[min(self.errors)]
+
+
+class Batch:
+  """
+  Runs calls in a pool of threads and collects their results. You get one of these
+  by calling `g.batch()`:
+
+  ```
+  with g.batch(workers=8) as batch:
+    for card in cards:
+      batch.add(g.get_folders_for_card, card)
+
+  for card, folders in zip(cards, batch.results):
+    print(card.title, len(folders))
+  ```
+
+  `add()` returns a Future so you can also check on individual calls. The results
+  are available as a BatchResult once the `with` block ends or you call `wait()`.
+  """
+
+  def __init__(self, workers):
+    self.workers = workers
+    self.results = None
+    self.__executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="guru-batch")
+    self.__items = []
+    self.__futures = []
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, error_type, error, traceback):
+    if error_type:
+      # something went wrong in the with block so we don't start calls that haven't started yet.
+      for future in self.__futures:
+        future.cancel()
+      self.__executor.shutdown(wait=True)
+    else:
+      self.wait()
+
+  def add(self, func, *args, **kwargs):
+    """Queues up a call to func with these arguments and returns its Future."""
+    future = self.__executor.submit(func, *args, **kwargs)
+    self.__items.append(args[0] if len(args) == 1 and not kwargs else (args, kwargs))
+    self.__futures.append(future)
+    return future
+
+  def wait(self):
+    """Waits for every call to finish and returns the BatchResult."""
+    results = BatchResult(self.__items)
+    for index, future in enumerate(self.__futures):
+      try:
+        results.append(future.result())
+      except BaseException as error:
+        # this runs on the caller's thread so things like ctrl+c still stop it.
+        if not is_collected(error):
+          for other_future in self.__futures:
+            other_future.cancel()
+          self.__executor.shutdown(wait=False)
+          raise
+        results.append(None)
+        results.errors[index] = error
+
+    self.__executor.shutdown(wait=True)
+    self.results = results
+    return results
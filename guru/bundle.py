@@ -3,20 +3,34 @@ import re
 import os
 import csv
 import sys
+import json
 import time
 import hashlib
 import zipfile
 import requests
+import threading
 import webbrowser
 
-from bs4 import BeautifulSoup
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+
 
 if sys.version_info.major >= 3:
   from urllib.parse import urljoin
 else:
   from urlparse import urljoin
 
-from guru.util import clear_dir, write_file, copy_file, download_file, to_yaml, http_post, http_get, load_html
+from guru.retry import backoff_delay
+from guru.resource_store import ResourceStore
+from guru.upload import GrowingFile
+from guru.util import clear_dir, make_dir, write_file, read_file, copy_file, download_file, to_yaml, http_post, http_get, load_html, parse_html, get_html_parser, load_json
+
+# files like these are already compressed so compressing them again when we build
+# the zip file takes time and doesn't make them any smaller.
+COMPRESSED_EXTENSIONS = [
+  ".png", ".jpg", ".jpeg", ".gif", ".webp", ".heic",
+  ".mp3", ".m4a", ".mp4", ".mov", ".avi", ".webm",
+  ".zip", ".gz", ".7z", ".docx", ".xlsx", ".pptx"
+]
 
 # node types
 NONE = "NONE"
@@ -68,8 +82,8 @@ def _parse_style(text):
 def _format_style(values):
   return ";".join(["%s:%s" % (key, values[key]) for key in values.keys()])
 
-def clean_up_html(html):
-  doc = BeautifulSoup(html, "html.parser")
+def clean_up_html(html, parser=None):
+  doc = parse_html(html, parser)
 
   # when we see 'colspan' in a table, insert extra cells so the original TD plus
   # the extra TDs take up the expected number of columns. for colspan="3" we insert
@@ -288,8 +302,96 @@ def traverse_tree(bundle, func, node=None, parent=None, depth=0, post=False, **k
       if not node.parents:
         traverse_tree(bundle, func, node, post=post, **kwargs)
 
-def make_spreadsheet(node, parent, depth, rows):
-  """internal"""
+# these are the tag types that are absolutely essential, otherwise
+# we're changing what the content looks like. some other tags, like
+# divs, might be required to format the content correctly, but there's
+# also a chance that some divs aren't needed.
+ESSENTIAL_TAGS = {"p", "a", "img", "iframe", "table", "tr", "th", "td", "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "li", "em", "strong", "pre", "code"}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+
+def analyze_html(doc):
+  """
+  internal:
+  Counts the tags, headings, links, images, and words in a card's parsed html.
+  This is one walk over the tree, doing a css selector for each count meant
+  walking the whole tree 15 times.
+  """
+  stats = {
+    "tags": 0,
+    "essential_tags": 0,
+    "words": len(re.split("\s+", doc.text)),
+    "h1s": 0,
+    "h2s": 0,
+    "h3s": 0,
+    "headings": 0,
+    "iframes": 0,
+    "links": 0,
+    "card_links": 0,
+    "file_links": 0,
+    "table_cells": 0,
+    "images": 0,
+    "attached_images": 0
+  }
+
+  for tag in doc.find_all(True):
+    name = tag.name
+    stats["tags"] += 1
+    if name in ESSENTIAL_TAGS:
+      stats["essential_tags"] += 1
+
+    if name in HEADING_TAGS:
+      stats["headings"] += 1
+      if name in ("h1", "h2", "h3"):
+        stats[name + "s"] += 1
+    elif name == "a":
+      href = tag.attrs.get("href")
+      if href is not None:
+        stats["links"] += 1
+        if href.startswith("cards/"):
+          stats["card_links"] += 1
+        elif href.startswith("resources/"):
+          stats["file_links"] += 1
+    elif name == "img":
+      stats["images"] += 1
+      if tag.attrs.get("src", "").startswith("resources/"):
+        stats["attached_images"] += 1
+    elif name == "iframe":
+      stats["iframes"] += 1
+    elif name == "td":
+      stats["table_cells"] += 1
+
+  return stats
+
+def count_descendants(bundle):
+  """
+  internal:
+  Returns the number of children and sections under each node, including nested
+  ones, like get_children_recursively() would give you. Each node's counts are
+  only worked out once and reused by its parents.
+  """
+  counts = {}
+  def count(node):
+    if node.id not in counts:
+      children = 0
+      sections = 0
+      for id in node.children:
+        child = bundle.node(id)
+        if not child.removed:
+          children += 1
+          if child.type == SECTION:
+            sections += 1
+        child_children, child_sections = count(child)
+        children += child_children
+        sections += child_sections
+      counts[node.id] = (children, sections)
+    return counts[node.id]
+
+  for node in bundle.nodes:
+    count(node)
+  return counts
+
+def make_spreadsheet(node, parent, depth, rows, counts):
+  """internal: counts comes from count_descendants()."""
   # if the 'rows' list is empty, add the headings to it.
   if not rows:
     rows.append([
@@ -334,39 +436,32 @@ def make_spreadsheet(node, parent, depth, rows):
     values.append(len(node.children))
     values.append("")
   elif node.type == BOARD:
-    all_children = node.get_children_recursively()
-    sections = list(filter(lambda n: n.type == SECTION, all_children))
-    values.append(len(all_children))
-    values.append(len(sections))
+    values.append(counts[node.id][0])
+    values.append(counts[node.id][1])
   else:
-    values.append(len(node.get_children_recursively()))
+    values.append(counts[node.id][0])
     values.append("")
 
   # for nodes with content we put additional values in the sheet,
   # like word count, # of headings, # of links, etc.
   if node.type == CARD:
-    doc = BeautifulSoup(node.content, "html.parser")
-    # these are the tag types that are absolutely essential, otherwise
-    # we're changing what the content looks like. some other tags, like
-    # divs, might be required to format the content correctly, but there's
-    # also a chance that some divs aren't needed.
-    essential_tags = "p, a, img, iframe, table, tr, th, td, h1, h2, h3, h4, h5, h6, ul, ol, li, em, strong, pre, code"
+    stats = node.get_stats()
     values += [
-      len(node.content),                         # html length
-      len(doc.select("*")),                      # number of tags
-      len(doc.select(essential_tags)),           # number of essential tags (p, img, table, etc.)
-      len(re.split("\s+", doc.text)),            # word count
-      len(doc.select("h1")),                     # number of H1s
-      len(doc.select("h2")),                     # number of H2s
-      len(doc.select("h3")),                     # number of H3s
-      len(doc.select("h1, h2, h3, h4, h5, h6")), # number of headings
-      len(doc.select("iframe")),                 # number of iframes
-      len(doc.select("a[href]")),                # all links
-      len(doc.select('a[href^="cards/"]')),      # guru card links,
-      len(doc.select('a[href^="resources/"]')),  # guru file links,
-      len(doc.select("td")),                     # table cells
-      len(doc.select("img")),                    # images
-      len(doc.select('img[src^="resources/"]')), # attached images
+      len(node.content),           # html length
+      stats["tags"],               # number of tags
+      stats["essential_tags"],     # number of essential tags (p, img, table, etc.)
+      stats["words"],              # word count
+      stats["h1s"],                # number of H1s
+      stats["h2s"],                # number of H2s
+      stats["h3s"],                # number of H3s
+      stats["headings"],           # number of headings
+      stats["iframes"],            # number of iframes
+      stats["links"],              # all links
+      stats["card_links"],         # guru card links,
+      stats["file_links"],         # guru file links,
+      stats["table_cells"],        # table cells
+      stats["images"],             # images
+      stats["attached_images"],    # attached images
     ]
 
   rows.append(values)
@@ -539,7 +634,8 @@ class BundleNode:
   def __init__(self, id, bundle, url="", title="", desc="", content="", tags=None, alt_urls=None, index=None):
     self.id = id
     self.bundle = bundle
-    self.url = ""
+    self.__url = ""
+    self.__pending_content = None
     self.desc = desc
     self.title = title or id
     self.content = content
@@ -549,11 +645,59 @@ class BundleNode:
     self.tags = tags
     self.alt_urls = alt_urls
     self.removed = False
+
+    # html_cleanup() keeps track of what this node's links point to and which
+    # resources it uses so incremental bundles can tell if it needs to be redone.
+    self.links = {}
+    self.resource_ids = set()
+    self.failed_resources = set()
     if index is None:
       self.index = 9999
     else:
       self.index = index
 
+  @property
+  def url(self):
+    return self.__url
+
+  @url.setter
+  def url(self, url):
+    # the bundle keeps an index of nodes by url so we let it know when this changes.
+    old_url = self.__url
+    self.__url = url
+    if self.bundle and old_url != url:
+      self.bundle.update_url_index(self, old_url)
+
+  @property
+  def content(self):
+    # if the html is being cleaned up in another process, we wait for it here.
+    if self.__pending_content:
+      self.__content = self.__pending_content.result()
+      self.__pending_content = None
+    return self.__content
+
+  @content.setter
+  def content(self, content):
+    self.__pending_content = None
+    self.__content = content
+    self.__stats = None
+
+  def set_pending_content(self, future):
+    """internal"""
+    self.__pending_content = future
+    self.__stats = None
+
+  def get_stats(self):
+    """
+    internal:
+    Returns the counts of tags, links, images, words, etc. in this node's content that
+    go in the spreadsheet. They're kept until the content changes and html_cleanup()
+    works them out from the html it already parsed, so we don't parse it again.
+    """
+    if self.__stats is None:
+      self.__stats = analyze_html(parse_html(self.content, self.bundle.html_parser))
+    return self.__stats
+
   def add_to(self, node):
     """Adds this object as a child of the given node."""
     node.add_child(self)
@@ -663,7 +807,7 @@ class BundleNode:
     return items
 
   def split_all(self, selector, nest=False):
-    doc = BeautifulSoup(self.content, "html.parser")
+    doc = parse_html(self.content, self.bundle.html_parser)
 
     for element in doc.select(selector):
       element.insert_before("[GURU_SDK_BREAKPOINT]")
@@ -679,7 +823,7 @@ class BundleNode:
       if not new_content.strip():
         continue
 
-      new_doc = BeautifulSoup(new_content, "html.parser")
+      new_doc = parse_html(new_content, self.bundle.html_parser)
       new_title = self.title
 
       # if we split on h2s, find the first h2 in the doc and use that as the title.
@@ -715,7 +859,7 @@ class BundleNode:
     If you're not sure what the title should be you can pass empty strings
     and we'll name the new cards the same as the card you're splitting.
     """
-    doc = BeautifulSoup(self.content, "html.parser")
+    doc = parse_html(self.content, self.bundle.html_parser)
 
     selectors = [args[i] for i in range(0, len(args), 2)]
     titles = [args[i] for i in range(1, len(args), 2)]
@@ -751,7 +895,7 @@ class BundleNode:
         #       it may not literally be the first child. if this heading is
         #       way towards the bottom and coincidentally has the same text
         #       content as the title, we want to leave it alone then.
-        new_doc = BeautifulSoup(new_content, "html.parser")
+        new_doc = parse_html(new_content, self.bundle.html_parser)
         for heading in new_doc.select("h1, h2, h3, h4, h5, h6"):
           if heading.text.strip().lower() == new_title.strip().lower():
             heading.decompose()
@@ -771,7 +915,7 @@ class BundleNode:
       for parent_node in self.parents:
         parent_node.add_child(new_node, after=self)
 
-  def html_cleanup(self, download_func=None, compare_links=None):
+  def html_cleanup(self, download_func=None, compare_links=None, link_index=None, link_key=None):
     """
     internal:
     This adjusts image and link URLs to either be absolute or refer to
@@ -779,14 +923,22 @@ class BundleNode:
     values that should become card-to-card links and for images we look
     for references to files in the resources folder.
 
-    This will eventually have the ability to download images.
+    Links are matched to nodes using the bundle's link index, zip() builds
+    it once and passes it in. If compare_links is provided, links that aren't
+    in the index are checked against every node using that function.
     """
     # we only need to clean up the html for cards that have content.
     if not self.content or self.type != CARD or self.removed:
       return
 
-    doc = BeautifulSoup(self.content, "html.parser")
+    if link_index is None:
+      link_index = self.bundle.make_link_index(link_key)
+
+    doc = parse_html(self.content, self.bundle.html_parser)
     url_map = {}
+    self.links = {}
+    self.resource_ids = set()
+    self.failed_resources = set()
 
     # this function can work on image and link URLs.
     def check_element(element, attr):
@@ -811,12 +963,9 @@ class BundleNode:
       # and for doing the download too (since you probably need auth headers for
       # the download to work).
       if download_func:
+        filename = self.bundle.RESOURCE_PATH % (self.bundle.id, resource_id)
 
-        # if we've already downloaded this file, update the src/href.
-        if resource_id in self.bundle.resources:
-          element.attrs[attr] = self.bundle.resources[resource_id]
-        else:
-          filename = self.bundle.RESOURCE_PATH % (self.bundle.id, resource_id)
+        def download():
           self.bundle.log(message="checking if we should download attachment", url=absolute_url, file=filename)
 
           # you can either return True or return a tuple, with the http status code as the first item.
@@ -833,12 +982,19 @@ class BundleNode:
 
           if is_successful:
             self.bundle.log(message="download successful", url=absolute_url, file=filename)
-            self.bundle.resources[resource_id] = "resources/%s" % resource_id
-            element.attrs[attr] = "resources/%s" % resource_id
+            new_id = self.bundle.store_resource(resource_id, filename)
+            self.bundle.resources[resource_id] = "resources/%s" % new_id
+            return "resources/%s" % new_id
           else:
             # returning False means it didn't download so we make the url absolute.
             self.bundle.log(message="did not download", url=absolute_url, file=filename)
-            element.attrs[attr] = absolute_url
+            return absolute_url
+
+        # if another card references the same file it's only downloaded once, even if
+        # both cards are being processed at the same time.
+        element.attrs[attr] = self.bundle.load_resource(resource_id, download)
+        if element.attrs[attr] == absolute_url:
+          self.failed_resources.add(resource_id)
       else:
         # if we're not downloading files we still need to do some cleanup.
         #  - move referenced attachments into the resources/ folder.
@@ -852,9 +1008,16 @@ class BundleNode:
           # then absolute_url is: /Users/rmiller/export/images/bullet.gif
           # and filename is:      /tmp/{job_id}/resources/{hash}.gif
           filename = self.bundle.RESOURCE_PATH % (self.bundle.id, resource_id)
-          if copy_file(absolute_url, filename):
-            self.bundle.resources[resource_id] = "resources/%s" % resource_id
-            element.attrs[attr] = "resources/%s" % resource_id
+
+          def copy():
+            new_id = self.bundle.copy_resource(absolute_url, resource_id)
+            if new_id:
+              self.bundle.resources[resource_id] = "resources/%s" % new_id
+              return "resources/%s" % new_id
+
+          new_url = self.bundle.load_resource(resource_id, copy)
+          if new_url:
+            element.attrs[attr] = new_url
           else:
             # the element could be a link or an image.
             # if it's a link we unwrap its text, if it's an image we just remove it.
@@ -874,6 +1037,8 @@ class BundleNode:
       # we want to return True if the value changed.
       if element.attrs and element.attrs[attr] != initial_value:
         url_map[initial_value] = element.attrs[attr]
+        if element.attrs[attr].startswith("resources/"):
+          self.resource_ids.add(element.attrs[attr][len("resources/"):])
     
     # images and iframes can both have src attributes that might reference files we need
     # to download or we may need to adjust ther urls (e.g. make them absolute).
@@ -890,28 +1055,42 @@ class BundleNode:
       check_as_attachment = True
       absolute_url = urljoin(self.url, href)
 
-      for other_node in self.bundle.nodes:
-        if other_node.removed:
-          continue
-        if other_node.type == SECTION:
-          continue
-        if (compare_links and compare_links(other_node, absolute_url)) or \
-            other_node.url == absolute_url or \
-            (other_node.alt_urls and absolute_url in other_node.alt_urls):
-          if other_node.type == BOARD:
-            link.attrs["href"] = "boards/%s" % other_node.id
-          elif other_node.type == CARD:
-            link.attrs["href"] = "cards/%s" % other_node.id
-          elif other_node.type == BOARD_GROUP:
-            link.attrs["href"] = "board-groups/%s" % other_node.id
-          check_as_attachment = False
-          break
+      other_node = self.bundle.find_link_target(absolute_url, link_index, link_key, compare_links)
+      self.links[absolute_url] = [other_node.id, other_node.type] if other_node else None
+
+      if other_node:
+        if other_node.type == BOARD:
+          link.attrs["href"] = "boards/%s" % other_node.id
+        elif other_node.type == CARD:
+          link.attrs["href"] = "cards/%s" % other_node.id
+        elif other_node.type == BOARD_GROUP:
+          link.attrs["href"] = "board-groups/%s" % other_node.id
+        check_as_attachment = False
 
       # find links to local files and add these files as resources.
       if check_as_attachment:
         check_element(link, "href")
       
     self.content = str(doc)
+    self.__stats = analyze_html(doc)
+    self.bundle.log(message="analyzed node html", node=self.id, **self.__stats)
+
+  def get_filenames(self):
+    """internal: Returns the paths of the files write_files() writes for this node."""
+    if self.removed:
+      return []
+    return self.bundle.get_filenames(self.id, self.type)
+
+  def get_fingerprint(self, clean_html=True):
+    """
+    internal:
+    Hashes everything that goes into this node's files, except for what its links point to
+    and the resources it downloads, which html_cleanup() keeps track of separately.
+    """
+    values = [self.bundle.html_parser, clean_html, self.type, self.removed, self.make_yaml() or ""]
+    if self.type == CARD and not self.removed:
+      values.append(self.content)
+    return hashlib.sha1(json.dumps(values).encode("utf-8")).hexdigest()
 
   def write_files(self):
     """
@@ -919,13 +1098,18 @@ class BundleNode:
     Writes the files needed for this object. For cards that's a .yaml
     and .html file. For boards and board groups it's just a .yaml file.
     """
-    if self.type == CARD and not self.removed:
-      write_file(self.bundle.CARD_YAML_PATH % (self.bundle.id, _id_to_filename(self.id)), self.make_yaml())
-      write_file(self.bundle.CARD_HTML_PATH % (self.bundle.id, _id_to_filename(self.id)), self.content.strip() or "")
+    if self.bundle.is_unchanged(self):
+      # the files from the last run are still correct but if we're streaming they
+      # need to go in the zip file.
+      for filename in self.get_filenames():
+        self.bundle.write_bundle_file(filename)
+    elif self.type == CARD and not self.removed:
+      self.bundle.write_bundle_file(self.bundle.CARD_YAML_PATH % (self.bundle.id, _id_to_filename(self.id)), self.make_yaml())
+      self.bundle.write_bundle_file(self.bundle.CARD_HTML_PATH % (self.bundle.id, _id_to_filename(self.id)), self.content.strip() or "")
     elif self.type == BOARD:
-      write_file(self.bundle.BOARD_YAML_PATH % (self.bundle.id, _id_to_filename(self.id)), self.make_yaml())
+      self.bundle.write_bundle_file(self.bundle.BOARD_YAML_PATH % (self.bundle.id, _id_to_filename(self.id)), self.make_yaml())
     elif self.type == BOARD_GROUP:
-      write_file(self.bundle.BOARD_GROUP_YAML_PATH % (self.bundle.id, _id_to_filename(self.id)), self.make_yaml())
+      self.bundle.write_bundle_file(self.bundle.BOARD_GROUP_YAML_PATH % (self.bundle.id, _id_to_filename(self.id)), self.make_yaml())
 
   def make_yaml(self):
     """internal: Generates the yaml content for this node."""
@@ -991,14 +1175,61 @@ class Bundle:
 
   That'll create a bundle with one card and upload it to the collection
   called "Import Test" -- if that collection doesn't exist, it'll be created.
+
+  Cleaning up each node's html takes a while for big imports. If you pass
+  `processes`, e.g. `g.bundle(processes=4)`, that many processes clean up
+  the html in the background while you keep adding nodes. The results are
+  the same, we just wait for them when the content is needed.
+
+  The bundle uses the Guru object's `html_parser` unless you pass a different one.
+
+  If you sync the same content over and over and most of it doesn't change, pass
+  `incremental=True`. We keep a manifest of what each node looked like last time
+  and zip() skips the nodes that haven't changed, reusing their files. zip() sets
+  `bundle.changeset` to the IDs of the nodes that were added, changed, removed, or
+  are unchanged, and upload() skips the sync if nothing changed since the last one.
+
+  Pass a folder path or `ResourceStore` as `resource_store` to keep the files you
+  download in a cache that's shared by later bundles, see `ResourceStore` for details.
   """
-  def __init__(self, guru, id="", clear=False, folder="/tmp/", verbose=False, skip_empty_sections=False):
+  def __init__(self, guru, id="", clear=False, folder="/tmp/", verbose=False, skip_empty_sections=False, processes=None, html_parser=None,
+               incremental=False, resource_store=None):
     self.guru = guru
     self.id = slugify(id) if id else str(int(time.time()))
-    self.nodes = []
+    self.__nodes = []
+
+    # these let us find nodes without scanning the whole list, which matters
+    # for big syncs. they're updated as nodes are added, removed, or changed.
+    # removed nodes are only dropped from the indexes, `nodes` filters them out
+    # of the list the next time it's read.
+    self.__nodes_by_id = {}
+    self.__has_removed_nodes = False
+    self.__nodes_by_url = {}
     self.resources = {}
+    self.resource_store = ResourceStore(resource_store) if isinstance(resource_store, str) else resource_store
+    self.__resource_loads = {}
+    self.__resource_lock = threading.Lock()
     self.verbose = verbose
     self.skip_empty_sections = skip_empty_sections
+    self.processes = processes
+    self.html_parser = get_html_parser(html_parser or getattr(guru, "html_parser", None))
+    self.__cleaner = None
+
+    # when zip() is called with stream=True, files are written straight into the zip file.
+    self.__streaming = False
+    self.__keep_files = True
+    self.__zip_stream = None
+    self.__local_files = {}
+
+    # zip_and_upload() sets this so the zip file is uploaded while it's being written.
+    self.__live_upload = None
+    self.upload_stats = None
+
+    # incremental bundles remember what they wrote last time so they can skip unchanged nodes.
+    self.incremental = incremental
+    self.changeset = None
+    self.__manifest = None
+    self.__unchanged = set()
     self.events = []
     self.start_time = time.time()
 
@@ -1012,8 +1243,11 @@ class Bundle:
     self.BOARD_GROUP_YAML_PATH = folder + "%s/board-groups/%s.yaml"
     self.COLLECTION_YAML_PATH = folder + "%s/collection.yaml"
     self.RESOURCE_PATH = folder + "%s/resources/%s"
+    self.MANIFEST_PATH = folder + "manifest_%s.json"
 
-    if clear:
+    # incremental bundles need the files from the last run, zip() removes the ones we don't need.
+    # if there's no manifest there's no last run so we can clear the folder.
+    if clear and not (incremental and os.path.exists(self.MANIFEST_PATH % self.id)):
       clear_dir(self.CONTENT_PATH % self.id)
   
   def log(self, **kwargs):
@@ -1030,6 +1264,8 @@ class Bundle:
         if key not in labels:
           labels.append(key)
 
+    # if we streamed the zip file the bundle's folder might not exist yet.
+    make_dir(self.CSV_PATH % self.id)
     with open(self.CSV_PATH % self.id, "w") as file_out:
       csv_out = csv.writer(file_out)
       csv_out.writerow(labels)
@@ -1043,15 +1279,322 @@ class Bundle:
         csv_out.writerow(row)
 
   def has_node(self, id):
-    for n in self.nodes:
-      if n.id == id:
-        return True
-    return False
-  
+    return id in self.__nodes_by_id
+
+  def find_node(self, url):
+    """Returns the first node that was given this url, or None if no node has it."""
+    nodes = self.__nodes_by_url.get(url)
+    if nodes:
+      return nodes[0]
+
+  def update_url_index(self, node, old_url):
+    """internal: BundleNode calls this when its url changes."""
+    if old_url:
+      nodes = self.__nodes_by_url.get(old_url)
+      if nodes and node in nodes:
+        nodes.remove(node)
+        if not nodes:
+          del self.__nodes_by_url[old_url]
+
+    if node.url and self.__nodes_by_id.get(node.id) is node:
+      self.__nodes_by_url.setdefault(node.url, []).append(node)
+
+  def find_link_target(self, url, link_index, link_key=None, compare_links=None):
+    """internal: Finds the node a link points to, if it points to one."""
+    other_node = link_index.get(link_key(url) if link_key else url)
+
+    # compare_links can match urls any way it wants so we have to check every node.
+    if not other_node and compare_links:
+      for node in self.nodes:
+        if not node.removed and node.type != SECTION and compare_links(node, url):
+          return node
+    return other_node
+
+  def is_unchanged(self, node):
+    """internal"""
+    return node.id in self.__unchanged
+
+  def get_filenames(self, id, type):
+    """internal: Returns the paths of the files we write for a node with this ID and type."""
+    if type == CARD:
+      return [
+        self.CARD_YAML_PATH % (self.id, _id_to_filename(id)),
+        self.CARD_HTML_PATH % (self.id, _id_to_filename(id))
+      ]
+    elif type == BOARD:
+      return [self.BOARD_YAML_PATH % (self.id, _id_to_filename(id))]
+    elif type == BOARD_GROUP:
+      return [self.BOARD_GROUP_YAML_PATH % (self.id, _id_to_filename(id))]
+    return []
+
+  def __load_manifest(self):
+    """internal"""
+    manifest = load_json(self.MANIFEST_PATH % self.id)
+    return {
+      "nodes": manifest.get("nodes", {}),
+      "resources": manifest.get("resources", {}),
+      "uploaded": manifest.get("uploaded", False)
+    }
+
+  def __save_manifest(self):
+    """internal"""
+    make_dir(self.MANIFEST_PATH % self.id)
+    # we write to a temp file first so a crash can't leave a half-written manifest.
+    temp_path = self.MANIFEST_PATH % self.id + ".tmp"
+    with open(temp_path, "w") as file_out:
+      json.dump(self.__manifest, file_out)
+    os.replace(temp_path, self.MANIFEST_PATH % self.id)
+
+  def __find_unchanged_nodes(self, previous, fingerprints, link_index, link_key, compare_links):
+    """
+    internal:
+    A node is unchanged if its fingerprint matches the last run, its files are still there,
+    and, for cards, its links point to the same nodes and its resources are still there.
+    """
+    unchanged = set()
+    for node in self.nodes:
+      entry = previous["nodes"].get(node.id)
+      if not entry or entry["fingerprint"] != fingerprints[node.id] or entry.get("failed"):
+        continue
+      if not all(os.path.isfile(filename) for filename in node.get_filenames()):
+        continue
+      if link_index is not None and not self.__links_are_unchanged(entry.get("links", {}), link_index, link_key, compare_links):
+        continue
+      resource_ids = entry.get("resources", [])
+      if not all(os.path.isfile(self.RESOURCE_PATH % (self.id, resource_id)) for resource_id in resource_ids):
+        continue
+
+      # we skip html_cleanup() for this node so we load what it did last time.
+      node.links = entry.get("links", {})
+      node.resource_ids = set(resource_ids)
+      for resource_id in resource_ids:
+        self.resources[resource_id] = "resources/%s" % resource_id
+      if node.type == CARD and not node.removed:
+        node.content = read_file(node.get_filenames()[1])
+      unchanged.add(node.id)
+
+    return unchanged
+
+  def __links_are_unchanged(self, links, link_index, link_key, compare_links):
+    """internal"""
+    for url, target in links.items():
+      other_node = self.find_link_target(url, link_index, link_key, compare_links)
+      if target != ([other_node.id, other_node.type] if other_node else None):
+        return False
+    return True
+
+  def __update_manifest(self, previous, fingerprints):
+    """
+    internal:
+    Figures out what changed since the last run, removes the files we don't need anymore,
+    and builds the new manifest. It's saved after the zip file is built.
+    """
+    nodes = {}
+    for node in self.nodes:
+      if node.get_filenames():
+        nodes[node.id] = {
+          "type": node.type,
+          "fingerprint": fingerprints[node.id],
+          "links": node.links,
+          "resources": sorted(node.resource_ids),
+          "failed": bool(node.failed_resources)
+        }
+
+    # remove the files for nodes that are gone or are now a different type.
+    current_files = set(filename for node in self.nodes for filename in node.get_filenames())
+    for id, entry in previous["nodes"].items():
+      for filename in self.get_filenames(id, entry["type"]):
+        if filename not in current_files and os.path.isfile(filename):
+          os.remove(filename)
+
+    # resources are compared by their hash but we only compute it when a file's size or
+    # modified time changes so unchanged resources aren't read again.
+    resources = {}
+    used_resources = set(resource_id for entry in nodes.values() for resource_id in entry["resources"])
+    for resource_id in sorted(used_resources):
+      filename = self.RESOURCE_PATH % (self.id, resource_id)
+      if not os.path.isfile(filename):
+        continue
+      stat = os.stat(filename)
+      old = previous["resources"].get(resource_id)
+      if old and old["size"] == stat.st_size and old["mtime"] == stat.st_mtime:
+        file_hash = old["hash"]
+      else:
+        with open(filename, "rb") as file_in:
+          file_hash = hashlib.sha1(file_in.read()).hexdigest()
+      resources[resource_id] = {"size": stat.st_size, "mtime": stat.st_mtime, "hash": file_hash}
+
+    for resource_id in previous["resources"]:
+      filename = self.RESOURCE_PATH % (self.id, resource_id)
+      if resource_id not in resources and os.path.isfile(filename):
+        os.remove(filename)
+
+    self.changeset = {
+      "added": [id for id in nodes if id not in previous["nodes"]],
+      "changed": [id for id in nodes if id in previous["nodes"] and id not in self.__unchanged],
+      "removed": [id for id in previous["nodes"] if id not in nodes],
+      "unchanged": [id for id in nodes if id in self.__unchanged],
+      "resources": {
+        "added": [id for id in resources if id not in previous["resources"]],
+        "changed": [id for id in resources if id in previous["resources"] and previous["resources"][id]["hash"] != resources[id]["hash"]],
+        "removed": [id for id in previous["resources"] if id not in resources]
+      }
+    }
+    self.log(
+      message="changeset",
+      added=len(self.changeset["added"]),
+      changed=len(self.changeset["changed"]),
+      removed=len(self.changeset["removed"]),
+      unchanged=len(self.changeset["unchanged"])
+    )
+
+    # if the last bundle wasn't uploaded we need to upload this one even if nothing changed.
+    self.__manifest = {
+      "nodes": nodes,
+      "resources": resources,
+      "uploaded": previous["uploaded"] and not self.has_changes
+    }
+
+  @property
+  def has_changes(self):
+    """
+    For incremental bundles, this is False if zip() didn't find any changes since the
+    last time. For other bundles it's always True.
+    """
+    if not self.changeset:
+      return True
+    return bool(
+      self.changeset["added"] or self.changeset["changed"] or self.changeset["removed"] or
+      any(self.changeset["resources"].values())
+    )
+
+  def make_link_index(self, link_key=None):
+    """
+    internal:
+    Returns a dict that maps each node's url and alt_urls to the node so we can
+    tell which links are card-to-card links. Sections and removed nodes can't be
+    linked to so they're skipped. If two nodes have the same url, the first one wins.
+    """
+    link_index = {}
+    for node in self.nodes:
+      if node.removed or node.type == SECTION:
+        continue
+
+      alt_urls = node.alt_urls or []
+      if isinstance(alt_urls, str):
+        alt_urls = [alt_urls]
+      for url in [node.url] + list(alt_urls):
+        if url:
+          link_index.setdefault(link_key(url) if link_key else url, node)
+    return link_index
+
   def remove_node(self, node):
     node.detach()
-    if node in self.nodes:
-      self.nodes.remove(node)
+    if self.__nodes_by_id.get(node.id) is node:
+      del self.__nodes_by_id[node.id]
+      self.update_url_index(node, node.url)
+      self.__has_removed_nodes = True
+
+  @property
+  def nodes(self):
+    if self.__has_removed_nodes:
+      self.__nodes = [n for n in self.__nodes if self.__nodes_by_id.get(n.id) is n]
+      self.__has_removed_nodes = False
+    return self.__nodes
+
+  def load_resource(self, resource_id, load):
+    """
+    internal:
+    Calls load() to download or copy a resource and returns the value it returns, which
+    is the resource's new url. Each resource is only loaded once per zip() call so if
+    another card, maybe in another thread, needs the same resource we wait for the first
+    load to finish and use its result.
+    """
+    with self.__resource_lock:
+      if resource_id in self.resources:
+        return self.resources[resource_id]
+      future = self.__resource_loads.get(resource_id)
+      is_loading = future is None
+      if is_loading:
+        future = Future()
+        self.__resource_loads[resource_id] = future
+
+    if is_loading:
+      try:
+        future.set_result(load())
+      except BaseException as error:
+        future.set_exception(error)
+    return future.result()
+
+  def copy_resource(self, src_path, resource_id):
+    """
+    internal:
+    Copies a local file into the resources folder and returns its resource ID, or None if
+    the file doesn't exist. If we're streaming and not keeping the files, we just remember
+    where it is and add it to the zip file from there.
+    """
+    filename = self.RESOURCE_PATH % (self.id, resource_id)
+    if self.resource_store or (self.__streaming and not self.__keep_files):
+      src_path = src_path.split("?")[0]
+      if not os.path.isfile(src_path):
+        return
+      if self.resource_store:
+        return self.__link_stored_resource(self.resource_store.add_file(src_path), resource_id)
+      self.__local_files[filename] = src_path
+      return resource_id
+    if copy_file(src_path, filename):
+      return resource_id
+
+  def store_resource(self, resource_id, filename):
+    """
+    internal:
+    Adds a downloaded file to the resource store and returns its new resource ID, which
+    is based on its content so identical files are only in the zip once. If there's no
+    resource store the ID doesn't change.
+    """
+    if not self.resource_store:
+      return resource_id
+    new_id = self.__link_stored_resource(self.resource_store.add_file(filename), resource_id)
+    if new_id != resource_id:
+      os.remove(filename)
+    return new_id
+
+  def __link_stored_resource(self, content_hash, resource_id):
+    """internal"""
+    # we keep the extension because guru uses it to know what kind of file it is.
+    new_id = content_hash + os.path.splitext(resource_id)[1]
+    self.resource_store.link(content_hash, self.RESOURCE_PATH % (self.id, new_id))
+    return new_id
+
+  def write_bundle_file(self, filename, content=None):
+    """
+    internal:
+    Writes one of the bundle's files to the content folder, the zip file, or both.
+    If content is None the file is already written and we only add it to the zip.
+    """
+    if content is not None and (self.__keep_files or not self.__zip_stream):
+      write_file(filename, content)
+    if self.__zip_stream:
+      self.__add_to_zip(self.__zip_stream, filename, content=content)
+
+  def __add_to_zip(self, zip_file, filename, src_path=None, content=None):
+    """internal"""
+    dest_path = os.path.relpath(filename, self.CONTENT_PATH % self.id)
+    self.log(message="add file to zip", file=os.path.basename(filename), zip_path=dest_path)
+
+    extension = os.path.splitext(filename)[1].lower()
+    compress_type = zipfile.ZIP_STORED if extension in COMPRESSED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    compress_level = None
+    if compress_type == zipfile.ZIP_STORED and self.__live_upload and self.__live_upload["future"]:
+      # when the zip file is uploaded as it's written, each entry's sizes come after its data
+      # and some zip readers only allow that for deflated entries, so we use deflate without
+      # compression instead of storing the file.
+      compress_type, compress_level = zipfile.ZIP_DEFLATED, 0
+
+    if content is None:
+      zip_file.write(src_path or filename, dest_path, compress_type=compress_type, compresslevel=compress_level)
+    else:
+      zip_file.writestr(dest_path, content, compress_type=compress_type, compresslevel=compress_level)
 
   def url_to_id(self, url):
     return _url_to_id(url, False)
@@ -1081,12 +1624,8 @@ class Bundle:
       # some characters aren't allowed in IDs, like `/`
       id = id.replace("/", "_")
     
-    node = None
-    for n in self.nodes:
-      if n.id == id:
-        node = n
-        break
-    
+    node = self.__nodes_by_id.get(id)
+
     if title:
       title = str(title).strip()
       if len(title) > 200:
@@ -1095,14 +1634,17 @@ class Bundle:
     if not node:
       node = BundleNode(id, bundle=self, title=title, desc=desc, content=content, tags=tags, alt_urls=alt_urls, index=index)
       self.nodes.append(node)
+      self.__nodes_by_id[id] = node
     
     if url:
       node.url = url
     if title:
       node.title = title
     if content:
-      if clean_html:
-        node.content = clean_up_html(content)
+      if clean_html and self.processes:
+        node.set_pending_content(self.__get_cleaner().submit(clean_up_html, content, self.html_parser))
+      elif clean_html:
+        node.content = clean_up_html(content, self.html_parser)
       else:
         node.content = content
     if type:
@@ -1116,6 +1658,21 @@ class Bundle:
     
     return node
   
+  def __get_cleaner(self):
+    """internal"""
+    if not self.__cleaner:
+      self.__cleaner = ProcessPoolExecutor(max_workers=self.processes)
+    return self.__cleaner
+
+  def __finish_cleaning(self):
+    """internal"""
+    if self.__cleaner:
+      # reading each node's content waits for its html to be cleaned.
+      for node in self.nodes:
+        node.content
+      self.__cleaner.shutdown()
+      self.__cleaner = None
+
   def print_tree(self, print_func=None, just_types=False):
     """
     Prints the bundle's hierarchy to the terminal.
@@ -1138,13 +1695,24 @@ class Bundle:
     else:
       traverse_tree(self, print_node)
 
-  def __wait_and_retry(self, status_code, wait):
-    """internal"""
-    if status_code == 429:
-      # todo: use the response headers to check if they tell us how long to wait.
-      self.log(message="got a 429 response", status_code=status_code, wait=wait)
-      time.sleep(wait)
-      return True
+  def __wait_and_retry(self, status_code, wait, attempt, started, timeout):
+    """
+    internal:
+    If we got a 429 response this waits and returns True so the caller can try again.
+    The wait starts at `wait` seconds and backs off exponentially. If `timeout` is set
+    we give up once we'd be waiting past that many seconds in total.
+    """
+    if status_code != 429:
+      return False
+
+    delay = backoff_delay(attempt, base=wait, max_backoff=max(wait, 60))
+    if timeout and time.time() - started + delay > timeout:
+      self.log(message="giving up after 429 responses", status_code=status_code, attempts=attempt)
+      return False
+
+    self.log(message="got a 429 response", status_code=status_code, wait=delay)
+    time.sleep(delay)
+    return True
 
   def load_html(self, url, cache=False, make_links_absolute=True, headers=None, wait=5, timeout=0):
     """
@@ -1159,12 +1727,14 @@ class Bundle:
     # todo: figure out if we should log the headers. these could be helpful to have later
     #       but they could also contain an API key or other sensitive data.
     self.log(message="calling load_html", url=url, cache=cache, make_links_absolute=make_links_absolute)
+    attempt = 0
+    started = time.time()
     while True:
-      doc, status_code = load_html(url, cache, make_links_absolute, headers)
+      attempt += 1
+      doc, status_code = load_html(url, cache, make_links_absolute, headers, self.html_parser)
       self.log(message="load_html response", url=url, status_code=status_code)
 
-      if self.__wait_and_retry(status_code, wait):
-        # todo: check if we've timed out.
+      if self.__wait_and_retry(status_code, wait, attempt, started, timeout):
         continue
       else:
         return doc
@@ -1180,12 +1750,14 @@ class Bundle:
     """
     self.log(message="calling http_get", url=url, cache=cache, timeout=timeout)
 
+    attempt = 0
+    started = time.time()
     while True:
+      attempt += 1
       content, status_code = http_get(url, cache, headers)
       self.log(message="http_get response", url=url, status_code=status_code)
 
-      if self.__wait_and_retry(status_code, wait):
-        # todo: check if we've timed out.
+      if self.__wait_and_retry(status_code, wait, attempt, started, timeout):
         continue
       else:
         return content
@@ -1200,12 +1772,14 @@ class Bundle:
     responses to disk so subsequent runs can use the cached data.
     """
     self.log(message="calling http_post", url=url, cache=cache, timeout=timeout)
+    attempt = 0
+    started = time.time()
     while True:
+      attempt += 1
       content, status_code = http_post(url, data, cache, headers)
       self.log(message="http_post response", url=url, status_code=status_code)
 
-      if self.__wait_and_retry(status_code, wait):
-        # todo: check if we've timed out.
+      if self.__wait_and_retry(status_code, wait, attempt, started, timeout):
         continue
       else:
         return content
@@ -1221,12 +1795,17 @@ class Bundle:
     # todo: make this have a 'cache' parameter.
     self.log(message="calling download_file", url=url, filename=filename)
 
+    attempt = 0
+    started = time.time()
     while True:
-      status_code, file_size = download_file(url, filename, headers, cache=cache)
+      attempt += 1
+      if self.resource_store:
+        status_code, file_size = self.resource_store.download(url, filename, headers)
+      else:
+        status_code, file_size = download_file(url, filename, headers, cache=cache)
       self.log(message="download_file response", url=url, filename=filename, status_code=status_code, file_size=file_size)
 
-      if self.__wait_and_retry(status_code, wait):
-        # todo: check if we've timed out.
+      if self.__wait_and_retry(status_code, wait, attempt, started, timeout):
         continue
       else:
         return status_code, file_size
@@ -1283,7 +1862,8 @@ class Bundle:
 
     return to_yaml(data)
 
-  def zip(self, download_func=None, compare_links=None, favor_boards=None, favor_sections=None, clean_html=True):
+  def zip(self, download_func=None, compare_links=None, favor_boards=None, favor_sections=None, clean_html=True, link_key=None, workers=1,
+          stream=False, keep_files=False, compression_level=None):
     """
     This wraps up the sync process. Calling this lets us know you're
     done adding content so we can do these things:
@@ -1293,8 +1873,47 @@ class Bundle:
     3. Clean up link/image URLs and download resources.
     4. Write the .html and .yaml files.
     5. Make a .zip archive with all the content.
+
+    Links become card-to-card links when they match a node's url or one of its
+    alt_urls. If urls in your content vary in ways that don't matter, pass a
+    `link_key` function that normalizes them, it's applied to both the node and
+    link urls:
+
+    ```
+    # ignore #fragments and trailing slashes.
+    bundle.zip(link_key=lambda url: url.split("#")[0].rstrip("/"))
+    ```
+
+    You can also pass a `compare_links(node, url)` function that returns True
+    if the url is a link to the node. It's only used for links that don't
+    match a url, and since it has to be called for every node, it's slower.
+
+    If your download_func is downloading lots of images, pass `workers` to process
+    that many cards at a time. Each file is only downloaded once, even if several
+    cards use it, and the output is the same no matter how many workers you use.
+    Your download_func needs to be safe to call from multiple threads.
+
+    Normally we write each file to the bundle's folder then add them all to the zip
+    file. For big bundles you can pass `stream=True` to write files straight into the
+    zip file instead, which avoids writing and reading everything twice. Files your
+    download_func downloads are still saved to disk first. If you want to use
+    view_in_browser() you also need `keep_files=True` so the card files are written.
+
+    `compression_level` is passed to zipfile (0-9, the default is 6). Files that are
+    already compressed, like images, are stored without compressing them again.
+
+    If you're going to upload the bundle, zip_and_upload() streams the zip file and
+    uploads it at the same time.
     """
 
+    # if the html is being cleaned up in other processes, wait for that to finish.
+    self.__finish_cleaning()
+
+    # incremental bundles reuse the files from the last run so we always keep them.
+    self.__streaming = stream
+    self.__keep_files = keep_files or not stream or self.incremental
+    self.__local_files = {}
+
     # todo: sort all nodes children by their 'index'.
     self.nodes.sort(key=lambda node: node.index)
     for node in self.nodes:
@@ -1310,20 +1929,56 @@ class Bundle:
       if node.type == CARD and not node.content.strip():
         node.removed = True
 
+    link_index = self.make_link_index(link_key) if clean_html else None
+    self.__unchanged = set()
+    if self.incremental:
+      previous = self.__load_manifest()
+      fingerprints = {node.id: node.get_fingerprint(clean_html) for node in self.nodes}
+      self.__unchanged = self.__find_unchanged_nodes(previous, fingerprints, link_index, link_key, compare_links)
+
     # 'clean html' is a little bit of a misnomer here. when you create a node,
     # we check the html and remove unnecessary tags and attributes. the operation
     # we're doing here is really resolving image and file links.
     # these are done for all nodes, the tree structure doesn't matter.
     if clean_html:
-      count = 0
-      for node in self.nodes:
-        count += 1
-        self.log(message="post-processing node %s / %s" % (count, len(self.nodes)), node=node.id)
+      self.__resource_loads = {}
+      nodes = [node for node in self.nodes if node.id not in self.__unchanged]
+
+      def post_process(count, node):
+        self.log(message="post-processing node %s / %s" % (count, len(nodes)), node=node.id)
         node.html_cleanup(
           download_func=download_func,
-          compare_links=compare_links
+          compare_links=compare_links,
+          link_index=link_index,
+          link_key=link_key
         )
 
+      if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bundle") as executor:
+          # calling list() makes us wait for them all and raises the first exception, if there is one.
+          list(executor.map(post_process, range(1, len(nodes) + 1), nodes))
+      else:
+        for count, node in enumerate(nodes, 1):
+          post_process(count, node)
+
+    if self.incremental:
+      self.__update_manifest(previous, fingerprints)
+
+    if stream:
+      self.__stream_zip(compression_level)
+    else:
+      self.__write_zip(compression_level)
+
+    self.__streaming = False
+    self.__unchanged = set()
+    if self.incremental:
+      self.__save_manifest()
+    if self.resource_store:
+      self.resource_store.save()
+    self.__write_csv()
+
+  def __write_zip(self, compression_level):
+    """internal: Writes all the files to the bundle's folder then zips them up."""
     for node in self.nodes:
       node.write_files()
     
@@ -1343,20 +1998,64 @@ class Bundle:
 
     # build the zip file.
     zip_path = self.ZIP_PATH % self.id
-    zip_file = zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True)
+    zip_file = zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True, compresslevel=compression_level)
     content_path = self.CONTENT_PATH % self.id
+    # the log and preview files from an earlier run might be in the folder but they don't go in the zip.
+    skip_paths = [self.CSV_PATH % self.id, self.CARD_PREVIEW_PATH % self.id]
     for root, dirs, files in os.walk(content_path):
-      for file in files:
-        if not file.startswith("."):
-          src_path = os.path.join(root, file)
-          dest_path = os.path.relpath(src_path, content_path)
-          self.log(message="add file to zip", file=file, zip_path=dest_path)
-          zip_file.write(src_path, dest_path)
+      # we sort these so the zip file's contents are always in the same order.
+      dirs.sort()
+      for file in sorted(files):
+        if not file.startswith(".") and os.path.join(root, file) not in skip_paths:
+          self.__add_to_zip(zip_file, os.path.join(root, file))
 
     zip_file.close()
-    self.__write_csv()
 
-  def upload(self, is_sync=False, name="", color="", desc="", collection_id=""):
+  def __stream_zip(self, compression_level):
+    """internal: Writes the files straight into the zip file."""
+    zip_path = self.ZIP_PATH % self.id
+    growing_file = None
+    if self.__live_upload and not self.__skip_upload(self.__live_upload["is_sync"]):
+      # the upload runs in another thread and reads the zip file as we write it.
+      growing_file = GrowingFile(zip_path)
+      executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bundle-upload")
+      self.__live_upload["future"] = executor.submit(
+        self.__upload_zip, self.__live_upload["collection_id"], self.__live_upload["is_sync"],
+        self.__live_upload["progress"], growing_file
+      )
+      executor.shutdown(wait=False)
+
+    zip_file = zipfile.ZipFile(growing_file or zip_path, "w", zipfile.ZIP_DEFLATED, allowZip64=True, compresslevel=compression_level)
+    self.__zip_stream = zip_file
+    error = None
+    try:
+      for node in self.nodes:
+        node.write_files()
+      self.write_bundle_file(self.COLLECTION_YAML_PATH % self.id, self.__make_collection_yaml())
+
+      # downloaded files are in the resources folder, local files may be somewhere else.
+      # two urls can have the same resource so we go by the paths.
+      for path in sorted(set(self.resources.values())):
+        filename = self.RESOURCE_PATH % (self.id, path[len("resources/"):])
+        src_path = self.__local_files.get(filename, filename)
+        if os.path.isfile(src_path):
+          self.__add_to_zip(zip_file, filename, src_path=src_path)
+    except BaseException as e:
+      error = e
+      raise
+    finally:
+      self.__zip_stream = None
+      try:
+        zip_file.close()
+      except BaseException as e:
+        error = error or e
+        raise
+      finally:
+        # if zipping failed, this makes the upload fail instead of sending a partial file.
+        if growing_file:
+          growing_file.finish(error)
+
+  def upload(self, is_sync=False, name="", color="", desc="", collection_id="", progress=None):
     """
     Uploads the zip file you generated to Guru.
 
@@ -1367,7 +2066,62 @@ class Bundle:
     there's not a collection matching that name it'll create one and you can
     provide the color and description to use for this new collection. You
     can also pass a collection_id instead of a name if you happen to know it.
+
+    The zip file is sent in chunks and `progress` is called with an UploadProgress
+    after each one. If a sync's connection drops or the server has a temporary
+    error, it's sent again from the zip file on disk, based on the Guru object's
+    retry policy. When it's done, `bundle.upload_stats` has the number of bytes
+    sent, how long it took, and the number of attempts.
+    """
+    collection_id = self.__get_collection_id(is_sync, name, color, desc, collection_id)
+
+    # a sync replaces the collection's content so if it's the same as last time we can skip it.
+    if self.__skip_upload(is_sync):
+      self.log(message="skipping upload, nothing changed since the last one")
+      return
+
+    result, stats = self.__upload_zip(collection_id, is_sync, progress)
+    return self.__finish_upload(is_sync, result, stats)
+
+  def zip_and_upload(self, is_sync=False, name="", color="", desc="", collection_id="", progress=None, **kwargs):
     """
+    Zips the bundle and uploads it at the same time. The zip file is streamed (like
+    `zip(stream=True)`) and sent as it's written, so for big bundles the upload is
+    mostly done by the time the last files are compressed. This takes the same
+    arguments as upload() and zip():
+
+    ```
+    bundle.zip_and_upload(name="General", is_sync=True, download_func=download)
+    ```
+
+    The zip file is still written to disk so if the upload fails you can call
+    upload() to try again without zipping everything again.
+    """
+    collection_id = self.__get_collection_id(is_sync, name, color, desc, collection_id)
+    self.__live_upload = {
+      "collection_id": collection_id,
+      "is_sync": is_sync,
+      "progress": progress,
+      "future": None
+    }
+    try:
+      self.zip(stream=True, **kwargs)
+    finally:
+      live_upload = self.__live_upload
+      self.__live_upload = None
+
+    if not live_upload["future"]:
+      self.log(message="skipping upload, nothing changed since the last one")
+      return
+    result, stats = live_upload["future"].result()
+    return self.__finish_upload(is_sync, result, stats)
+
+  def __skip_upload(self, is_sync):
+    """internal"""
+    return is_sync and self.__manifest and self.__manifest["uploaded"]
+
+  def __get_collection_id(self, is_sync, name, color, desc, collection_id):
+    """internal"""
     if name and not collection_id:
       # get the team's list of collections and find the one matching this name.
       collection = self.guru.get_collection(name)
@@ -1382,18 +2136,43 @@ class Bundle:
     
     if not collection_id:
       raise BaseException("collection_id is required")
-    
-    return self.guru.upload_content(
+    return collection_id
+
+  def __upload_zip(self, collection_id, is_sync, progress, growing_file=None):
+    """internal"""
+    last_progress = []
+    def on_progress(upload_progress):
+      if not last_progress:
+        last_progress.append(upload_progress)
+      if progress:
+        progress(upload_progress)
+
+    result = self.guru.upload_content(
       collection=collection_id,
       filename="collection_%s.zip" % self.id,
       zip_path=self.ZIP_PATH % self.id,
-      is_sync=is_sync
+      is_sync=is_sync,
+      progress=on_progress,
+      growing_file=growing_file
     )
+
+    return result, last_progress[0].stats() if last_progress else None
+
+  def __finish_upload(self, is_sync, result, stats):
+    """internal: this is done on the main thread since zip() also writes the log and manifest."""
+    if stats:
+      self.upload_stats = stats
+      self.log(message="uploaded zip file", **stats)
+
+    if is_sync and self.__manifest and result is not None and not self.guru.dry_run:
+      self.__manifest["uploaded"] = True
+      self.__save_manifest()
+    return result
   
   def build_spreadsheet(self):
     """internal"""
     rows = []
-    traverse_tree(self, make_spreadsheet, rows=rows)
+    traverse_tree(self, make_spreadsheet, rows=rows, counts=count_descendants(self))
 
     # after the traversal, rows is a list of lists. we have to convert:
     # - the values to strings.
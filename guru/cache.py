@@ -0,0 +1,447 @@
+import os
+import re
+import json
+import zlib
+import time
+import sqlite3
+import threading
+
+from collections import OrderedDict
+from requests.structures import CaseInsensitiveDict
+
+# how much response data we keep in memory before the least recently used responses are dropped.
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+# the on-disk cache can hold a lot more.
+DEFAULT_DISK_MAX_BYTES = 256 * 1024 * 1024
+
+# how many seconds a cached response is used for, unless its url matches one of the patterns below.
+DEFAULT_TTL = 300
+
+# these things rarely change so we can keep them around for longer.
+DEFAULT_TTLS = {
+    r"/whoami$": 3600,
+    r"/collections$": 900,
+    r"/groups$": 900,
+    r"/tagcategories$": 900,
+}
+
+
+class CachedResponse:
+  """
+  A copy of a response we can keep in the cache. It has the same properties
+  we use from a requests.Response object (status_code, headers, content, and json())
+  but doesn't hold on to the connection or anything else.
+  """
+
+  def __init__(self, status_code, headers, content, url):
+    self.status_code = status_code
+    self.headers = CaseInsensitiveDict(headers or {})
+    self.content = content or b""
+    self.url = url
+
+  @classmethod
+  def from_response(cls, response):
+    return cls(response.status_code, dict(response.headers), response.content, response.url)
+
+  @property
+  def text(self):
+    return self.content.decode("utf-8")
+
+  @property
+  def ok(self):
+    return self.status_code < 400
+
+  @property
+  def has_validators(self):
+    """True if the response has an ETag or Last-Modified header we can use to revalidate it."""
+    return bool(self.headers.get("ETag") or self.headers.get("Last-Modified"))
+
+  def conditional_headers(self):
+    """
+    Returns the headers that ask the server to only send the response again if it
+    changed. If it didn't, we get a 304 response with no body and we keep using this one.
+    """
+    headers = {}
+    if self.headers.get("ETag"):
+      headers["If-None-Match"] = self.headers["ETag"]
+    if self.headers.get("Last-Modified"):
+      headers["If-Modified-Since"] = self.headers["Last-Modified"]
+    return headers
+
+  @property
+  def size(self):
+    """An estimate of how many bytes this response uses."""
+    return len(self.content) + len(self.url or "") + sum(len(k) + len(v) for k, v in self.headers.items())
+
+  def json(self):
+    return json.loads(self.content)
+
+
+class ResponseCache:
+  """
+  Stores responses from GET calls so calls made with `cache=True` don't have to
+  hit the API again. The Guru object makes one of these by default but you can
+  make your own to change its limits or to share it between Guru objects:
+
+  ```
+  # keep up to 100 MB of responses, for 10 minutes each, but keep the list of
+  # collections for an hour.
+  cache = guru.ResponseCache(max_bytes=100 * 1024 * 1024, ttl=600, ttls={
+    r"/collections$": 3600
+  })
+  g = guru.Guru(response_cache=cache)
+  ```
+
+  `ttls` maps regular expressions to the number of seconds responses for matching
+  urls are kept. A ttl of None means those responses don't expire. Once the cache
+  is holding `max_bytes` of data, the least recently used responses are dropped.
+
+  Responses that have an ETag or Last-Modified header are kept after they expire.
+  The next time we need one of them we ask the server if it changed and, if it didn't,
+  we keep using the copy we have. These are counted as hits and as revalidations.
+
+  You can check how well the cache is working by calling `stats()`.
+  """
+
+  def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL, ttls=None):
+    self.max_bytes = max_bytes
+    self.ttl = ttl
+    self.ttls = DEFAULT_TTLS if ttls is None else ttls
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.revalidations = 0
+    self.size = 0
+
+    # entries are kept in the order they were used so the first one is the
+    # one we drop when we're over the limit. we also track which keys share a
+    # path so we can invalidate a url no matter what querystring it had.
+    self.__entries = OrderedDict()
+    self.__paths = {}
+    self.__lock = threading.RLock()
+
+  def __contains__(self, key):
+    return key in self.__entries
+
+  def get_ttl(self, key):
+    """Returns the number of seconds we keep the response for this key."""
+    path = key.split("?")[0]
+    for pattern, ttl in self.ttls.items():
+      if re.search(pattern, path):
+        return ttl
+    return self.ttl
+
+  def get(self, key):
+    """Returns the cached response for this key, or None if there isn't one or it expired."""
+    with self.__lock:
+      entry = self.__entries.get(key)
+      if entry:
+        response, expires = entry
+        if expires is None or expires > time.time():
+          self.hits += 1
+          self.__entries.move_to_end(key)
+          return response
+
+        # if the server can tell us the response hasn't changed, we keep it.
+        if not response.has_validators:
+          self.__remove(key)
+
+      self.misses += 1
+
+  def get_stale(self, key):
+    """Returns the response for this key, even if it expired, if it can be revalidated."""
+    with self.__lock:
+      entry = self.__entries.get(key)
+      if entry and entry[0].has_validators:
+        return entry[0]
+
+  def refresh(self, key, missed=False, headers=None):
+    """
+    Called when the server tells us a response hasn't changed (a 304 response) so
+    we can keep using it for another ttl. This counts as a hit and, if a call to get()
+    already counted this as a miss, pass missed=True so it's not counted as both.
+    The 304 response's headers can be passed to update the ones we have stored.
+    """
+    with self.__lock:
+      entry = self.__entries.get(key)
+      if not entry:
+        return
+
+      response = entry[0]
+      if headers:
+        for name in ["ETag", "Last-Modified", "Date", "Cache-Control"]:
+          if headers.get(name):
+            response.headers[name] = headers[name]
+
+      ttl = self.get_ttl(key)
+      self.__entries[key] = (response, None if ttl is None else time.time() + ttl)
+      self.__entries.move_to_end(key)
+      self.hits += 1
+      self.revalidations += 1
+      if missed:
+        self.misses -= 1
+
+  def set(self, key, response, ttl=None):
+    """Stores a response. If the ttl isn't provided it's based on the key's url."""
+    if ttl is None:
+      ttl = self.get_ttl(key)
+    expires = None if ttl is None else time.time() + ttl
+
+    with self.__lock:
+      self.__remove(key)
+
+      # a response that's too big for the cache would just push everything else out.
+      size = response.size
+      if size > self.max_bytes:
+        return
+
+      self.__entries[key] = (response, expires)
+      self.__paths.setdefault(key.split("?")[0], set()).add(key)
+      self.size += size
+
+      while self.size > self.max_bytes:
+        oldest_key = next(iter(self.__entries))
+        self.__remove(oldest_key)
+        self.evictions += 1
+
+  def invalidate(self, key):
+    """Removes the response for this key, plus responses for the same url with any querystring."""
+    with self.__lock:
+      for k in list(self.__paths.get(key.split("?")[0], [])):
+        self.__remove(k)
+
+  def clear(self):
+    """Removes all responses. The hit and miss counts are kept."""
+    with self.__lock:
+      self.__entries.clear()
+      self.__paths.clear()
+      self.size = 0
+
+  def stats(self):
+    """Returns a dict with the number of hits, misses, evictions, entries, and bytes in use."""
+    with self.__lock:
+      return {
+          "hits": self.hits,
+          "misses": self.misses,
+          "evictions": self.evictions,
+          "revalidations": self.revalidations,
+          "entries": len(self.__entries),
+          "bytes": self.size
+      }
+
+  def __remove(self, key):
+    """internal"""
+    entry = self.__entries.pop(key, None)
+    if not entry:
+      return
+
+    self.size -= entry[0].size
+    path = key.split("?")[0]
+    keys = self.__paths.get(path)
+    if keys:
+      keys.discard(key)
+      if not keys:
+        del self.__paths[path]
+
+
+class SqliteResponseCache(ResponseCache):
+  """
+  A ResponseCache that keeps responses in a SQLite database file so they're shared
+  by every script and process that uses the same file. This is useful when you have
+  lots of short scripts that each load the same things, like the list of collections
+  or groups, when they start:
+
+  ```
+  cache = guru.SqliteResponseCache("~/.guru/cache.db")
+  g = guru.Guru(response_cache=cache)
+
+  # only the first script to run in the next 15 minutes makes this call.
+  g.get_collections(cache=True)
+  ```
+
+  The database uses write-ahead logging so processes can read from it while another
+  one is writing. Responses are compressed and the ttl, ttls, and max_bytes parameters
+  work the same way they do for ResponseCache, except that when the file is too big we
+  drop the responses that were stored first (not the ones used least recently), so
+  reading from the cache never has to write to the file.
+
+  The hit, miss, and eviction counts in `stats()` are for this object only.
+  """
+
+  def __init__(self, filename, max_bytes=DEFAULT_DISK_MAX_BYTES, ttl=DEFAULT_TTL, ttls=None):
+    super().__init__(max_bytes, ttl, ttls)
+    self.filename = os.path.expanduser(filename)
+    directory = os.path.dirname(self.filename)
+    if directory and not os.path.exists(directory):
+      os.makedirs(directory, exist_ok=True)
+
+    # sqlite connections can't be shared between threads so each thread gets its own.
+    self.__local = threading.local()
+    self.__lock = threading.Lock()
+    self.__connect()
+
+  def __connect(self):
+    """internal"""
+    connection = getattr(self.__local, "connection", None)
+    if connection is None:
+      # the timeout is how long we wait if another process is writing.
+      connection = sqlite3.connect(self.filename, timeout=30)
+      connection.execute("PRAGMA journal_mode=WAL")
+      connection.execute("PRAGMA synchronous=NORMAL")
+      with connection:
+        connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+          key TEXT PRIMARY KEY,
+          path TEXT,
+          status_code INTEGER,
+          headers TEXT,
+          content BLOB,
+          url TEXT,
+          size INTEGER,
+          expires REAL,
+          stored REAL
+        )""")
+        # files made before we kept track of validators don't have this column.
+        columns = [row[1] for row in connection.execute("PRAGMA table_info(responses)")]
+        if "validators" not in columns:
+          connection.execute("ALTER TABLE responses ADD COLUMN validators INTEGER DEFAULT 0")
+        connection.execute("CREATE INDEX IF NOT EXISTS responses_path ON responses (path)")
+        connection.execute("CREATE INDEX IF NOT EXISTS responses_stored ON responses (stored)")
+      self.__local.connection = connection
+    return connection
+
+  def __count(self, counter, amount=1):
+    """internal"""
+    with self.__lock:
+      setattr(self, counter, getattr(self, counter) + amount)
+
+  def __contains__(self, key):
+    row = self.__connect().execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone()
+    return row is not None
+
+  def get(self, key):
+    """Returns the cached response for this key, or None if there isn't one or it expired."""
+    connection = self.__connect()
+    row = connection.execute(
+        "SELECT status_code, headers, content, url, expires, validators FROM responses WHERE key = ?", (key,)).fetchone()
+    if row:
+      status_code, headers, content, url, expires, validators = row
+      if expires is None or expires > time.time():
+        self.__count("hits")
+        return CachedResponse(status_code, json.loads(headers), zlib.decompress(content), url)
+
+      # if the server can tell us the response hasn't changed, we keep it.
+      if not validators:
+        with connection:
+          connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    self.__count("misses")
+
+  def get_stale(self, key):
+    """Returns the response for this key, even if it expired, if it can be revalidated."""
+    row = self.__connect().execute(
+        "SELECT status_code, headers, content, url FROM responses WHERE key = ? AND validators = 1", (key,)).fetchone()
+    if row:
+      status_code, headers, content, url = row
+      return CachedResponse(status_code, json.loads(headers), zlib.decompress(content), url)
+
+  def refresh(self, key, missed=False, headers=None):
+    """
+    Called when the server tells us a response hasn't changed (a 304 response) so
+    we can keep using it for another ttl. See ResponseCache.refresh() for details.
+    """
+    ttl = self.get_ttl(key)
+    expires = None if ttl is None else time.time() + ttl
+
+    connection = self.__connect()
+    with connection:
+      row = connection.execute("SELECT headers FROM responses WHERE key = ?", (key,)).fetchone()
+      if not row:
+        return
+
+      stored_headers = json.loads(row[0])
+      if headers:
+        for name in ["ETag", "Last-Modified", "Date", "Cache-Control"]:
+          if headers.get(name):
+            stored_headers[name] = headers[name]
+      connection.execute("UPDATE responses SET expires = ?, headers = ? WHERE key = ?",
+                         (expires, json.dumps(stored_headers), key))
+
+    self.__count("hits")
+    self.__count("revalidations")
+    if missed:
+      self.__count("misses", -1)
+
+  def set(self, key, response, ttl=None):
+    """Stores a response. If the ttl isn't provided it's based on the key's url."""
+    if ttl is None:
+      ttl = self.get_ttl(key)
+    now = time.time()
+    expires = None if ttl is None else now + ttl
+
+    headers = json.dumps(dict(response.headers))
+    content = zlib.compress(response.content)
+    size = len(content) + len(headers) + len(response.url or "")
+
+    connection = self.__connect()
+    with connection:
+      if size > self.max_bytes:
+        connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+        return
+
+      connection.execute("""INSERT OR REPLACE INTO responses
+        (key, path, status_code, headers, content, url, size, expires, stored, validators)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", (
+          key, key.split("?")[0], response.status_code, headers, content, response.url, size, expires, now,
+          1 if response.has_validators else 0
+      ))
+      self.__prune(connection, now)
+
+  def __prune(self, connection, now):
+    """internal: Removes expired responses we can't revalidate and, if we're over the size limit, the oldest ones."""
+    connection.execute("DELETE FROM responses WHERE expires < ? AND validators = 0", (now,))
+    total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= self.max_bytes:
+      return
+
+    evicted = []
+    for key, size in connection.execute("SELECT key, size FROM responses ORDER BY stored"):
+      if total <= self.max_bytes:
+        break
+      evicted.append((key,))
+      total -= size
+
+    connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+    self.__count("evictions", len(evicted))
+
+  def invalidate(self, key):
+    """Removes the response for this key, plus responses for the same url with any querystring."""
+    connection = self.__connect()
+    with connection:
+      connection.execute("DELETE FROM responses WHERE path = ?", (key.split("?")[0],))
+
+  def clear(self):
+    """Removes all responses. The hit and miss counts are kept."""
+    connection = self.__connect()
+    with connection:
+      connection.execute("DELETE FROM responses")
+
+  def stats(self):
+    """Returns a dict with the number of hits, misses, evictions, entries, and bytes in use."""
+    entries, size = self.__connect().execute(
+        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    return {
+        "hits": self.hits,
+        "misses": self.misses,
+        "evictions": self.evictions,
+        "revalidations": self.revalidations,
+        "entries": entries,
+        "bytes": size
+    }
+
+  def close(self):
+    """Closes this thread's connection to the database."""
+    connection = getattr(self.__local, "connection", None)
+    if connection is not None:
+      connection.close()
+      self.__local.connection = None
@@ -6,10 +6,14 @@ import re
 from string import capwords
 import sys
 import time
+import json
 import base64
+import queue
+import threading
 import requests
 import mimetypes
 
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
 if sys.version_info.major >= 3:
@@ -18,8 +22,13 @@ else:
   from urlparse import quote
 
 from guru.bundle import Bundle
+from guru.retry import RetryPolicy, RateLimiter
+from guru.cache import ResponseCache, CachedResponse
+from guru.batch import Batch
+from guru.errors import GuruError
+from guru.upload import MultipartUpload
 from guru.data_objects import Board, BoardGroup, BoardPermission, Card, CardComment, Collection, CollectionAccess, Draft, Folder, FolderPermission, Group, HomeBoard, Tag, User, Question, Framework
-from guru.util import clean_slug, download_file, find_by_name_or_id, find_by_email, find_by_id, format_timestamp, TRACKING_HEADERS
+from guru.util import clean_slug, download_file, find_by_name_or_id, find_by_email, find_by_id, format_timestamp, get_html_parser, TRACKING_HEADERS, DEFAULT_HTML_PARSER
 
 # collection colors
 # many of the names come from http://chir.ag/projects/name-that-color/
@@ -45,6 +54,11 @@ VERIFIED = TRUSTED
 NEEDS_VERIFICATION = "NEEDS_VERIFICATION"
 UNVERIFIED = NEEDS_VERIFICATION
 
+# the default (connect, read) timeout, in seconds, for calls made to guru's api.
+# the read timeout is generous because some calls, like content uploads, can
+# take a while before the server responds.
+DEFAULT_TIMEOUT = (10, 300)
+
 
 def make_blue(*args):
   return " ".join(["\033[94m%s\033[0m" % text for text in args])
@@ -132,6 +146,21 @@ def parse_expression(values, type, key):
   return expression
 
 
+class PaginationError(GuruError):
+  """
+  Raised when a page of a paginated call fails. It keeps the results from the
+  pages that were already loaded, plus the url of the page that failed, so you
+  don't lose that work. The iter_* methods already gave you the earlier pages'
+  results, so for them `results` is empty and only `url` is set.
+  """
+
+  def __init__(self, response, results, url):
+    super().__init__("error response", response)
+    self.response = response
+    self.results = results
+    self.url = url
+
+
 class DummyResponse:
   def __init__(self, status_code=200):
     self.headers = {}
@@ -154,9 +183,37 @@ class Guru:
   You can also store these values in the `GURU_USER` and `GURU_TOKEN` environment
   variables. If you're using environment variables you don't need to pass any parameters
   to the `Guru()` constructor.
+
+  All API calls made through this object share a single pooled, keep-alive connection
+  to Guru's API so scripts that make lots of calls don't pay for a new connection on
+  every call. `pool_size` is the number of connections to keep open (raise this if you're
+  making calls from several threads) and `timeout` is the default timeout, in seconds,
+  used for each call. It can be a single number or a (connect, read) tuple.
+
+  Calls that fail because of rate limiting (429 responses), temporary server errors,
+  or dropped connections are retried based on the `retry` policy, which honors the
+  `Retry-After` header and otherwise backs off exponentially. Pass a `RetryPolicy`
+  to change this or `retry=False` to turn it off. If you're running a bulk script you
+  can pass `rate_limit` (calls per second, or a `RateLimiter`) to stay under the API's
+  limit rather than bouncing off of it.
+
+  Calls that return many pages, like `find_cards()`, load one page at a time by default.
+  Set `prefetch_pages` to load up to that many pages ahead in the background while the
+  current page is being processed, which makes large listings much faster.
+
+  Successful GET calls are stored in a `ResponseCache` so calls that pass `cache=True`
+  can skip the API. The cache is limited in size and responses expire, see `ResponseCache`
+  for how to change these limits. Pass `response_cache=False` to turn it off or pass a
+  `SqliteResponseCache` to share cached responses between scripts and processes.
+
+  `html_parser` is the BeautifulSoup parser used for card content and bundles. It
+  defaults to python's built-in "html.parser", you can pass "lxml" (or "auto", which
+  uses lxml if it's installed) to make parsing faster. Well-formed card html comes
+  out the same either way, but the parsers fix broken html, like a <li> that isn't
+  closed, differently.
   """
 
-  def __init__(self, username="", api_token="", silent=False, dry_run=False, qa=False):
+  def __init__(self, username="", api_token="", silent=False, dry_run=False, qa=False, pool_size=10, timeout=DEFAULT_TIMEOUT, retry=None, rate_limit=None, prefetch_pages=0, response_cache=None, html_parser=DEFAULT_HTML_PARSER):
     self.username = username or os.environ.get(
         "PYGURU_USER", "") or os.environ.get("GURU_USER", "")
     self.api_token = api_token or os.environ.get(
@@ -165,7 +222,28 @@ class Guru:
     self.base_url = "https://qaapi.getguru.com/api/v1" if qa else "https://api.getguru.com/api/v1"
     self.hostname = "qaapi.getguru.com" if qa else "api.getguru.com"
     self.dry_run = dry_run
-    self.__cache = {}
+    self.timeout = timeout
+    self.prefetch_pages = prefetch_pages
+    self.pool_size = pool_size
+    self.session = self.__make_session(pool_size)
+    self.html_parser = get_html_parser(html_parser)
+
+    if retry is False:
+      self.retry = RetryPolicy(max_attempts=1)
+    else:
+      self.retry = retry or RetryPolicy()
+
+    if isinstance(rate_limit, RateLimiter):
+      self.rate_limiter = rate_limit
+    elif rate_limit:
+      self.rate_limiter = RateLimiter(rate_limit)
+    else:
+      self.rate_limiter = None
+
+    if response_cache is False:
+      self.response_cache = None
+    else:
+      self.response_cache = response_cache or ResponseCache()
 
     if self.dry_run:
       self.debug = True
@@ -174,6 +252,79 @@ class Guru:
     else:
       self.debug = True
 
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def close(self):
+    """
+    Closes the connections this object has open to Guru's API. You only need
+    to call this in long-running processes that create many Guru objects, you
+    can also use the Guru object as a context manager:
+
+    ```
+    with guru.Guru() as g:
+      g.get_collections()
+    ```
+    """
+    self.session.close()
+
+  def batch(self, workers=None):
+    """
+    Returns a Batch you can add calls to. The calls run in a pool of threads and
+    the results are collected in the order you added them. See `Batch` for details.
+
+    Args:
+            workers (int, optional): The number of calls to make at once. Defaults
+                    to the size of the connection pool (`pool_size`).
+    """
+    return Batch(workers or self.pool_size)
+
+  def map(self, func, items, workers=None):
+    """
+    Calls func for each item using a pool of threads and returns the results in
+    the same order as the items. If a call raises an exception we keep going and
+    you can find the exception in the result's `errors`.
+
+    ```
+    # load a lot of cards 8 at a time.
+    cards = g.map(g.get_card, card_ids, workers=8)
+    if not cards.ok:
+      print("%s cards failed to load" % len(cards.errors))
+    ```
+
+    Calls share this object's connection pool and rate limiter, so if you set
+    `rate_limit` the calls stay under it no matter how many workers you use.
+
+    Args:
+            func (function): The function to call, usually a method of this object like `g.get_card`.
+            items (list): The values to call the function with, one at a time.
+            workers (int, optional): The number of calls to make at once. Defaults
+                    to the size of the connection pool (`pool_size`).
+
+    Returns:
+            BatchResult: A list of results, one for each item.
+    """
+    with self.batch(workers) as batch:
+      for item in items:
+        batch.add(func, item)
+    return batch.results
+
+  def __make_session(self, pool_size):
+    """internal"""
+    session = requests.Session()
+    session.auth = self.__get_auth()
+    session.headers.update(TRACKING_HEADERS)
+
+    # the session keeps connections alive between calls and this adapter
+    # controls how many of them we keep around.
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
   def __is_id(self, value):
     """internal"""
     if re.match("[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", str(value)):
@@ -209,30 +360,106 @@ class Guru:
       self.__log(make_gray("  response status:",
                            response.status_code, "body:", response.content))
 
-  def __clear_cache(self, url):
+  def __cache_key(self, url):
     """internal"""
-    if self.__cache.get(url):
-      del self.__cache[url]
+    # a cache can be shared by Guru objects for different users.
+    return "%s %s" % (self.username, url)
+
+  def __clear_cache(self, url):
+    """internal: Removes cached responses for this url, whatever their querystring is."""
+    if self.response_cache:
+      self.response_cache.invalidate(self.__cache_key(url))
+
+  def __clear_cache_for_change(self, url):
+    """
+    internal:
+    Called after we make a change. Changing something like /groups/1234 means
+    our copies of it and the list it's in, /groups, are out of date. Changing
+    /cards/1234/tags/5678 means our copy of the card is out of date too, but
+    we keep the top-level list, /cards, because it wasn't changed directly.
+    """
+    url = url.split("?")[0].rstrip("/")
+    if not url.startswith(self.base_url + "/"):
+      self.__clear_cache(url)
+      return
+
+    path = url[len(self.base_url) + 1:].split("/")
+    for length in range(len(path), 0, -1):
+      if length == 1 and len(path) > 2:
+        break
+      self.__clear_cache("%s/%s" % (self.base_url, "/".join(path[:length])))
+
+  def __request(self, method, url, idempotent=None, **kwargs):
+    """
+    internal:
+    Makes a call using our session. This is where the rate limit is applied and
+    where failed calls are retried, based on the retry policy.
+    """
+    attempt = 0
+    while True:
+      attempt += 1
+      if self.rate_limiter:
+        self.rate_limiter.acquire()
+
+      # if we're retrying a file upload, the file needs to be read from the start again.
+      if attempt > 1 and kwargs.get("files"):
+        for value in kwargs["files"].values():
+          if isinstance(value, tuple) and hasattr(value[1], "seek"):
+            value[1].seek(0)
+
+      try:
+        response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+      except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as error:
+        if not self.retry.should_retry(method, attempt, idempotent=idempotent):
+          raise
+        delay = self.retry.get_delay(attempt)
+        self.__log(make_red("  %s call failed: %s, retrying in %.1fs" % (method, error, delay)))
+        time.sleep(delay)
+        continue
+
+      if not self.retry.should_retry(method, attempt, response.status_code, idempotent):
+        return response
+
+      delay = self.retry.get_delay(attempt, response)
+      self.__log(make_gray("  response status:", response.status_code,
+                           "retrying in %.1fs (attempt %s of %s)" % (delay, attempt + 1, self.retry.max_attempts)))
+
+      # a 429 applies to the whole client so we make every thread wait, not just this one.
+      if response.status_code == 429 and self.rate_limiter:
+        self.rate_limiter.pause(delay)
+      time.sleep(delay)
 
   def __get(self, url, cache=False):
     """internal"""
-    if cache:
-      # if we don't have a response for this call in our cache,
-      # make the call and store the response.
-      if not self.__cache.get(url):
-        self.__log(make_gray("  making a get call:", url))
-        self.__cache[url] = requests.get(
-            url, auth=self.__get_auth(), headers=TRACKING_HEADERS)
-      else:
-        self.__log(make_gray("  using cached get call:", url))
-      return self.__cache[url]
-    else:
-      self.__log(make_gray("  making a get call:", url))
-      response = requests.get(
-          url, auth=self.__get_auth(), headers=TRACKING_HEADERS)
-      self.__cache[url] = response
-      self.__log_response(response)
-      return response
+    key = self.__cache_key(url)
+    headers = {}
+    stale = None
+    if self.response_cache:
+      if cache:
+        response = self.response_cache.get(key)
+        if response:
+          self.__log(make_gray("  using cached get call:", url))
+          return response
+
+      # if we have an old copy of this response, we ask the server to only send it
+      # again if it changed. if it didn't, we get an empty 304 response and use our copy.
+      stale = self.response_cache.get_stale(key)
+      if stale:
+        headers = stale.conditional_headers()
+
+    self.__log(make_gray("  making a get call:", url))
+    response = self.__request("GET", url, headers=headers)
+    self.__log_response(response)
+
+    if stale and response.status_code == 304:
+      self.response_cache.refresh(key, missed=cache, headers=response.headers)
+      return stale
+
+    # we store successful responses even if the caller didn't want a cached
+    # one so a later call that's ok with using the cache can use this one.
+    if self.response_cache and int(response.status_code / 100) == 2:
+      self.response_cache.set(key, CachedResponse.from_response(response))
+    return response
 
   def __put(self, url, data=None):
     """internal"""
@@ -241,9 +468,9 @@ class Guru:
       return DummyResponse()
 
     self.__log(make_gray("  making a put call:", url, data))
-    response = requests.put(
-        url, json=data, auth=self.__get_auth(), headers=TRACKING_HEADERS)
+    response = self.__request("PUT", url, json=data)
     self.__log_response(response)
+    self.__clear_cache_for_change(url)
     return response
 
   def __patch(self, url, data=None):
@@ -253,70 +480,129 @@ class Guru:
       return DummyResponse()
 
     self.__log(make_gray("  making a patch call:", url, data))
-    response = requests.patch(
-        url, json=data, auth=self.__get_auth(), headers=TRACKING_HEADERS)
+    response = self.__request("PATCH", url, json=data)
     self.__log_response(response)
+    self.__clear_cache_for_change(url)
     return response
 
-  def __post(self, url, data=None, files=None, is_really_get=False):
+  def __post(self, url, data=None, files=None, is_really_get=False, upload=None, idempotent=False):
     """internal"""
     if self.dry_run and not is_really_get:
       self.__log(make_gray("  would make a post call:", url, data))
       return DummyResponse()
 
+    # some post calls, like searches, only read data so they're safe to retry.
+    idempotent = is_really_get or idempotent
     self.__log(make_gray("  making a post call:", url, data))
-    if files:
-      response = requests.post(
-          url, files=files, auth=self.__get_auth(), headers=TRACKING_HEADERS)
-      self.__log_response(response)
-      return response
+    if upload:
+      response = self.__request("POST", url, idempotent=idempotent, data=upload,
+                                headers={"Content-Type": upload.content_type})
+    elif files:
+      response = self.__request("POST", url, idempotent=idempotent, files=files)
     else:
-      response = requests.post(
-          url, json=data, auth=self.__get_auth(), headers=TRACKING_HEADERS)
-      self.__log_response(response)
-      return response
-
-  def __get_and_get_all(self, url, cache=False, max_pages=500):
-    """internal"""
-    if cache and self.__cache.get(url):
-      self.__log(make_gray("  using cached get call:", url))
-      return self.__cache[url]
+      response = self.__request("POST", url, idempotent=idempotent, json=data)
+    self.__log_response(response)
 
-    original_url = url
-    results = []
-    auth = self.__get_auth()
-    page = 0
+    if not is_really_get:
+      self.__clear_cache_for_change(url)
+    return response
 
-    while url:
-      page += 1
-      self.__log("loading page:", page)
-      response = self.__get(url)
-      if status_to_bool(response.status_code):
-        if response.status_code != 204:
-          results += response.json()
-      else:
-        raise BaseException("error response", response)
-      url = get_link_header(response)
+  def __fetch_page(self, url, data=None, cache=False):
+    """internal"""
+    if data is None:
+      return self.__get(url, cache)
+    else:
+      return self.__post(url, data, is_really_get=True)
+
+  def __fetch_pages(self, url, data=None, max_pages=None, cache=False):
+    """
+    internal:
+    Yields a (url, response) pair for each page. Each response's Link header has
+    the url for the next page so we can't request pages in parallel, but if
+    prefetch_pages is set we load pages in a background thread so the next page
+    is on its way while the caller decodes and processes the current one.
+    """
+    if not self.prefetch_pages:
+      page = 0
+      while url:
+        page += 1
+        self.__log("loading page:", page)
+        response = self.__fetch_page(url, data, cache)
+        yield url, response
+
+        if not status_to_bool(response.status_code) or page == max_pages:
+          break
+        url = get_link_header(response)
+      return
 
-      if page >= max_pages:
-        break
+    # the queue's size is how many pages the background thread can get ahead by.
+    pages = queue.Queue(maxsize=self.prefetch_pages)
+    stopped = threading.Event()
+
+    def put(item):
+      # if the caller stops early (e.g. they only needed the first page) the queue
+      # may stay full so we keep checking if we should give up.
+      while not stopped.is_set():
+        try:
+          pages.put(item, timeout=0.1)
+          return True
+        except queue.Full:
+          pass
+      return False
 
-    self.__cache[original_url] = results
-    return results
+    def load_pages(url):
+      page = 0
+      try:
+        while url and not stopped.is_set():
+          page += 1
+          self.__log("loading page:", page)
+          response = self.__fetch_page(url, data, cache)
+          if not put((url, response, None)):
+            return
+          if not status_to_bool(response.status_code) or page == max_pages:
+            break
+          url = get_link_header(response)
+      except BaseException as error:
+        put((url, None, error))
+        return
+      put((None, None, None))
+
+    thread = threading.Thread(target=load_pages, args=(url,), daemon=True)
+    thread.start()
+    try:
+      while True:
+        page_url, response, error = pages.get()
+        if error:
+          raise error
+        if not page_url:
+          break
+        yield page_url, response
+    finally:
+      stopped.set()
+
+  def __iter_pages(self, url, data=None, max_pages=None, cache=False):
+    """internal: Yields the list of results from each page."""
+    # this doesn't keep the pages it yielded so the iter_* methods use a bounded amount of
+    # memory. the callers that return a list fill in the error's results themselves.
+    for page_url, response in self.__fetch_pages(url, data, max_pages, cache):
+      if not status_to_bool(response.status_code):
+        raise PaginationError(response, [], page_url)
+      if response.status_code != 204:
+        yield response.json()
 
-  def __post_and_get_all(self, url, data):
+  def __get_and_get_all(self, url, cache=False, max_pages=500):
     """internal"""
+    # each page is cached separately, along with its link to the next page,
+    # so if cache=True we can follow those links through the cache.
     results = []
-    auth = self.__get_auth()
-    page = 0
-
-    while url:
-      page += 1
-      self.__log("loading page:", page)
-      response = self.__post(url, data, is_really_get=True)
-      if response.status_code != 204:
-        results += response.json()
-      url = get_link_header(response)
+    try:
+      for page in self.__iter_pages(url, max_pages=max_pages, cache=cache):
+        results += page
+    except PaginationError as error:
+      # by now the call has already been retried so we give up, but we keep
+      # the pages we have in case the caller wants to use them or resume.
+      error.results = results
+      raise
 
     return results
 
@@ -327,8 +613,9 @@ class Guru:
       return DummyResponse(204)
 
     self.__log(make_gray("  making a delete call:", url, data))
-    response = requests.delete(url, json=data, auth=self.__get_auth())
+    response = self.__request("DELETE", url, json=data)
     self.__log_response(response)
+    self.__clear_cache_for_change(url)
     return response
 
   def get_frameworks(self, cache=False):
@@ -639,31 +926,41 @@ class Guru:
 
     return result
 
-  def upload_content(self, collection, filename, zip_path, is_sync=False):
-    """internal: used by the bundle object"""
+  def upload_content(self, collection, filename, zip_path, is_sync=False, progress=None, growing_file=None):
+    """
+    internal: used by the bundle object.
+
+    The zip file is streamed from disk, `progress` is called with an UploadProgress
+    after each chunk is sent, and `growing_file` is set when the zip file is still
+    being written.
+    """
     collection_obj = self.get_collection(collection)
     if not collection_obj:
       self.__log(make_red("could not find collection:", collection))
       return
 
-    with open(zip_path, "rb") as file_in:
-      file_key = "file" if is_sync else "contentFile"
-      files = {
-          file_key: (filename, file_in, "application/zip")
-      }
+    file_key = "file" if is_sync else "contentFile"
+    upload = MultipartUpload(file_key, filename, zip_path, "application/zip",
+                             callback=progress, growing_file=growing_file)
 
-      # there's a slightly different url for syncs vs. imports.
-      route = "contentsyncupload" if is_sync else "contentupload"
-      url = "https://%s/app/%s?collectionId=%s" % (
-          self.hostname, route, collection_obj.id)
-      response = self.__post(url, files=files)
+    # there's a slightly different url for syncs vs. imports.
+    route = "contentsyncupload" if is_sync else "contentupload"
+    url = "https://%s/app/%s?collectionId=%s" % (
+        self.hostname, route, collection_obj.id)
 
-      if not status_to_bool(response.status_code):
-        raise BaseException("%s returned a %s response: %s" % (
-            route, response.status_code, response.text
-        ))
-      else:
-        return response.json()
+    # a sync replaces the collection's content so sending it twice is the same as
+    # sending it once, which makes it safe to retry if the connection drops.
+    response = self.__post(url, upload=upload, idempotent=is_sync)
+
+    if not status_to_bool(response.status_code):
+      raise BaseException("%s returned a %s response: %s" % (
+          route, response.status_code, response.text
+      ))
+
+    stats = upload.progress.stats()
+    self.__log(make_gray("  uploaded %s bytes in %.1fs (%.0f bytes/sec, %s attempts)" % (
+        stats["bytes"], stats["seconds"], stats["bytes_per_second"], stats["attempts"])))
+    return response.json()
 
   def get_group(self, group, cache=False):
     """
@@ -811,12 +1108,21 @@ class Guru:
             list of User: a list of users on the team.
     """
 
-    members = []
     url = "%s/members?search=%s" % (self.base_url, quote(search))
     users = self.__get_and_get_all(url, cache)
     users = [User(u) for u in users]
     return users
 
+  def iter_members(self, search=""):
+    """
+    Same as get_members() but it's a generator that yields each user as its
+    page of results is loaded.
+    """
+    url = "%s/members?search=%s" % (self.base_url, quote(search))
+    for page in self.__iter_pages(url):
+      for user in page:
+        yield User(user)
+
   def __invite_user(self, email, *groups, is_light_user=False):
     """
     Internal
@@ -1268,7 +1574,54 @@ class Guru:
       except:
         return None
 
-  def get_cards(self, card_ids):
+  def get_cards(self, card_ids, cache=False, workers=None):
+    """
+    Loads a list of cards by ID. The API only loads 50 cards per call so we split
+    the IDs into batches of 50 and load the batches at the same time.
+
+    Args:
+            card_ids (list of str): The IDs of the cards to load. Duplicates are only loaded once.
+            cache (bool, optional): True if it's ok to use cards we've recently loaded
+                    instead of loading them again. Defaults to False.
+            workers (int, optional): The number of batches to load at once. Defaults
+                    to the size of the connection pool (`pool_size`).
+
+    Returns:
+            dict: A dict where each key is a card ID and the value is the Card object.
+    """
+    cards = {}
+    unloaded_ids = []
+    for card_id in card_ids:
+      if card_id in cards:
+        continue
+
+      cached = self.response_cache.get(self.__cache_key(self.__card_url(card_id))) \
+          if cache and self.response_cache else None
+      if cached:
+        cards[card_id] = Card(cached.json(), guru=self)
+      else:
+        cards[card_id] = None
+        unloaded_ids.append(card_id)
+
+    batches = [unloaded_ids[i:i + 50] for i in range(0, len(unloaded_ids), 50)]
+    if len(batches) == 1:
+      results = [self.__get_card_batch(batches[0])]
+    elif batches:
+      results = self.map(self.__get_card_batch, batches, workers)
+      results.raise_errors()
+    else:
+      results = []
+
+    for batch in results:
+      cards.update(batch)
+    return {id: card for id, card in cards.items() if card}
+
+  def __card_url(self, card_id):
+    """internal"""
+    return "%s/cards/%s" % (self.base_url, card_id)
+
+  def __get_card_batch(self, card_ids):
+    """internal"""
     url = "%s/cards/bulk" % self.base_url
     data = {
         "ids": card_ids
@@ -1279,11 +1632,21 @@ class Guru:
     # this returns a dict where each key is a card ID and the value
     # is the card object plus a 'status' field, so we convert the
     # nested card objects to instances of the Card class.
-    if status_to_bool(response.status_code):
-      return {id: Card(obj) for id, obj in response.json().items()}
-    else:
+    if not status_to_bool(response.status_code):
       return {}
 
+    cards = {}
+    for card_id, obj in response.json().items():
+      cards[card_id] = Card(obj, guru=self)
+
+      # we keep a copy of each card so get_cards(cache=True) can use it. saving
+      # the card, or changing its tags, clears this because they change /cards/{id}.
+      if self.response_cache:
+        card_url = self.__card_url(card_id)
+        self.response_cache.set(self.__cache_key(card_url), CachedResponse(
+            200, {}, json.dumps(obj).encode("utf-8"), card_url))
+    return cards
+
   def get_visible_cards(self):
     """
     Gets the count of all cards on the team where you have read access or higher.
@@ -1347,11 +1710,13 @@ class Guru:
     return card.save()
 
   def find_card(self, **kwargs):
-    cards = self.find_cards(**kwargs)
+    # we only need the first card so we stop after the first page.
+    cards = self.iter_cards(**kwargs)
+    card = next(cards, None)
+    cards.close()
     if self.dry_run:
       return Card({}, guru=self)
-    if cards:
-      return cards[0]
+    return card
 
   def find_cards(
       self, title="", tag="", collection="", author="", verified=None, unverified=None,
@@ -1400,6 +1765,60 @@ class Guru:
     Returns:
             list of Card: The cards that matched the parameters you provided.
     """
+    cards = []
+    try:
+      for card in self.iter_cards(
+          title=title, tag=tag, collection=collection, author=author,
+          verified=verified, unverified=unverified, created_before=created_before,
+          created_after=created_after, last_modified_before=last_modified_before,
+          last_modified_after=last_modified_after, last_modified_by=last_modified_by,
+          archived=archived, board_count=board_count, share_status=share_status
+      ):
+        cards.append(card)
+    except PaginationError as error:
+      # like get_* calls, we keep the cards from the pages we already loaded.
+      error.results = cards
+      raise
+
+    return cards
+
+  def iter_cards(
+      self, title="", tag="", collection="", author="", verified=None, unverified=None,
+      created_before=None, created_after=None, last_modified_before=None, last_modified_after=None,
+      last_modified_by=None, archived=False, board_count=None, share_status=None
+  ):
+    """
+    Same as find_cards() but it's a generator that yields each card as its page
+    of results is loaded. This keeps memory use flat for large teams and lets
+    you stop early without loading every page.
+
+    ```
+    for card in g.iter_cards(collection="Engineering"):
+      if card.title == "Onboarding":
+        break
+    ```
+    """
+    data = self.__make_card_query(
+        title=title, tag=tag, collection=collection, author=author,
+        verified=verified, unverified=unverified, created_before=created_before,
+        created_after=created_after, last_modified_before=last_modified_before,
+        last_modified_after=last_modified_after, last_modified_by=last_modified_by,
+        archived=archived, board_count=board_count, share_status=share_status
+    )
+    if data is None:
+      return
+
+    url = "%s/search/cardmgr" % self.base_url
+    for page in self.__iter_pages(url, data):
+      for card in page:
+        yield Card(card, guru=self)
+
+  def __make_card_query(
+      self, title="", tag="", collection="", author="", verified=None, unverified=None,
+      created_before=None, created_after=None, last_modified_before=None, last_modified_after=None,
+      last_modified_by=None, archived=False, board_count=None, share_status=None
+  ):
+    """internal: Builds the card manager search for find_cards(), or returns None if the tag doesn't exist."""
     if archived:
       data = {
           "queryType": "archived",
@@ -1434,7 +1853,7 @@ class Guru:
       tag_obj = self.get_tag(tag)
       if not tag_obj:
         self.__log(make_red("could not find tag:", tag))
-        return []
+        return
 
       nested_expressions.append({
           "type": "tag",
@@ -1534,9 +1953,7 @@ class Guru:
           "type": "grouping"
       }
 
-    url = "%s/search/cardmgr" % self.base_url
-    cards = self.__post_and_get_all(url, data)
-    return [Card(c, guru=self) for c in cards]
+    return data
 
   def upload_file(self, filename):
     """
@@ -2084,6 +2501,9 @@ class Guru:
         }
     }
     response = self.__post(url, data)
+
+    # the tag bulkop isn't under /tagcategories so we clear it ourselves.
+    self.__clear_cache("%s/teams/%s/tagcategories" % (self.base_url, self.get_team_id()))
     return status_to_bool(response.status_code)
 
   def merge_tags(self, *tags):
@@ -2117,6 +2537,9 @@ class Guru:
         }
     }
     response = self.__post(url, data)
+
+    # the tag bulkop isn't under /tagcategories so we clear it ourselves.
+    self.__clear_cache("%s/teams/%s/tagcategories" % (self.base_url, self.get_team_id()))
     return status_to_bool(response.status_code)
 
   def add_tag_to_card(self, tag, card, create=False):
@@ -2189,12 +2612,17 @@ class Guru:
     response = self.__delete(url)
     return status_to_bool(response.status_code)
 
-  def get_board(self, board, collection=None, board_group=None, cache=True):
+  def get_board(self, board, collection=None, board_group=None, cache=True, cache_cards=False):
     """
     Loads a board.
 
     Args:
             id (str): The board's full ID or slug.
+            cache (bool, optional): True if it's ok to use the list of boards we loaded
+                    recently to find the board by its title. Defaults to True.
+            cache_cards (bool, optional): A board only includes the first 50 cards in full
+                    and the others are loaded separately. Set this to True if it's ok to use
+                    cards we've recently loaded for those. Defaults to False.
 
     Returns:
             Board: An object representing the board.
@@ -2209,7 +2637,7 @@ class Guru:
       url = "%s/boards/%s" % (self.base_url, board)
       response = self.__get(url)
       if status_to_bool(response.status_code):
-        return Board(response.json(), guru=self)
+        return Board(response.json(), guru=self, cache=cache_cards)
 
     # todo: use the 'collection' parameter as a way to also filter, in case the same board appears
     #       in more than one collection (board titles still aren't unique within a collection though).
@@ -2224,7 +2652,7 @@ class Guru:
 
     url = "%s/boards/%s" % (self.base_url, board_obj.id)
     response = self.__get(url)
-    return Board(response.json(), guru=self)
+    return Board(response.json(), guru=self, cache=cache_cards)
 
   def get_folder(self, folder, collection=None, cache=True):
     """
@@ -2274,6 +2702,21 @@ class Guru:
         List: An list object representing the items in the folder.  The Folder object will create the underlying Folder and Card objects
     """
 
+    url = self.__get_folder_items_url(folder_id, cardDetail)
+    return self.__get_and_get_all(url, cache)
+
+  def iter_folder_items(self, folder_id, cardDetail="FULL"):
+    """
+    Same as get_folder_items() but it's a generator that yields each item as
+    its page of results is loaded.
+    """
+    url = self.__get_folder_items_url(folder_id, cardDetail)
+    for page in self.__iter_pages(url):
+      for item in page:
+        yield item
+
+  def __get_folder_items_url(self, folder_id, cardDetail):
+    """internal"""
     # check to make sure folder_id is id or slug
     if is_id(folder_id):
       if is_slug(folder_id):
@@ -2283,8 +2726,7 @@ class Guru:
 
     # id is good, make the call.
     # url = "%s/folders/%s/items?cardDetail=FULL" % (self.base_url, folder_id)
-    url = f"{self.base_url}/folders/{folder_id}/items?cardDetail={cardDetail}"
-    return self.__get_and_get_all(url, cache)
+    return f"{self.base_url}/folders/{folder_id}/items?cardDetail={cardDetail}"
 
   def get_folders(self, collection=None, folder=None, cache=False):
     """
@@ -2299,19 +2741,37 @@ class Guru:
       list of Folder: Either all folders you have access to or all folders within the specified collection.
 
     """
+    url = self.__get_folders_url(collection)
+    if not url:
+      return
+
+    folders_response = self.__get_and_get_all(url, cache)
+    return [Folder(f, guru=self) for f in folders_response]
+
+  def iter_folders(self, collection=None):
+    """
+    Same as get_folders() but it's a generator that yields each folder as its
+    page of results is loaded.
+    """
+    url = self.__get_folders_url(collection)
+    if not url:
+      return
+
+    for page in self.__iter_pages(url):
+      for folder in page:
+        yield Folder(folder, guru=self)
+
+  def __get_folders_url(self, collection=None):
+    """internal"""
     # optional filter by collection.
     if collection:
       collection_obj = self.get_collection(collection, cache=True)
       if not collection_obj:
         self.__log(make_red("could not find collection:", collection))
         return
-      url = "%s/folders?collection=%s" % (self.base_url,
-                                          collection_obj.id)
+      return "%s/folders?collection=%s" % (self.base_url, collection_obj.id)
     else:
-      url = "%s/folders" % self.base_url
-
-    folders_response = self.__get_and_get_all(url, cache)
-    return [Folder(f, guru=self) for f in folders_response]
+      return "%s/folders" % self.base_url
 
   def delete_folder(self, deleteFolder, collection=None, remove_type=None):
     """
@@ -3375,17 +3835,21 @@ class Guru:
     response = self.__delete(url)
     return status_to_bool(response.status_code)
 
-  def bundle(self, id="default", clear=True, folder="/tmp/", verbose=False, skip_empty_sections=False):
+  def bundle(self, id="default", clear=True, folder="/tmp/", verbose=False, skip_empty_sections=False, processes=None, html_parser=None, incremental=False,
+             resource_store=None):
     """
     Creates a Bundle object that can be used to bulk import content.
     """
-    return Bundle(guru=self, id=id, clear=clear, folder=folder, verbose=verbose, skip_empty_sections=skip_empty_sections)
+    return Bundle(guru=self, id=id, clear=clear, folder=folder, verbose=verbose, skip_empty_sections=skip_empty_sections, processes=processes, html_parser=html_parser,
+                  incremental=incremental, resource_store=resource_store)
 
-  def sync(self, id="default", clear=True, folder="/tmp/", verbose=False, skip_empty_sections=False):
+  def sync(self, id="default", clear=True, folder="/tmp/", verbose=False, skip_empty_sections=False, processes=None, html_parser=None, incremental=False,
+           resource_store=None):
     """
     internal: sync() is an alias for bundle().
     """
-    return Bundle(guru=self, id=id, clear=clear, folder=folder, verbose=verbose, skip_empty_sections=skip_empty_sections)
+    return Bundle(guru=self, id=id, clear=clear, folder=folder, verbose=verbose, skip_empty_sections=skip_empty_sections, processes=processes, html_parser=html_parser,
+                  incremental=incremental, resource_store=resource_store)
 
   def get_events(self, start="", end="", max_pages=10):
     """
@@ -3396,19 +3860,40 @@ class Guru:
     timestamps like `"2021-02-01T15:01:30.000+04:00"` or just dates like
     `"2021-02-01"`.
     """
+    url = self.__get_events_url(start, end)
+    if not url:
+      return
+
+    return self.__get_and_get_all(url, max_pages=max_pages)
+
+  def iter_events(self, start="", end="", max_pages=10):
+    """
+    Same as get_events() but it's a generator that yields each event as its
+    page of results is loaded, so you can process a long date range without
+    holding every event in memory.
+    """
+    url = self.__get_events_url(start, end)
+    if not url:
+      return
+
+    for page in self.__iter_pages(url, max_pages=max_pages):
+      for event in page:
+        yield event
+
+  def __get_events_url(self, start, end):
+    """internal"""
     team_id = self.get_team_id()
     if not team_id:
       self.__log(
           make_red("couldn't find your Team ID, are you authenticated?"))
       return
 
-    url = "%s/teams/%s/analytics?fromDate=%s&toDate=%s" % (
+    return "%s/teams/%s/analytics?fromDate=%s&toDate=%s" % (
         self.base_url,
         team_id,
         start,
         end
     )
-    return self.__get_and_get_all(url, max_pages=max_pages)
 
   def get_shared_groups(self, board):
     board_obj = self.get_board(board)
@@ -3660,11 +4145,10 @@ class Guru:
       return
 
     url = "https://api.getguru.com/api/v1/cards/%s/pdf" % card_obj.id
-    headers = {
-        "Authorization": self.__get_basic_auth_value()
-    }
 
-    status, file_size = download_file(url, filename, headers=headers)
+    # the session already has our auth and tracking headers.
+    status, file_size = download_file(
+        url, filename, session=self.session, timeout=self.timeout)
     return status_to_bool(status)
 
   def delete_knowledge_trigger(self, trigger_id):
@@ -3,9 +3,7 @@ import markdown
 import copy
 import re
 from urllib.parse import quote
-from bs4 import BeautifulSoup
-
-from guru.util import clean_slug, find_by_name_or_id, find_by_id, compare_datetime_string
+from guru.util import clean_slug, find_by_name_or_id, find_by_id, compare_datetime_string, parse_html
 
 
 def find_urls_in_doc(doc):
@@ -429,7 +427,7 @@ class Board:
     have all four items.
   """
 
-  def __init__(self, data, guru=None, home_board=None):
+  def __init__(self, data, guru=None, home_board=None, cache=False):
     self.guru = guru
     self.home_board = home_board
     self.last_modified = data.get("lastModified")
@@ -463,7 +461,7 @@ class Board:
         self.__all_items.append(card)
         self.__cards.append(card)
 
-    self.__load_all_cards()
+    self.__load_all_cards(cache)
 
   def __update_cards_in_list(self, item_list, lookup):
     # we scan the list and replace any partial card with its full card from the lookup.
@@ -478,7 +476,7 @@ class Board:
         if partial_item.item_id:
           full_item.item_id = partial_item.item_id
 
-  def __load_all_cards(self):
+  def __load_all_cards(self, cache=False):
     # identify the partially-loaded cards.
     # these come from boards that have more than 50 cards.
     # sometimes the API returns a 'lite' board that doesn't have items at all. these will
@@ -493,14 +491,9 @@ class Board:
     if not unloaded_card_ids:
       return
 
-    # load the unloaded cards in batches of 50.
-    # our API does enforce a max of 50.
-    card_lookup = {}
-    for index in range(0, len(unloaded_card_ids), 50):
-      batch_ids = unloaded_card_ids[index:index + 50]
-      data = self.guru.get_cards(batch_ids)
-      for id in data:
-        card_lookup[id] = data[id]
+    # get_cards loads them in batches of 50 at the same time. if the caller said it's ok,
+    # cards we loaded recently, like ones that are also on another board, come from the cache.
+    card_lookup = self.guru.get_cards(unloaded_card_ids, cache=cache)
 
     # now that we have the full card objects, we update the entries in all the existing lists.
     self.__update_cards_in_list(self.items, card_lookup)
@@ -1245,7 +1238,7 @@ class Card:
     ```
     """
     if not self.__doc:
-      self.__doc = BeautifulSoup(self.content, "html.parser")
+      self.__doc = parse_html(self.content, self.__html_parser())
     return self.__doc
 
   @property
@@ -1262,7 +1255,11 @@ class Card:
   def content(self, content):
     self.__content = content
     if self.__doc:
-      self.__doc = BeautifulSoup(content, "html.parser")
+      self.__doc = parse_html(content, self.__html_parser())
+
+  def __html_parser(self):
+    """internal"""
+    return self.guru.html_parser if self.guru else None
 
   @property
   def url(self):
@@ -1503,7 +1500,7 @@ class Card:
     # the card may be entirely markdown or just contain some markdown so we convert its text
     # to html then look for urls there.
     html = markdown.markdown(self.doc.text)
-    doc = BeautifulSoup(html, "html.parser")
+    doc = parse_html(html, self.__html_parser())
     urls = urls.union(find_urls_in_doc(doc))
 
     return list(urls)
@@ -0,0 +1,7 @@
+class GuruError(BaseException):
+  """
+  The base class for the errors the SDK raises, like PaginationError. Like the
+  BaseExceptions the SDK raises in other places, these aren't Exceptions, so catch
+  `GuruError` or `BaseException` if you want to handle them.
+  """
+  pass
@@ -0,0 +1,268 @@
+import os
+import json
+import sqlite3
+import threading
+
+# changes are synced to disk in batches so we're not waiting on the disk after every card.
+DEFAULT_BATCH_SIZE = 100
+
+
+class MetadataStore:
+  """
+  Keeps track of what a publisher has published. For each Guru object's ID we store
+  a dict with its external ID, type, last modified date, etc. This class keeps it all
+  in memory and the subclasses also save it to disk:
+
+  ```
+  # the default, a .json file plus a journal file next to it.
+  publisher = MyPublisher(g, metadata=guru.JsonMetadataStore("./MyPublisher.json"))
+
+  # or a sqlite database.
+  publisher = MyPublisher(g, metadata=guru.SqliteMetadataStore("./MyPublisher.db"))
+  ```
+
+  Reads come from memory and saving a change only writes that one object, so it
+  doesn't get slower as you publish more objects. Call `commit()` to make sure the
+  changes are on disk, the publishers call `compact()` when they finish.
+  """
+
+  def __init__(self, data=None):
+    self.data = data if data is not None else {}
+
+  def __contains__(self, guru_id):
+    return guru_id in self.data
+
+  def __len__(self):
+    return len(self.data)
+
+  def get(self, guru_id, default=None):
+    """Returns the metadata for this object, or the default if we don't have any."""
+    return self.data.get(guru_id, default)
+
+  def keys(self):
+    """Returns the IDs of the objects we have metadata for."""
+    return list(self.data.keys())
+
+  def set(self, guru_id, value):
+    """Replaces the metadata for this object."""
+    self.data[guru_id] = value
+
+  def delete(self, guru_id):
+    """Removes the metadata for this object."""
+    self.data.pop(guru_id, None)
+
+  def commit(self):
+    """Makes sure every change is saved."""
+    pass
+
+  def compact(self):
+    """
+    Makes sure every change is saved and puts them in their final form on disk. The
+    publishers call this once when they finish publishing a collection, board, etc.
+    """
+    self.commit()
+
+  def close(self):
+    """Saves everything and closes any files."""
+    self.commit()
+
+
+class JsonMetadataStore(MetadataStore):
+  """
+  Keeps the metadata in a .json file, the same file publishers have always used, plus
+  a journal file next to it. Each change is appended to the journal as one line so we
+  don't rewrite the whole .json file for every object we publish. When a publish
+  finishes, the next time the file is loaded, or when you call `close()` or `compact()`,
+  the journal is merged into a new .json file.
+
+  The .json file is replaced atomically and each journal line is a complete record,
+  so if the process dies you have either the old or new value for every object. A
+  line that was only partly written is ignored. Lines are flushed as they're written
+  and synced to disk every `batch_size` changes.
+
+  If you pass `data` we start with that instead of the file's contents, and the file
+  is overwritten with it on the first change.
+  """
+
+  def __init__(self, filename, data=None, batch_size=DEFAULT_BATCH_SIZE):
+    self.filename = filename
+    self.JOURNAL_PATH = filename + ".journal"
+    self.batch_size = batch_size
+    self.__lock = threading.Lock()
+    self.__journal = None
+    self.__unsynced = 0
+    # when we're given data, the file's contents are out of date so the first change rewrites it.
+    self.__stale = data is not None
+
+    has_journal = False
+    if data is None:
+      data, has_journal = self.__load()
+    super().__init__(data)
+
+    # if the last run left changes in the journal, we merge them now so the journal starts out empty.
+    if has_journal:
+      self.compact()
+
+  def __load(self):
+    """internal: Reads the .json file and replays the journal on top of it."""
+    try:
+      with open(self.filename) as file_in:
+        data = json.loads(file_in.read() or "{}") or {}
+    except FileNotFoundError:
+      data = {}
+
+    has_journal = os.path.exists(self.JOURNAL_PATH)
+    try:
+      with open(self.JOURNAL_PATH) as file_in:
+        for line in file_in:
+          try:
+            entry = json.loads(line)
+          except ValueError:
+            # the process died while writing this line.
+            break
+          if entry.get("deleted"):
+            data.pop(entry["id"], None)
+          else:
+            data[entry["id"]] = entry["value"]
+    except FileNotFoundError:
+      pass
+    return data, has_journal
+
+  def set(self, guru_id, value):
+    # publishers' threads call this so we change the data while holding the lock,
+    # otherwise compact() could be writing it out while it changes.
+    with self.__lock:
+      super().set(guru_id, value)
+      self.__write({"id": guru_id, "value": value})
+
+  def delete(self, guru_id):
+    with self.__lock:
+      if guru_id in self.data:
+        super().delete(guru_id)
+        self.__write({"id": guru_id, "deleted": True})
+
+  def __write(self, entry):
+    """internal: Adds the change to the journal. The caller holds the lock."""
+    if self.__stale:
+      self.__compact()
+      return
+
+    if not self.__journal:
+      self.__journal = open(self.JOURNAL_PATH, "a")
+    self.__journal.write(json.dumps(entry) + "\n")
+    # flushing means the line survives if the process dies, syncing means it survives if the machine does.
+    self.__journal.flush()
+    self.__unsynced += 1
+    if self.__unsynced >= self.batch_size:
+      self.__sync()
+
+  def __sync(self):
+    """internal"""
+    if self.__journal and self.__unsynced:
+      os.fsync(self.__journal.fileno())
+    self.__unsynced = 0
+
+  def commit(self):
+    with self.__lock:
+      self.__sync()
+
+  def compact(self):
+    """Writes a new .json file with all the metadata and clears the journal."""
+    with self.__lock:
+      self.__compact()
+
+  def __compact(self):
+    """internal: The caller holds the lock."""
+    if self.__journal:
+      self.__journal.close()
+      self.__journal = None
+    self.__unsynced = 0
+
+    directory = os.path.dirname(self.filename)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    temp_path = self.filename + ".tmp"
+    with open(temp_path, "w") as file_out:
+      file_out.write(json.dumps(self.data, indent=2))
+      file_out.flush()
+      os.fsync(file_out.fileno())
+    os.replace(temp_path, self.filename)
+
+    # the journal's changes are in the new file so we don't need it anymore.
+    if os.path.exists(self.JOURNAL_PATH):
+      os.remove(self.JOURNAL_PATH)
+    self.__stale = False
+
+  def close(self):
+    if self.__journal or self.__stale:
+      self.compact()
+
+
+class SqliteMetadataStore(MetadataStore):
+  """
+  Keeps the metadata in a SQLite database, one row per object. Changes are committed
+  every `batch_size` changes and when you call `commit()`, so if the process is killed
+  you can lose up to that many changes -- pass `batch_size=1` if that matters more than
+  speed. SQLite makes sure a commit is either fully saved or not saved at all.
+
+  If the database is empty and you pass `data`, we start with that. This lets you move
+  a publisher's existing .json file into a database:
+
+  ```
+  with open("./MyPublisher.json") as file_in:
+    store = guru.SqliteMetadataStore("./MyPublisher.db", data=json.load(file_in))
+  ```
+  """
+
+  def __init__(self, filename, data=None, batch_size=DEFAULT_BATCH_SIZE):
+    self.filename = os.path.expanduser(filename)
+    self.batch_size = batch_size
+    directory = os.path.dirname(self.filename)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+
+    # every write goes through the lock so the connection can be shared by threads.
+    self.__lock = threading.Lock()
+    self.__uncommitted = 0
+    self.__connection = sqlite3.connect(self.filename, timeout=30, check_same_thread=False)
+    self.__connection.execute("PRAGMA journal_mode=WAL")
+    self.__connection.execute("PRAGMA synchronous=NORMAL")
+    with self.__connection:
+      self.__connection.execute("CREATE TABLE IF NOT EXISTS metadata (id TEXT PRIMARY KEY, value TEXT)")
+
+    rows = self.__connection.execute("SELECT id, value FROM metadata").fetchall()
+    if rows or data is None:
+      super().__init__({id: json.loads(value) for id, value in rows})
+    else:
+      super().__init__(data)
+      with self.__connection:
+        self.__connection.executemany("INSERT INTO metadata (id, value) VALUES (?, ?)",
+                                      [(id, json.dumps(value)) for id, value in data.items()])
+
+  def set(self, guru_id, value):
+    with self.__lock:
+      super().set(guru_id, value)
+      self.__write("INSERT OR REPLACE INTO metadata (id, value) VALUES (?, ?)", (guru_id, json.dumps(value)))
+
+  def delete(self, guru_id):
+    with self.__lock:
+      if guru_id in self.data:
+        super().delete(guru_id)
+        self.__write("DELETE FROM metadata WHERE id = ?", (guru_id,))
+
+  def __write(self, sql, params):
+    """internal: The caller holds the lock."""
+    self.__connection.execute(sql, params)
+    self.__uncommitted += 1
+    if self.__uncommitted >= self.batch_size:
+      self.__connection.commit()
+      self.__uncommitted = 0
+
+  def commit(self):
+    with self.__lock:
+      self.__connection.commit()
+      self.__uncommitted = 0
+
+  def close(self):
+    self.commit()
+    self.__connection.close()
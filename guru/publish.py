@@ -1,8 +1,8 @@
 
-import json
 import requests
 
-from guru.util import read_file, write_file
+from guru.metadata_store import MetadataStore, JsonMetadataStore
+from guru.publish_pipeline import PublishPipeline, make_fingerprint, get_publish_time
 
 
 def is_successful(result):
@@ -31,24 +31,36 @@ class CardChanges:
 
 
 class Publisher:
-  def __init__(self, g, name="", metadata=None, silent=False, dry_run=False, skip_unverified_cards=True):
+  def __init__(self, g, name="", metadata=None, silent=False, dry_run=False, skip_unverified_cards=True, workers=1):
     self.g = g
     self.name = name or self.__class__.__name__
 
-    # manage the json config file.
-    if metadata is not None:
+    # the metadata is normally kept in ./<name>.json. you can also pass a dict to start
+    # with (changes are still saved to the .json file) or a MetadataStore to keep it
+    # somewhere else, like a SqliteMetadataStore.
+    if isinstance(metadata, MetadataStore):
       self.__metadata = metadata
     else:
-      self.__metadata = json.loads(
-        read_file("./%s.json" % self.name) or "{}"
-      )
-      if not self.__metadata:
-        self.__metadata = {}
+      self.__metadata = JsonMetadataStore("./%s.json" % self.name, data=metadata)
     
     self.silent = silent
     self.dry_run = dry_run
     self.skip_unverified_cards = skip_unverified_cards
     self.__results = {}
+
+    # with more than one worker, cards are published by a pool of threads. if publishing
+    # a card raises an exception we keep going and the exception is in errors[card.id].
+    self.workers = workers
+    self.errors = {}
+
+    # the number of cards in the last publishing run that had changes in guru but would've
+    # looked the same after being published, so we didn't call update_external_card() for them.
+    self.avoided_writes = 0
+
+    # this does the parts of publishing that Publisher and PublisherFolders share.
+    # sections are only listed in their boards, so incremental publishes can't tell if they were deleted.
+    self.__pipeline = PublishPipeline(self, self.__metadata, self.__results, self.__update_metadata, self.__publish_card,
+                                      unlisted_types=("section",))
     self.messages = []
 
   def log_error(self, message):
@@ -66,9 +78,17 @@ class Publisher:
     })
 
   def get_external_url(self, external_id, card):
+    """
+    Returns the url a link to this card should use in the external system. external_id
+    is None if we haven't published the card yet. If we have, the card may be made from
+    the metadata we saved instead of being loaded from guru, so only its id, title, and
+    slug are set -- the url should only depend on those and the external_id.
+    """
     raise NotImplementedError("get_external_url needs to be implemented so we can convert links between guru cards to be links between external articles.")
 
   def process_deletions(self):
+    self.__pipeline.mark_remaining_objects()
+
     # figure out what objects need to be deleted and delete them.
     for guru_id in list(self.__metadata.keys()):
       # __results contains every object that was processed this time.
@@ -92,6 +112,15 @@ class Publisher:
         # the object comes back, we treat it like a brand new object and call
         # the method to create it.
         self.__delete_metadata(guru_id, external_id)
+    self.__metadata.commit()
+
+  def close(self):
+    """
+    Saves the metadata and closes its files. For the default .json file this also
+    merges the journal of changes into it. That already happens when each publish
+    finishes, so you only need this if you called publish_card() on its own.
+    """
+    self.__metadata.close()
 
   def find_external_collection(self, collection):
     pass
@@ -201,84 +230,194 @@ class Publisher:
   def get_last_updated(self, guru_id):
     return self.__metadata.get(guru_id, {}).get("last_updated")
 
-  def __update_metadata(self, guru_id, external_id="", type="", last_modified_date=None, boards=None, tags=None):
-    if not self.__metadata.get(guru_id):
-      self.__metadata[guru_id] = {}
+  def get_fingerprint(self, guru_id):
+    return self.__metadata.get(guru_id, {}).get("fingerprint")
+
+  def get_last_published(self, guru_id):
+    return self.__metadata.get(guru_id, {}).get("last_published")
+
+  def __update_metadata(self, guru_id, external_id="", type="", last_modified_date=None, boards=None, tags=None, title=None, slug=None, fingerprint=None, last_published=None):
+    metadata = dict(self.__metadata.get(guru_id) or {})
     
     if last_modified_date:
       self.__log("update metadata", guru_id, "->", external_id, "last modified at", last_modified_date)
-      self.__metadata[guru_id]["last_updated"] = last_modified_date
+      metadata["last_updated"] = last_modified_date
     else:
       self.__log("update metadata", guru_id, "->", external_id)
     
     if type:
-      self.__metadata[guru_id]["type"] = type
+      metadata["type"] = type
 
     if external_id:
-      self.__metadata[guru_id]["external_id"] = external_id
+      metadata["external_id"] = external_id
     
     if boards != None:
-      self.__metadata[guru_id]["boards"] = boards
+      metadata["boards"] = boards
 
     if tags != None:
-      self.__metadata[guru_id]["tags"] = tags
+      metadata["tags"] = tags
+
+    if title:
+      metadata["title"] = title
+
+    if slug:
+      metadata["slug"] = slug
+
+    if fingerprint:
+      metadata["fingerprint"] = fingerprint
 
-    write_file("./%s.json" % self.name, json.dumps(self.__metadata, indent=2))
+    if last_published:
+      metadata["last_published"] = last_published
+
+    # this only saves this one object, not all of the metadata.
+    self.__metadata.set(guru_id, metadata)
 
   def __delete_metadata(self, guru_id, external_id):
-    if guru_id in self.__metadata:
-      del self.__metadata[guru_id]
-      write_file("./%s.json" % self.name, json.dumps(self.__metadata, indent=2))
+    self.__metadata.delete(guru_id)
 
   def __log(self, *args):
     if not self.silent:
       print(*args)
 
-  def publish_collection(self, collection):
-    collection = self.g.get_collection(collection)
-    home_board = self.g.get_home_board(collection)
-
-    # call create/update/delete_collection as needed.
-    external_id = self.get_external_id(collection.id)
+  def publish_collection(self, collection, incremental=False):
+    """
+    Publishes the collection, its board groups, boards, sections, and cards. If you pass
+    `incremental=True` and we've published the collection before, we search for cards that
+    changed since the last time and only publish those and the boards they're on:
+
+    ```
+    publisher.publish_collection("Engineering", incremental=True)
+    publisher.process_deletions()
+    ```
+
+    Changes to boards that don't change any cards, like renaming a board, are only
+    published by a full publish, so it's good to do one every once in a while. After an
+    incremental publish, process_deletions() deletes the cards, boards, and board groups
+    that were deleted in Guru, but deleted sections are only found by a full publish.
+    """
+    started = self.__pipeline.start()
+    try:
+      collection = self.g.get_collection(collection)
+      published_at = get_publish_time()
+      last_published = self.get_last_published(collection.id)
+      if incremental and last_published:
+        self.__publish_changes(collection, last_published)
+        self.__pipeline.published_at[collection.id] = published_at
+        return
+
+      home_board = self.g.get_home_board(collection)
+
+      # call create/update/delete_collection as needed.
+      external_id = self.get_external_id(collection.id)
+
+      # if we don't have an external_id, call find_external_collection to try to find it.
+      if not external_id:
+        self.__log("find collection", collection.name)
+        external_id = self.find_external_collection(collection)
+        if external_id:
+          self.__log("found collection!", collection.name, "->", external_id)
 
-    # if we don't have an external_id, call find_external_collection to try to find it.
-    if not external_id:
-      self.__log("find collection", collection.name)
-      external_id = self.find_external_collection(collection)
+      successful = False
       if external_id:
-        self.__log("found collection!", collection.name, "->", external_id)
-
-    successful = False
-    if external_id:
-      self.__results[collection.id] = "update"
-      self.__log("update collection", external_id, collection.title)
-      if not self.dry_run:
-        result = self.update_external_collection(external_id, collection)
-        successful = is_successful(result)
-    else:
-      self.__results[collection.id] = "create"
-      self.__log("create collection", collection.title)
-      if not self.dry_run:
-        external_id = self.create_external_collection(collection)
-        if external_id:
-          successful = True
+        self.__results[collection.id] = "update"
+        self.__log("update collection", external_id, collection.title)
+        if not self.dry_run:
+          result = self.update_external_collection(external_id, collection)
+          successful = is_successful(result)
+      else:
+        self.__results[collection.id] = "create"
+        self.__log("create collection", collection.title)
+        if not self.dry_run:
+          external_id = self.create_external_collection(collection)
+          if external_id:
+            successful = True
     
-    if successful or external_id:
-      self.__update_metadata(collection.id, external_id, type="collection")
+      if successful or external_id:
+        self.__update_metadata(collection.id, external_id, type="collection")
     
+      for item in home_board.items:
+        if item.type == "board":
+          # we load the board here because the data we have might be a 'lite' board.
+          board = self.g.get_board(item.id)
+          self.publish_board(board, collection, None)
+        else:
+          self.publish_board_group(item, collection)    
+      self.__pipeline.published_at[collection.id] = published_at
+    finally:
+      self.__pipeline.finish(started)
+
+  def __publish_changes(self, collection, last_published):
+    """
+    internal:
+    Publishes the cards that changed since the last publish. Instead of loading every
+    board we search for the changed cards and only load the boards they're on.
+    """
+    self.__pipeline.incremental_collections.append(collection)
+
+    # the home board lists the board groups and boards that still exist, so process_deletions()
+    # can delete the others, and tells us which board group each board is in.
+    home_board = self.g.get_home_board(collection)
+    self.__pipeline.existing_containers.add(collection.id)
+    self.__pipeline.existing_containers.update([item.id for item in home_board.items])
+    self.__pipeline.existing_containers.update([board.id for board in home_board.boards])
+
+    cards = self.g.find_cards(collection=collection.id, last_modified_after=last_published)
+    self.__log("found", len(cards), "cards changed since", last_published)
+    if not cards:
+      return
+
+    board_groups = {}
     for item in home_board.items:
-      if item.type == "board":
+      if item.type != "board":
+        for board in item.items:
+          board_groups[board.id] = item
+
+    self.__pipeline.load_link_targets(cards)
+    containers = {}
+    for card in cards:
+      for lite_board in card.boards:
+        board_group = board_groups.get(lite_board.id)
+        if board_group:
+          if board_group.id not in containers:
+            containers[board_group.id] = self.g.get_board_group(board_group, collection)
+            self.__publish_board_group_record(containers[board_group.id], collection)
+          board_group = containers[board_group.id]
+
         # we load the board here because the data we have might be a 'lite' board.
-        board = self.g.get_board(item.id)
-        self.publish_board(board, collection, None)
-      else:
-        self.publish_board_group(item, collection)    
-  
+        if lite_board.id not in containers:
+          board = self.g.get_board(lite_board.id, collection)
+          self.__publish_board_record(board, collection, board_group)
+          containers[lite_board.id] = board
+        board = containers[lite_board.id]
+
+        section = None
+        for item in board.items:
+          if item.type == "section" and card.id in [c.id for c in item.items]:
+            section = item
+            if section.id not in containers:
+              self.__publish_section_record(section, collection, board_group, board)
+              containers[section.id] = section
+
+        self.publish_card(card, collection, board_group, board, section)
+
   def publish_board_group(self, board_group, collection=None):
-    if collection:
-      collection = self.g.get_collection(collection)
-    board_group = self.g.get_board_group(board_group, collection)
+    started = self.__pipeline.start()
+    try:
+      if collection:
+        collection = self.g.get_collection(collection)
+      board_group = self.g.get_board_group(board_group, collection)
 
+      self.__publish_board_group_record(board_group, collection)
+
+      for item in board_group.items:
+        # we load the board here because the data we have might be a 'lite' board.
+        board = self.g.get_board(item.id)
+        self.publish_board(board, collection, board_group)
+    finally:
+      self.__pipeline.finish(started)
+
+  def __publish_board_group_record(self, board_group, collection):
+    """internal: Creates or updates the external board group, without its contents."""
     # call create/update/delete_board_group as needed.
     external_id = self.get_external_id(board_group.id)
 
@@ -303,22 +442,39 @@ class Publisher:
         external_id = self.create_external_board_group(board_group, collection)
         if external_id:
           successful = True
-    
+
     if successful or external_id:
       self.__update_metadata(board_group.id, external_id, type="board_group")
 
-    for item in board_group.items:
-      # we load the board here because the data we have might be a 'lite' board.
-      board = self.g.get_board(item.id)
-      self.publish_board(board, collection, board_group)
-
   def publish_board(self, board, collection=None, board_group=None):
-    # this could be called where 'board' is an ID, slug, or Board object,
-    # the same goes for collection.
-    if collection:
-      collection = self.g.get_collection(collection)
-    board = self.g.get_board(board, collection)
+    started = self.__pipeline.start()
+    try:
+      # this could be called where 'board' is an ID, slug, or Board object,
+      # the same goes for collection.
+      if collection:
+        collection = self.g.get_collection(collection)
+      board = self.g.get_board(board, collection)
+    
+      self.__publish_board_record(board, collection, board_group)
+
+      cards = [item for item in board.items if item.type != "section"]
+      for section in board.items:
+        if section.type == "section":
+          cards += section.items
+      self.__pipeline.load_link_targets(cards)
     
+      for item in board.items:
+        if item.type == "section":
+          self.publish_section(item, collection, board_group, board)
+        else:
+          # todo: if the board has > 50 items we'll  need to load the full card object here.
+          #       we can use a single api call to bulk load cards.
+          self.publish_card(item, collection, board_group, board)
+    finally:
+      self.__pipeline.finish(started)
+
+  def __publish_board_record(self, board, collection, board_group):
+    """internal: Creates or updates the external board, without its contents."""
     # call create/update/delete_board as needed.
     external_id = self.get_external_id(board.id)
 
@@ -343,21 +499,20 @@ class Publisher:
         external_id = self.create_external_board(board, board_group, collection)
         if external_id:
           successful = True
-    
+
     if successful or external_id:
       self.__update_metadata(board.id, external_id, type="board")
-    
-    for item in board.items:
-      if item.type == "section":
-        self.publish_section(item, collection, board_group, board)
-      else:
-        # todo: if the board has > 50 items we'll  need to load the full card object here.
-        #       we can use a single api call to bulk load cards.
-        self.publish_card(item, collection, board_group, board)
 
   def publish_section(self, section, collection=None, board_group=None, board=None):
     # this can't be called directly so we can assume the args are all objects.
     
+    self.__publish_section_record(section, collection, board_group, board)
+
+    for item in section.items:
+      self.publish_card(item, collection, board_group, board, section)
+
+  def __publish_section_record(self, section, collection, board_group, board):
+    """internal: Creates or updates the external section, without its contents."""
     # call create/update/delete_section as needed.
     external_id = self.get_external_id(section.id)
 
@@ -382,19 +537,23 @@ class Publisher:
         external_id = self.create_external_section(section, board, board_group, collection)
         if external_id:
           successful = True
-    
+
     if successful or external_id:
       self.__update_metadata(section.id, external_id, type="section")
 
-    for item in section.items:
-      self.publish_card(item, collection, board_group, board, section)
-
   def publish_card(self, card, collection=None, board_group=None, board=None, section=None):
     """
     This method figures out if the card has changes that need to be published and
     calls create/update_external_card based on whether the card has ever been
     published before or not.
+
+    If the publisher has more than one worker and this is called while we're publishing
+    a collection or board, the card is added to a batch that's published by a pool of threads.
     """
+    self.__pipeline.add_card(card, collection, board_group, board, section)
+
+  def __publish_card(self, card, collection, board_group, board, section):
+    """internal: Publishes the card and returns the metadata for publish_card() to save."""
     external_id = self.get_external_id(card.id)
 
     # if we're configured to skip unverified cards and this one is unverified, skip it.
@@ -403,26 +562,54 @@ class Publisher:
       self.__log("skip card", card.title)
       return
 
-    # if there are no publish-worthy changes we can skip this card.
+    # if there are no publish-worthy changes we can skip this card. a card that links to
+    # other cards can change when they do, so we check those using their fingerprint.
     changes = self.get_card_changes(card)
-    if not changes.needs_publishing():
+    if not changes.needs_publishing() and not self.__pipeline.has_links_to_check(card):
       self.__results[card.id] = "skip"
       self.__log("skip card", card.title)
       return
 
-    # scan the guru card for card to card links.
+    # scan the guru card for card to card links. the cards they link to were usually
+    # loaded in bulk by load_link_targets() before we got here.
     # these should become links between external articles.
     # look for the 'data-ghq-guru-card-id' attribute and
     # set href="https://www.example.com/articles/<id>"
     for link in card.doc.select("[data-ghq-guru-card-id]"):
       other_card_id = link.attrs.get("data-ghq-guru-card-id")
-      other_card = self.g.get_card(other_card_id)
+      other_card = self.__pipeline.get_link_card(other_card_id)
       if other_card:
         other_card_external_id = self.get_external_id(other_card.id)
         new_url = self.get_external_url(other_card_external_id, other_card)
         if new_url:
           link.attrs["href"] = new_url
 
+    # if the card would look the same as it did the last time we published it, we don't
+    # need to update it. this happens when something like verifying the card changes its
+    # last modified date, or when a card it links to changed but the link's url didn't.
+    # we only save one fingerprint for a card that's in more than one place, so it has the
+    # titles of all its boards rather than the one we're publishing it for right now.
+    fingerprint = make_fingerprint(
+      card.title,
+      " ".join(card.content.split()),
+      sorted([t.value for t in card.tags]),
+      sorted([b.title for b in card.boards])
+    )
+    last_fingerprint = self.get_fingerprint(card.id)
+    if external_id and fingerprint == last_fingerprint:
+      # "unchanged" means we avoided a write. if the card only had its links checked we
+      # wouldn't have written it anyway, so it's skipped like any other card that didn't change.
+      self.__results[card.id] = "unchanged" if changes.needs_publishing() else "skip"
+      self.__log("unchanged card", card.title)
+      return dict(
+        external_id=external_id,
+        last_modified_date=card.last_modified_date,
+        type="card"
+      )
+    elif last_fingerprint and not changes.needs_publishing():
+      # the card didn't change but its links did.
+      changes.content_changed = True
+
     # it's possible our json doesn't have a record of this card being published but it
     # does already exist externally -- maybe it was created there separately, maybe you
     # imported your content into guru and this is the first publish, etc.
@@ -448,19 +635,26 @@ class Publisher:
         external_id = self.create_external_card(card, changes, section, board, board_group, collection)
         if external_id:
           successful = True
+
+    # the next incremental publish needs to find this card again, see PublishPipeline.finish().
+    if not successful and not self.dry_run:
+      self.__results[card.id] = "failed"
     
     if successful:
-      self.__update_metadata(
-        card.id,
-        external_id,
+      return dict(
+        external_id=external_id,
         last_modified_date=card.last_modified_date,
         boards=[b.title for b in card.boards],
         tags=[t.value for t in card.tags],
+        title=card.title,
+        slug=card.slug,
+        fingerprint=fingerprint,
         type="card"
       )
     elif external_id:
-      self.__update_metadata(
-        card.id,
-        external_id,
+      return dict(
+        external_id=external_id,
+        title=card.title,
+        slug=card.slug,
         type="card"
       )
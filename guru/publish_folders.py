@@ -1,8 +1,8 @@
 
-import json
 import requests
 
-from guru.util import read_file, write_file
+from guru.metadata_store import MetadataStore, JsonMetadataStore
+from guru.publish_pipeline import PublishPipeline, make_fingerprint, get_publish_time
 
 
 def is_successful(result):
@@ -31,24 +31,34 @@ class CardChanges:
 
 
 class PublisherFolders:
-  def __init__(self, g, name="", metadata=None, silent=False, dry_run=False, skip_unverified_cards=True):
+  def __init__(self, g, name="", metadata=None, silent=False, dry_run=False, skip_unverified_cards=True, workers=1):
     self.g = g
     self.name = name or self.__class__.__name__
 
-    # manage the json config file.
-    if metadata is not None:
+    # the metadata is normally kept in ./<name>.json. you can also pass a dict to start
+    # with (changes are still saved to the .json file) or a MetadataStore to keep it
+    # somewhere else, like a SqliteMetadataStore.
+    if isinstance(metadata, MetadataStore):
       self.__metadata = metadata
     else:
-      self.__metadata = json.loads(
-          read_file("./%s.json" % self.name) or "{}"
-      )
-      if not self.__metadata:
-        self.__metadata = {}
+      self.__metadata = JsonMetadataStore("./%s.json" % self.name, data=metadata)
 
     self.silent = silent
     self.dry_run = dry_run
     self.skip_unverified_cards = skip_unverified_cards
     self.__results = {}
+
+    # with more than one worker, cards are published by a pool of threads. if publishing
+    # a card raises an exception we keep going and the exception is in errors[card.id].
+    self.workers = workers
+    self.errors = {}
+
+    # the number of cards in the last publishing run that had changes in guru but would've
+    # looked the same after being published, so we didn't call update_external_card() for them.
+    self.avoided_writes = 0
+
+    # this does the parts of publishing that Publisher and PublisherFolders share.
+    self.__pipeline = PublishPipeline(self, self.__metadata, self.__results, self.__update_metadata, self.__publish_card)
     self.messages = []
 
   def log_error(self, message):
@@ -66,10 +76,18 @@ class PublisherFolders:
     })
 
   def get_external_url(self, external_id, card):
+    """
+    Returns the url a link to this card should use in the external system. external_id
+    is None if we haven't published the card yet. If we have, the card may be made from
+    the metadata we saved instead of being loaded from guru, so only its id, title, and
+    slug are set -- the url should only depend on those and the external_id.
+    """
     raise NotImplementedError(
         "get_external_url needs to be implemented so we can convert links between guru cards to be links between external articles.")
 
   def process_deletions(self):
+    self.__pipeline.mark_remaining_objects()
+
     # figure out what objects need to be deleted and delete them.
     for guru_id in list(self.__metadata.keys()):
       # __results contains every object that was processed this time.
@@ -89,6 +107,15 @@ class PublisherFolders:
         # the object comes back, we treat it like a brand new object and call
         # the method to create it.
         self.__delete_metadata(guru_id, external_id)
+    self.__metadata.commit()
+
+  def close(self):
+    """
+    Saves the metadata and closes its files. For the default .json file this also
+    merges the journal of changes into it. That already happens when each publish
+    finishes, so you only need this if you called publish_card() on its own.
+    """
+    self.__metadata.close()
 
   def find_external_collection(self, collection):
     pass
@@ -175,87 +202,180 @@ class PublisherFolders:
   def get_last_updated(self, guru_id):
     return self.__metadata.get(guru_id, {}).get("last_updated")
 
-  def __update_metadata(self, guru_id, external_id="", type="", last_modified_date=None, folders=None, tags=None):
-    if not self.__metadata.get(guru_id):
-      self.__metadata[guru_id] = {}
+  def get_fingerprint(self, guru_id):
+    return self.__metadata.get(guru_id, {}).get("fingerprint")
+
+  def get_last_published(self, guru_id):
+    return self.__metadata.get(guru_id, {}).get("last_published")
+
+  def __update_metadata(self, guru_id, external_id="", type="", last_modified_date=None, folders=None, tags=None, title=None, slug=None, fingerprint=None, last_published=None):
+    metadata = dict(self.__metadata.get(guru_id) or {})
 
     if last_modified_date:
       self.__log("update metadata", guru_id, "->", external_id,
                  "last modified at", last_modified_date)
-      self.__metadata[guru_id]["last_updated"] = last_modified_date
+      metadata["last_updated"] = last_modified_date
     else:
       self.__log("update metadata", guru_id, "->", external_id)
 
     if type:
-      self.__metadata[guru_id]["type"] = type
+      metadata["type"] = type
 
     if external_id:
-      self.__metadata[guru_id]["external_id"] = external_id
+      metadata["external_id"] = external_id
 
     if folders != None:
-      self.__metadata[guru_id]["folders"] = folders
+      metadata["folders"] = folders
 
     if tags != None:
-      self.__metadata[guru_id]["tags"] = tags
+      metadata["tags"] = tags
+
+    if title:
+      metadata["title"] = title
 
-    write_file("./%s.json" % self.name, json.dumps(self.__metadata, indent=2))
+    if slug:
+      metadata["slug"] = slug
+
+    if fingerprint:
+      metadata["fingerprint"] = fingerprint
+
+    if last_published:
+      metadata["last_published"] = last_published
+
+    # this only saves this one object, not all of the metadata.
+    self.__metadata.set(guru_id, metadata)
 
   def __delete_metadata(self, guru_id, external_id):
-    if guru_id in self.__metadata:
-      del self.__metadata[guru_id]
-      write_file("./%s.json" % self.name,
-                 json.dumps(self.__metadata, indent=2))
+    self.__metadata.delete(guru_id)
 
   def __log(self, *args):
     if not self.silent:
       print(*args)
 
-  def publish_collection(self, collection):
-    collection = self.g.get_collection(collection)
-    home_folder = self.g.get_home_folder(collection)
-
-    # call create/update/delete_collection as needed.
-    external_id = self.get_external_id(collection.id)
+  def publish_collection(self, collection, incremental=False):
+    """
+    Publishes the collection, its folders, and their cards. If you pass `incremental=True`
+    and we've published the collection before, we search for cards that changed since the
+    last time and only publish those and the folders they're in:
+
+    ```
+    publisher.publish_collection("Engineering", incremental=True)
+    publisher.process_deletions()
+    ```
+
+    Changes to folders that don't change any cards, like renaming a folder, are only
+    published by a full publish, so it's good to do one every once in a while. After an
+    incremental publish, process_deletions() still deletes the cards and folders that
+    were deleted in Guru.
+    """
+    started = self.__pipeline.start()
+    try:
+      collection = self.g.get_collection(collection)
+      published_at = get_publish_time()
+      last_published = self.get_last_published(collection.id)
+      if incremental and last_published:
+        self.__publish_changes(collection, last_published)
+        self.__pipeline.published_at[collection.id] = published_at
+        return
+
+      home_folder = self.g.get_home_folder(collection)
+
+      # call create/update/delete_collection as needed.
+      external_id = self.get_external_id(collection.id)
+
+      # if we don't have an external_id, call find_external_collection to try to find it.
+      if not external_id:
+        self.__log("find collection", collection.name)
+        external_id = self.find_external_collection(collection)
+        if external_id:
+          self.__log("found collection!", collection.name, "->", external_id)
 
-    # if we don't have an external_id, call find_external_collection to try to find it.
-    if not external_id:
-      self.__log("find collection", collection.name)
-      external_id = self.find_external_collection(collection)
+      successful = False
       if external_id:
-        self.__log("found collection!", collection.name, "->", external_id)
+        self.__results[collection.id] = "update"
+        self.__log("update collection", external_id, collection.title)
+        if not self.dry_run:
+          result = self.update_external_collection(external_id, collection)
+          successful = is_successful(result)
+      else:
+        self.__results[collection.id] = "create"
+        self.__log("create collection", collection.title)
+        if not self.dry_run:
+          external_id = self.create_external_collection(collection)
+          if external_id:
+            successful = True
+
+      if successful or external_id:
+        self.__update_metadata(collection.id, external_id, type="collection")
+
+      self.__pipeline.load_link_targets([item for item in home_folder.items if item.type != "folder"])
+
+      # Collection can have folders and cards...It is total Navarchy.
+      for item in home_folder.items:
+        if item.type == "folder":
+          self.publish_folder(item, collection)
+        else:
+          self.publish_card(item, collection, home_folder)
+      self.__pipeline.published_at[collection.id] = published_at
+    finally:
+      self.__pipeline.finish(started)
+
+  def __publish_changes(self, collection, last_published):
+    """
+    internal:
+    Publishes the cards that changed since the last publish. Instead of loading every
+    folder we search for the changed cards and only load the folders they're in.
+    """
+    self.__pipeline.incremental_collections.append(collection)
 
-    successful = False
-    if external_id:
-      self.__results[collection.id] = "update"
-      self.__log("update collection", external_id, collection.title)
-      if not self.dry_run:
-        result = self.update_external_collection(external_id, collection)
-        successful = is_successful(result)
-    else:
-      self.__results[collection.id] = "create"
-      self.__log("create collection", collection.title)
-      if not self.dry_run:
-        external_id = self.create_external_collection(collection)
-        if external_id:
-          successful = True
+    # we list the folders that still exist so process_deletions() can delete the others.
+    self.__pipeline.existing_containers.add(collection.id)
+    self.__pipeline.existing_containers.update([folder.id for folder in self.g.get_folders(collection.id)])
 
-    if successful or external_id:
-      self.__update_metadata(collection.id, external_id, type="collection")
+    cards = self.g.find_cards(collection=collection.id, last_modified_after=last_published)
+    self.__log("found", len(cards), "cards changed since", last_published)
+    if not cards:
+      return
 
-    # Collection can have folders and cards...It is total Navarchy.
-    for item in home_folder.items:
-      if item.type == "folder":
-        self.publish_folder(item, collection)
-      else:
-        self.publish_card(item, collection, home_folder)
+    home_folder = self.g.get_home_folder(collection)
+    self.__pipeline.load_link_targets(cards)
+    folders = {}
+    for card in cards:
+      card_folders = [f for f in card.folders if f.id != home_folder.id]
+      if not card_folders:
+        self.publish_card(card, collection, home_folder)
+
+      for card_folder in card_folders:
+        if card_folder.id not in folders:
+          folder = self.g.get_folder(card_folder.id, collection)
+          self.__publish_folder_record(folder, collection)
+          folders[card_folder.id] = folder
+        self.publish_card(card, collection, folders[card_folder.id])
 
   def publish_folder(self, folder, collection=None):
-    # this could be called where 'folder' is an ID, slug, or Folder object,
-    # the same goes for collection.
-    if collection:
-      collection = self.g.get_collection(collection)
-    folder = self.g.get_folder(folder, collection)
-
+    started = self.__pipeline.start()
+    try:
+      # this could be called where 'folder' is an ID, slug, or Folder object,
+      # the same goes for collection.
+      if collection:
+        collection = self.g.get_collection(collection)
+      folder = self.g.get_folder(folder, collection)
+
+      self.__publish_folder_record(folder, collection)
+
+      self.__pipeline.load_link_targets([item for item in folder.items if item.type != "folder"])
+
+      # Folders can have folders or cards. this simply flattens out the folder structure.
+      for item in folder.items:
+        if item.type == "folder":
+          self.publish_folder(item, collection)
+        else:
+          self.publish_card(item, collection, folder)
+    finally:
+      self.__pipeline.finish(started)
+
+  def __publish_folder_record(self, folder, collection):
+    """internal: Creates or updates the external folder, without its contents."""
     # call create/update/delete_folder as needed.
     external_id = self.get_external_id(folder.id)
 
@@ -286,19 +406,19 @@ class PublisherFolders:
     if successful or external_id:
       self.__update_metadata(folder.id, external_id, type="folder")
 
-    # Folders can have folders or cards. this simply flattens out the folder structure.
-    for item in folder.items:
-      if item.type == "folder":
-        self.publish_folder(item, collection)
-      else:
-        self.publish_card(item, collection, folder)
-
   def publish_card(self, card, collection=None, folder=None):
     """
     This method figures out if the card has changes that need to be published and
     calls create/update_external_card based on whether the card has ever been
     published before or not.
+
+    If the publisher has more than one worker and this is called while we're publishing
+    a collection or folder, the card is added to a batch that's published by a pool of threads.
     """
+    self.__pipeline.add_card(card, collection, folder)
+
+  def __publish_card(self, card, collection, folder):
+    """internal: Publishes the card and returns the metadata for publish_card() to save."""
     external_id = self.get_external_id(card.id)
 
     # if we're configured to skip unverified cards and this one is unverified, skip it.
@@ -307,26 +427,54 @@ class PublisherFolders:
       self.__log("skip card", card.title)
       return
 
-    # if there are no publish-worthy changes we can skip this card.
+    # if there are no publish-worthy changes we can skip this card. a card that links to
+    # other cards can change when they do, so we check those using their fingerprint.
     changes = self.get_card_changes(card)
-    if not changes.needs_publishing():
+    if not changes.needs_publishing() and not self.__pipeline.has_links_to_check(card):
       self.__results[card.id] = "skip"
       self.__log("skip card", card.title)
       return
 
-    # scan the guru card for card to card links.
+    # scan the guru card for card to card links. the cards they link to were usually
+    # loaded in bulk by load_link_targets() before we got here.
     # these should become links between external articles.
     # look for the 'data-ghq-guru-card-id' attribute and
     # set href="https://www.example.com/articles/<id>"
     for link in card.doc.select("[data-ghq-guru-card-id]"):
       other_card_id = link.attrs.get("data-ghq-guru-card-id")
-      other_card = self.g.get_card(other_card_id)
+      other_card = self.__pipeline.get_link_card(other_card_id)
       if other_card:
         other_card_external_id = self.get_external_id(other_card.id)
         new_url = self.get_external_url(other_card_external_id, other_card)
         if new_url:
           link.attrs["href"] = new_url
 
+    # if the card would look the same as it did the last time we published it, we don't
+    # need to update it. this happens when something like verifying the card changes its
+    # last modified date, or when a card it links to changed but the link's url didn't.
+    # we only save one fingerprint for a card that's in more than one place, so it has the
+    # titles of all its folders rather than the one we're publishing it for right now.
+    fingerprint = make_fingerprint(
+      card.title,
+      " ".join(card.content.split()),
+      sorted([t.value for t in card.tags]),
+      sorted([f.title for f in card.folders])
+    )
+    last_fingerprint = self.get_fingerprint(card.id)
+    if external_id and fingerprint == last_fingerprint:
+      # "unchanged" means we avoided a write. if the card only had its links checked we
+      # wouldn't have written it anyway, so it's skipped like any other card that didn't change.
+      self.__results[card.id] = "unchanged" if changes.needs_publishing() else "skip"
+      self.__log("unchanged card", card.title)
+      return dict(
+          external_id=external_id,
+          last_modified_date=card.last_modified_date,
+          type="card"
+      )
+    elif last_fingerprint and not changes.needs_publishing():
+      # the card didn't change but its links did.
+      changes.content_changed = True
+
     # it's possible our json doesn't have a record of this card being published but it
     # does already exist externally -- maybe it was created there separately, maybe you
     # imported your content into guru and this is the first publish, etc.
@@ -355,18 +503,25 @@ class PublisherFolders:
         if external_id:
           successful = True
 
+    # the next incremental publish needs to find this card again, see PublishPipeline.finish().
+    if not successful and not self.dry_run:
+      self.__results[card.id] = "failed"
+
     if successful:
-      self.__update_metadata(
-          card.id,
-          external_id,
+      return dict(
+          external_id=external_id,
           last_modified_date=card.last_modified_date,
           folders=[f.title for f in card.folders],
           tags=[t.value for t in card.tags],
+          title=card.title,
+          slug=card.slug,
+          fingerprint=fingerprint,
           type="card"
       )
     elif external_id:
-      self.__update_metadata(
-          card.id,
-          external_id,
+      return dict(
+          external_id=external_id,
+          title=card.title,
+          slug=card.slug,
           type="card"
       )
@@ -0,0 +1,254 @@
+import json
+import hashlib
+import datetime
+
+from guru.batch import Batch
+from guru.data_objects import Card
+
+
+def make_fingerprint(*values):
+  """
+  Hashes the things that end up in an external card -- its title, content, tags, and
+  where it is -- so we can tell if publishing it again would change anything.
+  """
+  return hashlib.sha256(json.dumps(values, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_publish_time():
+  """
+  Returns the time a publish started, in UTC, for the next incremental publish to look
+  for cards modified after it. We go back a few minutes in case our clock and Guru's
+  don't quite match -- a card that's found again is skipped if it hasn't changed.
+  """
+  published_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=5)
+  return published_at.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class PublishPipeline:
+  """
+  internal:
+  The parts of publishing that Publisher and PublisherFolders share: publishing cards
+  with a pool of workers, loading the cards they link to, and keeping track of what an
+  incremental publish needs to save. Each publisher has one of these and passes in its
+  metadata, its results, and the private methods that save metadata and publish a card.
+  """
+
+  def __init__(self, publisher, metadata, results, update_metadata, publish_card, unlisted_types=()):
+    self.publisher = publisher
+    self.metadata = metadata
+    self.results = results
+    self.update_metadata = update_metadata
+    self.publish_card = publish_card
+    # the types of containers an incremental publish can't list with one call per collection.
+    self.unlisted_types = unlisted_types
+
+    # the cards that cards we're publishing link to, loaded in bulk and kept for one publishing run.
+    self.running = False
+    self.link_cards = {}
+
+    # incremental publishes save the time they started once they finish without errors, and
+    # process_deletions() lists the cards in these collections since we didn't see them all.
+    # the publishers list the collections' containers while they publish and add their ids here.
+    self.published_at = {}
+    self.incremental_collections = []
+    self.existing_containers = set()
+    self.__failed = False
+
+    self.__batch = None
+    self.__queued_cards = []
+    self.__queued_ids = set()
+    self.__deferred_cards = []
+
+  def log(self, *args):
+    if not self.publisher.silent:
+      print(*args)
+
+  def start(self):
+    """
+    Starts a publishing run. If the publisher has workers, this also starts a batch that
+    add_card() adds cards to. Containers are still published one at a time as they're
+    found, so they're always done before the cards in them. Nested calls return False
+    and their cards are part of the run that's already going.
+    """
+    if self.running:
+      return False
+
+    self.running = True
+    self.link_cards = {}
+    self.__failed = False
+    self.publisher.avoided_writes = 0
+    if self.publisher.workers > 1:
+      self.__batch = Batch(self.publisher.workers)
+      self.__queued_cards = []
+      self.__queued_ids = set()
+      self.__deferred_cards = []
+    return True
+
+  def finish(self, started):
+    """Waits for the batch and ends the run, if this call started it, and saves the metadata."""
+    if started:
+      batch, cards, deferred_cards = self.__batch, self.__queued_cards, self.__deferred_cards
+      published_at = self.published_at
+      self.__batch = None
+      self.__queued_cards = []
+      self.__queued_ids = set()
+      self.__deferred_cards = []
+      self.published_at = {}
+      if batch:
+        results = batch.wait()
+        if results.errors:
+          # the cards that failed weren't published so the next incremental publish needs to find them again.
+          published_at = {}
+
+        # we save metadata in the order we found the cards so the results are the same no
+        # matter which calls finish first, and one card failing doesn't stop the others.
+        failed_ids = set()
+        for index, card in enumerate(cards):
+          if index in results.errors:
+            failed_ids.add(card.id)
+            self.publisher.errors[card.id] = results.errors[index]
+            self.publisher.log_error("couldn't publish card %s: %s" % (card.title, results.errors[index]))
+          else:
+            self.save_card_metadata(card, results[index])
+
+        # a card that's in more than one place was only added to the batch once. now that its
+        # metadata is saved we publish it for its other places, like we would without workers.
+        for card, args in deferred_cards:
+          if card.id in failed_ids:
+            continue
+          try:
+            self.save_card_metadata(card, self.publish_card(card, *args))
+          except Exception as error:
+            published_at = {}
+            self.publisher.errors[card.id] = error
+            self.publisher.log_error("couldn't publish card %s: %s" % (card.title, error))
+
+      # if a card wasn't published, or this was a dry run, the next incremental publish
+      # has to look for changes from the same time this one did.
+      if self.__failed or self.publisher.dry_run:
+        published_at = {}
+      for guru_id, timestamp in published_at.items():
+        self.update_metadata(guru_id, last_published=timestamp)
+
+      self.running = False
+      self.link_cards = {}
+      if self.publisher.avoided_writes:
+        self.log("skipped", self.publisher.avoided_writes, "cards that wouldn't have changed")
+
+      # once per run we merge the .json store's journal so the .json file is up to date.
+      self.metadata.compact()
+    else:
+      self.metadata.commit()
+
+  def add_card(self, card, *args):
+    """
+    Publishes the card, or adds it to the batch if there is one. The args are passed
+    to the publisher's publish_card method along with the card.
+    """
+    if self.__batch is not None:
+      # if two workers published the same card at the same time they'd both create it.
+      if card.id in self.__queued_ids:
+        self.__deferred_cards.append((card, args))
+        return
+      self.__batch.add(self.publish_card, card, *args)
+      self.__queued_cards.append(card)
+      self.__queued_ids.add(card.id)
+    else:
+      self.save_card_metadata(card, self.publish_card(card, *args))
+
+  def save_card_metadata(self, card, metadata):
+    if self.results.get(card.id) == "failed":
+      self.__failed = True
+    if self.results.get(card.id) == "unchanged":
+      self.publisher.avoided_writes += 1
+    if metadata:
+      self.update_metadata(card.id, **metadata)
+
+  def mark_remaining_objects(self):
+    """
+    If we only published the changes in a collection we didn't see all of its cards, so
+    this lists the ones that are still there and marks them as seen for process_deletions().
+    Containers the publisher listed are marked the same way. Ones of the unlisted types
+    can't be checked without loading every board, so they're left for the next full publish.
+    """
+    for collection in self.incremental_collections:
+      for card in self.publisher.g.iter_cards(collection=collection.id):
+        self.results.setdefault(card.id, "skip")
+    if self.incremental_collections:
+      for guru_id in self.metadata.keys():
+        type = self.publisher.get_type(guru_id)
+        if type != "card" and (guru_id in self.existing_containers or type in self.unlisted_types):
+          self.results.setdefault(guru_id, "skip")
+      self.incremental_collections = []
+      self.existing_containers = set()
+
+  def load_link_targets(self, cards):
+    """
+    Finds the cards that these cards link to and loads them with one bulk call, so we
+    don't make a call for each link as each card is published. Cards that are part of
+    this run or that we've already published don't need to be loaded.
+    """
+    if not self.running:
+      return
+
+    for card in cards:
+      self.link_cards[card.id] = card
+
+    card_ids = []
+    for card in cards:
+      # we only need links from cards that are going to be published. we can't call
+      # get_card_changes() here because it may load each card's folders, so we only use
+      # what we can check locally and the worker that publishes the card checks the rest.
+      # if it finds other changes, the links we didn't load are loaded one at a time.
+      if self.publisher.skip_unverified_cards and card.verification_state != "TRUSTED":
+        continue
+      if not self.is_modified(card) and not self.has_links_to_check(card):
+        continue
+
+      for link in card.doc.select("[data-ghq-guru-card-id]"):
+        card_id = link.attrs.get("data-ghq-guru-card-id")
+        if card_id in self.link_cards or card_id in card_ids or self.get_published_card(card_id):
+          continue
+        card_ids.append(card_id)
+
+    if card_ids:
+      self.log("load linked cards", len(card_ids))
+      loaded_cards = self.publisher.g.get_cards(card_ids)
+      # we keep the ones that weren't found too so we don't try to load them again.
+      for card_id in card_ids:
+        self.link_cards[card_id] = loaded_cards.get(card_id)
+
+  def is_modified(self, card):
+    """True if the card was modified since we last published it, or we never have."""
+    last_updated = self.publisher.get_last_updated(card.id)
+    return not last_updated or card.last_modified_date > last_updated
+
+  def has_links_to_check(self, card):
+    """True if the card links to other cards and we can tell if its links changed."""
+    return bool(self.publisher.get_external_id(card.id) and self.publisher.get_fingerprint(card.id)) and \
+      "data-ghq-guru-card-id" in card.content
+
+  def get_published_card(self, card_id):
+    """
+    Makes a card object from the metadata we saved when we published it. It only has an
+    id, title, and slug, which is what get_external_url() is documented to rely on.
+    """
+    metadata = self.metadata.get(card_id) or {}
+    if metadata.get("external_id") and metadata.get("title"):
+      return Card({
+        "id": card_id,
+        "preferredPhrase": metadata["title"],
+        "slug": metadata.get("slug")
+      }, guru=self.publisher.g)
+
+  def get_link_card(self, card_id):
+    """Returns the card a link points to from this run's cards, the metadata, or the API."""
+    if card_id in self.link_cards:
+      return self.link_cards[card_id]
+
+    card = self.get_published_card(card_id)
+    if not card:
+      card = self.publisher.g.get_card(card_id)
+      if self.running:
+        self.link_cards[card_id] = card
+    return card
@@ -0,0 +1,214 @@
+import os
+import json
+import shutil
+import hashlib
+import requests
+import tempfile
+import threading
+
+from guru.util import TRACKING_HEADERS
+
+# we read and hash files in chunks so big attachments don't have to fit in memory.
+CHUNK_SIZE = 1024 * 1024
+
+
+def _make_dir(filename):
+  # util.make_dir isn't safe if two threads make the same folder at the same time.
+  os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+
+class ResourceStore:
+  """
+  Keeps the images and attachments that bundles download so they can be reused by
+  later bundles. Files are stored by the hash of their content, so a file that's
+  served from two different URLs is only stored once, and we remember each URL's
+  hash and HTTP validators (ETag and Last-Modified) so we can ask the server if a
+  file changed instead of downloading it again.
+
+  ```
+  bundle = g.bundle(resource_store="/home/me/guru_resources")
+  ```
+
+  When a bundle has a resource store, `bundle.download_file()` goes through it and
+  resources are named by their content hash, so identical files are only in the zip
+  file once. Files are hard linked into the bundle's folder when possible, otherwise
+  they're copied. Call `save()` to write the store's index, zip() does this for you.
+
+  The store doesn't limit its size or remove files on its own. When it gets too big you
+  can delete the folder, or any of the files in it, while nothing is using the store.
+  Files that are missing are downloaded again the next time a bundle needs them, and
+  bundles you've already made have their own links or copies of their files.
+  """
+
+  def __init__(self, folder):
+    self.folder = folder.rstrip("/") + "/"
+    self.INDEX_PATH = self.folder + "index.json"
+    self.hits = 0
+    self.misses = 0
+    self.__lock = threading.Lock()
+    self.__dirty = False
+    # the files we've linked into bundles and their hashes, so we don't hash them again.
+    self.__links = {}
+    try:
+      with open(self.INDEX_PATH) as file_in:
+        self.__index = json.load(file_in)
+    except (OSError, ValueError):
+      self.__index = {}
+
+  def get_path(self, content_hash):
+    """Returns the path where the file with this hash is stored."""
+    return "%s%s/%s" % (self.folder, content_hash[0:2], content_hash)
+
+  def has(self, content_hash):
+    """Returns True if we have the file with this hash."""
+    return bool(content_hash) and os.path.isfile(self.get_path(content_hash))
+
+  def download(self, url, filename, headers=None, session=None, timeout=None):
+    """
+    Downloads a file, or reuses the stored copy if the server says it hasn't changed, and
+    puts it at the filename you provide. Returns the status code and file size, like
+    `download_file()` does, and returns 200 when we reuse the stored copy.
+    """
+    with self.__lock:
+      entry = dict(self.__index.get(url) or {})
+
+    headers = dict(headers or {})
+    if "getguru.com" in url:
+      headers.update(TRACKING_HEADERS)
+
+    # if we have the file, ask the server if it's changed since we downloaded it.
+    has_file = self.has(entry.get("hash"))
+    if has_file:
+      if entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+      if entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = (session or requests).get(url, headers=headers, allow_redirects=True, timeout=timeout, stream=True)
+    try:
+      if response.status_code == 304 and has_file:
+        self.__count(hit=True)
+        self.link(entry["hash"], filename)
+        return 200, entry["size"]
+      if response.status_code != 200:
+        return response.status_code, 0
+
+      self.__count(hit=False)
+      content_hash, size = self.__store(response.iter_content(CHUNK_SIZE))
+    finally:
+      response.close()
+
+    with self.__lock:
+      self.__index[url] = {
+        "hash": content_hash,
+        "size": size,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified")
+      }
+      self.__dirty = True
+
+    self.link(content_hash, filename)
+    return 200, size
+
+  def add_file(self, path):
+    """
+    Adds a local file to the store and returns its hash. We remember each file's size and
+    modified time so we don't read it again unless it changes.
+    """
+    path = os.path.abspath(path)
+    linked_hash = self.__links.get(path)
+    if linked_hash and self.has(linked_hash) and os.path.samefile(path, self.get_path(linked_hash)):
+      return linked_hash
+
+    stat = os.stat(path)
+    with self.__lock:
+      entry = self.__index.get(path)
+    if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime and self.has(entry["hash"]):
+      self.__count(hit=True)
+      return entry["hash"]
+
+    self.__count(hit=False)
+    with open(path, "rb") as file_in:
+      content_hash, size = self.__store(iter(lambda: file_in.read(CHUNK_SIZE), b""))
+
+    with self.__lock:
+      self.__index[path] = {"hash": content_hash, "size": size, "mtime": stat.st_mtime}
+      self.__dirty = True
+    return content_hash
+
+  def link(self, content_hash, filename):
+    """Puts the stored file with this hash at the filename you provide."""
+    _make_dir(filename)
+    src_path = self.get_path(content_hash)
+    if os.path.exists(filename):
+      try:
+        if os.path.samefile(src_path, filename):
+          return
+        os.remove(filename)
+      except FileNotFoundError:
+        # another thread removed the file after we checked.
+        pass
+    try:
+      os.link(src_path, filename)
+    except FileExistsError:
+      # another thread put the same file here.
+      pass
+    except OSError:
+      # hard links don't work across file systems (and on some file systems at all).
+      shutil.copyfile(src_path, filename)
+    self.__links[os.path.abspath(filename)] = content_hash
+
+  def save(self):
+    """Writes the index of URLs and files we've seen, if it changed."""
+    with self.__lock:
+      if not self.__dirty:
+        return
+      _make_dir(self.INDEX_PATH)
+      # we write to a temp file first so a crash can't leave a half-written index.
+      temp_path = self.INDEX_PATH + ".tmp"
+      with open(temp_path, "w") as file_out:
+        json.dump(self.__index, file_out)
+      os.replace(temp_path, self.INDEX_PATH)
+      self.__dirty = False
+
+  def stats(self):
+    """Returns the number of files we reused (hits) and downloaded or read (misses)."""
+    return {
+      "hits": self.hits,
+      "misses": self.misses,
+      "urls": len(self.__index)
+    }
+
+  def __count(self, hit):
+    """internal"""
+    with self.__lock:
+      if hit:
+        self.hits += 1
+      else:
+        self.misses += 1
+
+  def __store(self, chunks):
+    """internal: Writes the chunks to a temp file while hashing them, then moves it into place."""
+    os.makedirs(self.folder, exist_ok=True)
+    sha = hashlib.sha256()
+    size = 0
+    file_out = tempfile.NamedTemporaryFile(dir=self.folder, delete=False)
+    try:
+      with file_out:
+        for chunk in chunks:
+          sha.update(chunk)
+          size += len(chunk)
+          file_out.write(chunk)
+
+      content_hash = sha.hexdigest()
+      path = self.get_path(content_hash)
+      _make_dir(path)
+      if os.path.isfile(path):
+        os.remove(file_out.name)
+      else:
+        os.replace(file_out.name, path)
+    except BaseException:
+      if os.path.exists(file_out.name):
+        os.remove(file_out.name)
+      raise
+    return content_hash, size
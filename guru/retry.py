@@ -0,0 +1,163 @@
+import time
+import random
+import threading
+import email.utils
+
+# these statuses mean the request can be tried again. a 429 means we hit the rate
+# limit and the request wasn't processed. the 5xx ones are usually temporary.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# it's safe to repeat these calls because making them twice has the same effect as
+# making them once. post and patch calls are only retried when we get a 429.
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+
+def parse_retry_after(value):
+  """
+  Returns the number of seconds a Retry-After header tells us to wait. The
+  header can either be a number of seconds or an HTTP date. Returns None if
+  the header is missing or we can't parse it.
+  """
+  if not value:
+    return None
+
+  value = value.strip()
+  if value.isdigit():
+    return int(value)
+
+  try:
+    retry_date = email.utils.parsedate_to_datetime(value)
+  except (TypeError, ValueError):
+    return None
+  if not retry_date:
+    return None
+  return max(0, retry_date.timestamp() - time.time())
+
+
+def backoff_delay(attempt, base=1, max_backoff=60, jitter=True):
+  """
+  Returns how long to wait before the next attempt. The delay doubles on each
+  attempt and with jitter we pick a random value in the upper half of that range
+  so clients that failed at the same time don't all retry at the same time.
+  """
+  delay = min(max_backoff, base * (2 ** (attempt - 1)))
+  if jitter:
+    return delay / 2 + random.uniform(0, delay / 2)
+  return delay
+
+
+class RetryPolicy:
+  """
+  Decides which API calls are retried and how long we wait between attempts.
+  The Guru object uses one of these for every call it makes:
+
+  ```
+  # try each call up to 8 times and wait at most 30 seconds between attempts.
+  g = guru.Guru(retry=guru.RetryPolicy(max_attempts=8, max_backoff=30))
+
+  # don't retry anything.
+  g = guru.Guru(retry=False)
+  ```
+
+  When a response has a `Retry-After` header we wait that long, up to `max_backoff`
+  seconds, otherwise we use exponential backoff with jitter starting at `backoff` seconds.
+  """
+
+  def __init__(self, max_attempts=5, backoff=1, max_backoff=60, jitter=True, statuses=RETRY_STATUSES, idempotent_methods=IDEMPOTENT_METHODS):
+    self.max_attempts = max_attempts
+    self.backoff = backoff
+    self.max_backoff = max_backoff
+    self.jitter = jitter
+    self.statuses = statuses
+    self.idempotent_methods = idempotent_methods
+
+  def should_retry(self, method, attempt, status_code=None, idempotent=None):
+    """
+    Returns True if a call that just finished its nth attempt should be tried again.
+    A status_code of None means the call failed without a response (e.g. the
+    connection dropped). Some post calls are really reads and the caller can pass
+    idempotent=True to say it's safe to repeat them.
+    """
+    if attempt >= self.max_attempts:
+      return False
+
+    # a 429 means the server didn't process the request so it's safe to retry any call.
+    if status_code == 429:
+      return True
+
+    if idempotent is None:
+      idempotent = method.upper() in self.idempotent_methods
+    if not idempotent:
+      return False
+
+    return status_code is None or status_code in self.statuses
+
+  def get_delay(self, attempt, response=None):
+    """Returns the number of seconds to wait before the next attempt."""
+    if response is not None:
+      retry_after = parse_retry_after(response.headers.get("Retry-After"))
+      # a server could ask us to wait much longer than we'd want to, so we cap it.
+      if retry_after is not None:
+        return min(retry_after, self.max_backoff)
+
+    return backoff_delay(attempt, self.backoff, self.max_backoff, self.jitter)
+
+
+class RateLimiter:
+  """
+  A token bucket that keeps us at or under a sustained number of calls per second.
+  `burst` is how many calls can be made back to back after the client has been idle
+  and it defaults to one second's worth of calls.
+
+  ```
+  # stay at 10 calls per second across every thread using this Guru object.
+  g = guru.Guru(rate_limit=10)
+  ```
+  """
+
+  def __init__(self, rate, burst=None):
+    if rate <= 0:
+      raise ValueError("rate must be greater than zero")
+
+    self.rate = float(rate)
+    self.capacity = float(burst or max(1, rate))
+    self.__tokens = self.capacity
+    self.__updated = time.monotonic()
+    self.__paused_until = 0
+    self.__lock = threading.Lock()
+
+  def __refill(self, now):
+    """internal"""
+    elapsed = now - self.__updated
+    self.__tokens = min(self.capacity, self.__tokens + elapsed * self.rate)
+    self.__updated = now
+
+  def pause(self, seconds):
+    """
+    Stops handing out tokens for the given number of seconds. We do this when the
+    API tells us to slow down so every thread backs off, not just the one that got
+    the 429 response.
+    """
+    with self.__lock:
+      self.__paused_until = max(self.__paused_until, time.monotonic() + seconds)
+      self.__tokens = 0
+      # tokens start refilling once the pause is over.
+      self.__updated = self.__paused_until
+
+  def acquire(self, tokens=1):
+    """Blocks until the call can be made and returns how long we waited."""
+    waited = 0
+    while True:
+      with self.__lock:
+        now = time.monotonic()
+        if now < self.__paused_until:
+          wait = self.__paused_until - now
+        else:
+          self.__refill(now)
+          if self.__tokens >= tokens:
+            self.__tokens -= tokens
+            return waited
+          wait = (tokens - self.__tokens) / self.rate
+
+      time.sleep(wait)
+      waited += wait
@@ -0,0 +1,181 @@
+import os
+import time
+import uuid
+import threading
+
+# we send files in chunks so a big zip file never has to fit in memory.
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadProgress:
+  """
+  Tells you how an upload is going. If you pass a `progress` function to
+  `bundle.upload()` it's called with one of these after each chunk is sent:
+
+  ```
+  def show_progress(progress):
+    print("%.0f%% sent, %.1f MB/s" % (progress.percent or 0, progress.throughput / 1000000))
+
+  bundle.upload(name="General", is_sync=True, progress=show_progress)
+  ```
+
+  `total_bytes` is None when the zip file is still being written, since we don't
+  know how big it'll be yet. If the upload fails and is retried, `attempt` goes up
+  and `bytes_sent` starts over from zero.
+  """
+
+  def __init__(self, total_bytes=None):
+    self.total_bytes = total_bytes
+    self.bytes_sent = 0
+    self.attempt = 0
+    self.started = None
+    self.finished = None
+
+  @property
+  def elapsed(self):
+    """The number of seconds the current attempt has been running."""
+    if self.started is None:
+      return 0
+    return (self.finished or time.time()) - self.started
+
+  @property
+  def throughput(self):
+    """The number of bytes sent per second in the current attempt."""
+    elapsed = self.elapsed
+    return self.bytes_sent / elapsed if elapsed > 0 else 0
+
+  @property
+  def percent(self):
+    """How much of the upload has been sent, from 0 to 100, or None if we don't know the total size."""
+    if not self.total_bytes:
+      return None
+    return 100.0 * self.bytes_sent / self.total_bytes
+
+  def stats(self):
+    """Returns the bytes sent, seconds it took, bytes per second, and number of attempts."""
+    return {
+      "bytes": self.bytes_sent,
+      "seconds": self.elapsed,
+      "bytes_per_second": self.throughput,
+      "attempts": self.attempt
+    }
+
+
+class GrowingFile:
+  """
+  internal:
+  A file that's uploaded while it's being written. zip() writes to it and the upload
+  reads it back from disk, waiting when it catches up to the writer. Since the whole
+  file ends up on disk, a failed upload can be retried by reading it again.
+
+  It doesn't support tell() or seek(), which makes zipfile write each entry's sizes
+  after its data instead of going back to fill them in, so everything we've written
+  is final and safe to send.
+  """
+
+  def __init__(self, path):
+    self.path = path
+    self.__file = open(path, "wb")
+    self.__size = 0
+    self.__done = False
+    self.__error = None
+    self.__condition = threading.Condition()
+
+  def write(self, data):
+    self.__file.write(data)
+    # the reader has its own file handle so it can only see what we've flushed.
+    self.__file.flush()
+    with self.__condition:
+      self.__size += len(data)
+      self.__condition.notify_all()
+    return len(data)
+
+  def flush(self):
+    pass
+
+  def finish(self, error=None):
+    """Closes the file. If there's an error, readers raise it instead of sending a partial file."""
+    self.__file.close()
+    with self.__condition:
+      self.__done = True
+      self.__error = error
+      self.__condition.notify_all()
+
+  def read_chunks(self, chunk_size=CHUNK_SIZE):
+    """Yields the file's content from the start, waiting for more to be written until it's finished."""
+    position = 0
+    with open(self.path, "rb") as file_in:
+      while True:
+        with self.__condition:
+          while position >= self.__size and not self.__done:
+            self.__condition.wait()
+          size, done, error = self.__size, self.__done, self.__error
+
+        if error:
+          raise BaseException("the file being uploaded wasn't finished: %s" % error)
+
+        while position < size:
+          chunk = file_in.read(min(chunk_size, size - position))
+          position += len(chunk)
+          yield chunk
+
+        if done:
+          return
+
+
+class MultipartUpload:
+  """
+  internal:
+  A multipart/form-data request body with one file in it. The file is read in chunks
+  as it's sent, and each time requests iterates over the body we start again from the
+  beginning of the file, so a failed upload can be retried without making the file again.
+  """
+
+  def __init__(self, field, filename, path, content_type, callback=None, growing_file=None):
+    boundary = uuid.uuid4().hex
+    self.content_type = "multipart/form-data; boundary=%s" % boundary
+    self.__head = ('--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\nContent-Type: %s\r\n\r\n' % (
+      boundary, field, filename, content_type
+    )).encode("utf-8")
+    self.__tail = ("\r\n--%s--\r\n" % boundary).encode("utf-8")
+    self.__path = path
+    self.__growing_file = growing_file
+    self.__callback = callback
+
+    # requests uses this as the Content-Length. if the file is still being written we don't
+    # know how big it'll be, so it's None and requests sends the body in chunks instead.
+    self.len = None if growing_file else len(self.__head) + os.path.getsize(path) + len(self.__tail)
+    self.progress = UploadProgress(self.len)
+
+  def __iter__(self):
+    progress = self.progress
+    progress.attempt += 1
+    progress.bytes_sent = 0
+    progress.started = time.time()
+    progress.finished = None
+
+    if self.__growing_file:
+      chunks = self.__growing_file.read_chunks()
+    else:
+      chunks = self.__read_chunks()
+
+    for chunk in self.__with_head_and_tail(chunks):
+      yield chunk
+      progress.bytes_sent += len(chunk)
+      if self.__callback:
+        self.__callback(progress)
+
+    progress.finished = time.time()
+
+  def __with_head_and_tail(self, chunks):
+    """internal"""
+    yield self.__head
+    for chunk in chunks:
+      yield chunk
+    yield self.__tail
+
+  def __read_chunks(self):
+    """internal"""
+    with open(self.__path, "rb") as file_in:
+      for chunk in iter(lambda: file_in.read(CHUNK_SIZE), b""):
+        yield chunk
@@ -29,8 +29,74 @@ TRACKING_HEADERS = {
     "X-Amzn-Trace-Id": "GApp=sdk"
 }
 
+# these are the BeautifulSoup parsers we support. you can also use "auto", which picks lxml
+# if it's installed because it's faster, otherwise it uses python's built-in parser.
+# we don't support html5lib because it changes the html, like adding <tbody> to tables.
+HTML_PARSERS = ["html.parser", "lxml"]
+DEFAULT_HTML_PARSER = "html.parser"
+
+
+def get_html_parser(parser=None):
+  """Returns the name of the BeautifulSoup parser to use, resolving "auto" to lxml if it's installed."""
+  if not parser:
+    return DEFAULT_HTML_PARSER
+  if parser == "auto":
+    try:
+      import lxml
+      return "lxml"
+    except ImportError:
+      return DEFAULT_HTML_PARSER
+  if parser not in HTML_PARSERS:
+    raise ValueError("invalid html parser '%s', it should be 'auto' or one of: %s" % (parser, ", ".join(HTML_PARSERS)))
+  return parser
+
+
+# lxml puts every document inside these tags, even when we're parsing a fragment.
+FRAGMENT_WRAPPERS = ("html", "head", "body")
+fragment_builder = None
+
+
+def get_fragment_builder():
+  """
+  internal:
+  Returns a BeautifulSoup tree builder that parses with lxml but leaves out the <html>,
+  <head>, and <body> tags lxml adds, so a fragment's tags go right into the document.
+  It's made the first time we need it so we don't import lxml unless it's being used.
+  """
+  global fragment_builder
+  if not fragment_builder:
+    from bs4.builder import LXMLTreeBuilder
+
+    class FragmentTreeBuilder(LXMLTreeBuilder):
+      def start(self, tag, attrib, nsmap={}):
+        if tag not in FRAGMENT_WRAPPERS:
+          super().start(tag, attrib, nsmap)
+
+      def end(self, tag):
+        if tag not in FRAGMENT_WRAPPERS:
+          super().end(tag)
+
+    fragment_builder = FragmentTreeBuilder
+  return fragment_builder
+
 
-def load_html(url, cache=False, make_links_absolute=True, headers=None):
+def parse_html(html, parser=None, fragment=True):
+  """
+  Parses html and returns a BeautifulSoup document. Card content is a fragment, not a
+  whole page, and lxml adds <html> and <body> tags around it so we leave those out. That
+  way str(doc) gives you the same html for every parser, as long as the html is well-formed.
+  Parsers fix broken html in different ways, e.g. lxml closes a <p> when another one
+  starts inside it and html.parser nests them.
+  """
+  parser = get_html_parser(parser)
+  if not fragment or parser == "html.parser":
+    return BeautifulSoup(html, parser)
+
+  # putting the fragment inside <body> keeps lxml from wrapping bare text in a <p> tag.
+  return BeautifulSoup("<html><body>%s</body></html>" % (html or ""), builder=get_fragment_builder())
+
+
+def load_html(url, cache=False, make_links_absolute=True, headers=None, parser=None):
   """Fetches HTML from the given URL and returns it as a BeautifulSoup document object."""
   if url.startswith("http"):
     html, status_code = http_get(url, cache, headers)
@@ -40,7 +106,7 @@ def load_html(url, cache=False, make_links_absolute=True, headers=None):
     html = read_file(url)
     status_code = 200
 
-  doc = BeautifulSoup(html, "html.parser")
+  doc = parse_html(html, parser, fragment=False)
 
   # since we know the url this is all coming from we can make link urls
   # absolute so we don't have to worry about that later on.
@@ -109,17 +175,25 @@ def http_post(url, data=None, cache=False, headers=None):
   return html, response.status_code
 
 
-def download_file(url, filename, headers=None, cache=False):
-  """Downloads an image and saves it as the full filename you provide."""
+def download_file(url, filename, headers=None, cache=False, session=None, timeout=None):
+  """
+  Downloads an image and saves it as the full filename you provide.
+
+  If you pass a requests `session` the download reuses its pooled connections
+  (and any auth or headers it has), otherwise a new connection is made.
+  """
   if cache and os.path.isfile(filename):
     return 200, os.path.getsize(filename)
 
+  if not headers:
+    headers = {}
+
   # if you're making a request to a getguru.com url, include our tracking headers.
   if "getguru.com" in url:
     for header in TRACKING_HEADERS:
       headers[header] = TRACKING_HEADERS[header]
 
-  response = requests.get(url, headers=headers, allow_redirects=True)
+  response = (session or requests).get(url, headers=headers, allow_redirects=True, timeout=timeout)
   file_size = 0
   if response.status_code == 200:
     make_dir(filename)
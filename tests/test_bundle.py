@@ -1,10 +1,17 @@
 
+import os
 import json
+import time
+import shutil
+import hashlib
 import yaml
+import zipfile
 import unittest
+import requests
+import threading
 import responses
 
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
 import guru
 
@@ -870,6 +877,34 @@ class TestBundle(unittest.TestCase):
     sync.print_tree(just_types=True)
     sync.view_in_browser(open_browser=False)
 
+  @use_guru()
+  def test_spreadsheet_stats(self, g):
+    bundle = g.bundle("test_spreadsheet_stats")
+    group = bundle.node(id="group", title="group")
+    board = bundle.node(id="board", title="board").add_to(group)
+    section = bundle.node(id="section", title="section").add_to(board)
+    bundle.node(id="1", url="https://www.example.com/1", title="card 1", content="""<h1>Card 1</h1>
+<p>See <a href="https://www.example.com/2">card 2</a> and <a href="https://www.example.org/">this site</a>.</p>
+<table><tr><td>one</td><td>two</td></tr></table>""").add_to(section)
+    bundle.node(id="2", url="https://www.example.com/2", title="card 2", content="<h2>Card 2</h2><p><img src=\"https://www.example.com/a.png\"/></p>").add_to(section)
+    bundle.node(id="3", title="card 3", content="<p>card 3</p>").add_to(board)
+    bundle.zip()
+
+    rows = {row[1]: row for row in [row.split("\t") for row in bundle.build_spreadsheet().split("\n")]}
+    self.assertEqual(rows["group"][5:7], ["1", ""])
+    self.assertEqual(rows["board"][5:7], ["4", "1"])
+    self.assertEqual(rows["section"][5:7], ["2", ""])
+    self.assertEqual(rows["1"][8:], ["8", "8", "9", "1", "0", "0", "1", "0", "2", "1", "0", "2", "0", "0"])
+    self.assertEqual(rows["2"][8:], ["3", "3", "2", "0", "1", "0", "1", "0", "0", "0", "0", "0", "1", "0"])
+
+    # the same counts are in the log and they're worked out again if the content changes.
+    events = [e for e in bundle.events if e["message"] == "analyzed node html"]
+    self.assertEqual([(e["node"], e["card_links"]) for e in events], [("1", 1), ("2", 0), ("3", 0)])
+    node = bundle.node("3")
+    self.assertIs(node.get_stats(), node.get_stats())
+    node.content = "<p>card 3 has more words now</p>"
+    self.assertEqual(node.get_stats()["words"], 6)
+
   @use_guru()
   def test_sync_with_local_files(self, g):
     sync = g.bundle("test_sync_with_local_files")
@@ -1711,3 +1746,430 @@ it's multiple lines
     bundle.zip()
 
     self.assertEqual(read_html("/tmp/test_removing_empty_lists_and_list_items/cards/1.html"), new_html)
+
+  @use_guru()
+  def test_node_lookups(self, g):
+    bundle = g.bundle("test_node_lookups")
+    node1 = bundle.node(id="1", url="https://www.example.com/1", title="node 1", content="<p>node 1</p><h2>part 2</h2><p>more</p>")
+    node2 = bundle.node(url="https://www.example.com/2", title="node 2")
+
+    self.assertTrue(bundle.has_node("1"))
+    self.assertIs(bundle.node(id="1"), node1)
+    self.assertIs(bundle.node(url="https://www.example.com/2"), node2)
+    self.assertIs(bundle.find_node("https://www.example.com/1"), node1)
+
+    # the url index follows url changes.
+    node2.url = "https://www.example.com/two"
+    self.assertIsNone(bundle.find_node("https://www.example.com/2"))
+    self.assertIs(bundle.find_node("https://www.example.com/two"), node2)
+
+    # new nodes from splitting have the same url but the original node comes first.
+    node1.add_to(node2)
+    node1.split("h2", "Part 2")
+    self.assertTrue(bundle.has_node("1_part1"))
+    self.assertIs(bundle.find_node("https://www.example.com/1"), node1)
+
+    node1.remove()
+    self.assertFalse(bundle.has_node("1"))
+    self.assertIs(bundle.find_node("https://www.example.com/1"), bundle.node(id="1_part1"))
+    self.assertEqual([n.id for n in bundle.nodes], [node2.id, "1_part1"])
+
+    # removing nodes while iterating over the list is fine and re-adding an id
+    # gives a new node at the end of the list.
+    for node in bundle.nodes:
+      node.remove()
+    self.assertEqual(bundle.nodes, [])
+    node1 = bundle.node(id="1", url="https://www.example.com/1")
+    bundle.node(id="3")
+    bundle.remove_node(node1)
+    node1 = bundle.node(id="1")
+    self.assertEqual([n.id for n in bundle.nodes], ["3", "1"])
+    self.assertIs(bundle.node(id="1"), node1)
+    self.assertIsNone(bundle.find_node("https://www.example.com/1"))
+
+  @use_guru()
+  def test_linking_with_link_key_and_compare_links(self, g):
+    bundle = g.bundle("test_linking_with_link_key_and_compare_links")
+    board = bundle.node(id="board", title="board")
+    card1 = bundle.node(id="card1", title="card 1", url="https://www.example.com/page1/", content="<p>card 1</p>").add_to(board)
+    card2 = bundle.node(id="card2", title="card 2", url="https://www.example.com/page2", content="<p>card 2</p>").add_to(board)
+    card3 = bundle.node(id="card3", title="card 3", content="""<p>
+<a href="https://www.example.com/page1#intro">page 1</a>
+<a href="https://www.example.com/page2/">page 2</a>
+<a href="https://www.example.com/?p=2">page 2 by its old url</a>
+</p>""").add_to(board)
+
+    def compare_links(node, url):
+      return node.id == "card2" and url.endswith("?p=2")
+
+    bundle.zip(
+      link_key=lambda url: url.split("#")[0].rstrip("/"),
+      compare_links=compare_links
+    )
+
+    self.assertEqual(read_html("/tmp/test_linking_with_link_key_and_compare_links/cards/card3.html"), """<p>
+<a href="cards/card1">page 1</a>
+<a href="cards/card2">page 2</a>
+<a href="cards/card2">page 2 by its old url</a>
+</p>""")
+
+  @use_guru()
+  def test_zip_with_workers(self, g):
+    lock = threading.Lock()
+    downloads = []
+    def download_func(url, filename, bundle, node):
+      with lock:
+        downloads.append(url)
+      # give the other threads time to ask for the same file.
+      time.sleep(0.05)
+      if "missing" in url:
+        return False
+      os.makedirs(os.path.dirname(filename), exist_ok=True)
+      with open(filename, "w") as file_out:
+        file_out.write(url)
+      return True
+
+    def make_bundle(name):
+      bundle = g.bundle(name)
+      board = bundle.node(id="board", title="board")
+      for i in range(8):
+        bundle.node(id="card%s" % i, title="card %s" % i, url="https://www.example.com/%s" % i, content="""<p>
+<img src="https://www.example.com/logo.png"/>
+<img src="https://www.example.com/image%s.png"/>
+<img src="https://www.example.com/missing.png"/>
+<a href="https://www.example.com/%s">next</a>
+</p>""" % (i % 2, (i + 1) % 8)).add_to(board)
+      return bundle
+
+    make_bundle("test_zip_with_workers_1").zip(download_func=download_func)
+    serial_downloads = sorted(downloads)
+    downloads.clear()
+    make_bundle("test_zip_with_workers_4").zip(download_func=download_func, workers=4)
+
+    # each file is downloaded once, even the one that fails, and the output is the same.
+    self.assertEqual(sorted(downloads), serial_downloads)
+    self.assertEqual(serial_downloads, [
+      "https://www.example.com/image0.png",
+      "https://www.example.com/image1.png",
+      "https://www.example.com/logo.png",
+      "https://www.example.com/missing.png"
+    ])
+    for i in range(8):
+      self.assertEqual(
+        read_html("/tmp/test_zip_with_workers_4/cards/card%s.html" % i),
+        read_html("/tmp/test_zip_with_workers_1/cards/card%s.html" % i)
+      )
+    self.assertIn('src="https://www.example.com/missing.png"', read_html("/tmp/test_zip_with_workers_4/cards/card3.html"))
+
+    # the files are added to the zip in the same order too.
+    names = []
+    for name in ["test_zip_with_workers_1", "test_zip_with_workers_4"]:
+      with zipfile.ZipFile("/tmp/collection_%s.zip" % name) as zip_file:
+        names.append(zip_file.namelist())
+    self.assertEqual(names[0], names[1])
+    self.assertEqual(len([n for n in names[1] if n.startswith("resources/")]), 3)
+
+  @use_guru()
+  def test_cleaning_html_in_other_processes(self, g):
+    with open("tests/example.html") as file_in:
+      example = file_in.read()
+
+    def make_bundle(name, processes=None):
+      bundle = g.bundle(name, processes=processes)
+      board = bundle.node(id="board", title="board")
+      for i in range(6):
+        bundle.node(id="card%s" % i, title="card %s" % i, content=example).add_to(board)
+      # nodes can be updated while their html is being cleaned up.
+      bundle.node(id="card0", content="<div><h2>one</h2><span>first</span><h2>two</h2><p>second</p></div>")
+      bundle.node(id="card0").split_all("h2")
+      return bundle
+
+    serial = make_bundle("test_cleaning_html_serially")
+    serial.zip()
+    parallel = make_bundle("test_cleaning_html_in_other_processes", processes=2)
+    parallel.zip()
+
+    self.assertEqual([n.id for n in parallel.nodes], [n.id for n in serial.nodes])
+    for node in serial.nodes:
+      if node.type == guru.bundle.CARD and not node.removed:
+        self.assertEqual(
+          read_html("/tmp/test_cleaning_html_in_other_processes/cards/%s.html" % node.id),
+          read_html("/tmp/test_cleaning_html_serially/cards/%s.html" % node.id)
+        )
+
+  @use_guru()
+  def test_streaming_the_zip_file(self, g):
+    def download_func(url, filename, bundle, node):
+      os.makedirs(os.path.dirname(filename), exist_ok=True)
+      with open(filename, "w") as file_out:
+        file_out.write("image data")
+      return True
+
+    # one bundle has a local image and the other has one we download.
+    def make_bundle(name, local):
+      bundle = g.bundle(name)
+      board = bundle.node(id="board", title="board")
+      html_file = "./tests/test_sync_with_local_files_node1.html"
+      if local:
+        bundle.node(id="1", url=html_file, title="local", content=read_html(html_file)).add_to(board)
+      else:
+        bundle.node(id="1", title="remote", content='<p><img src="https://www.example.com/image.png"/> text</p>').add_to(board)
+      return bundle
+
+    for local in [True, False]:
+      func = None if local else download_func
+      make_bundle("test_zip_without_streaming", local).zip(download_func=func)
+      make_bundle("test_streaming_the_zip_file", local).zip(download_func=func, stream=True, compression_level=9)
+
+      files = []
+      for name in ["test_zip_without_streaming", "test_streaming_the_zip_file"]:
+        with zipfile.ZipFile("/tmp/collection_%s.zip" % name) as zip_file:
+          files.append({info.filename: (zip_file.read(info), info.compress_type) for info in zip_file.infolist()})
+
+      # the zip files have the same contents and images aren't compressed.
+      self.assertEqual(files[0], files[1])
+      self.assertEqual(sorted(files[1]), ["boards/board.yaml", "cards/1.html", "cards/1.yaml", "collection.yaml", "resources/%s.png" % (
+        "fc82d6ce26e49cd7415aec38ff402de7" if local else "ef5e76e4431d635da7d5a491c21934e4"
+      )])
+      for filename, (content, compress_type) in files[1].items():
+        self.assertEqual(compress_type, zipfile.ZIP_STORED if filename.endswith(".png") else zipfile.ZIP_DEFLATED)
+
+      # the card files only went into the zip file and local images weren't copied.
+      self.assertEqual(os.path.exists("/tmp/test_streaming_the_zip_file/cards/1.html"), False)
+      self.assertEqual(os.path.exists("/tmp/test_streaming_the_zip_file/resources"), not local)
+
+    # if you want to view the bundle in a browser we can keep the files too.
+    make_bundle("test_streaming_the_zip_file", True).zip(stream=True, keep_files=True)
+    self.assertEqual(read_html("/tmp/test_streaming_the_zip_file/cards/1.html"), """<p>
+<img src="resources/fc82d6ce26e49cd7415aec38ff402de7.png"/>
+</p>""")
+    self.assertTrue(os.path.exists("/tmp/test_streaming_the_zip_file/resources/fc82d6ce26e49cd7415aec38ff402de7.png"))
+
+  @use_guru()
+  @responses.activate
+  def test_incremental_bundles(self, g):
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/collections", json=[{"id": "1111", "name": "test"}])
+    responses.add(responses.POST, "https://api.getguru.com/app/contentsyncupload?collectionId=1111", json={})
+
+    downloads = []
+    def download_func(url, filename, bundle, node):
+      if not url.endswith(".png"):
+        return False
+      downloads.append(url)
+      os.makedirs(os.path.dirname(filename), exist_ok=True)
+      with open(filename, "w") as file_out:
+        file_out.write(url)
+      return True
+
+    def sync(cards):
+      bundle = g.bundle("test_incremental_bundles", incremental=True)
+      board = bundle.node(id="board", title="board")
+      for id, content in cards:
+        bundle.node(id=id, url="https://www.example.com/%s" % id, title="card %s" % id, content=content).add_to(board)
+      bundle.zip(download_func=download_func)
+      bundle.upload(collection_id="1111", is_sync=True)
+      return bundle
+
+    cards = [
+      ("1", '<p>card 1 <a href="https://www.example.com/3">card 3</a></p>'),
+      ("2", '<p><img src="https://www.example.com/image.png"/></p>'),
+      ("3", "<p>card 3</p>")
+    ]
+    # start from scratch in case the manifest is left over from an earlier run.
+    g.bundle("test_incremental_bundles").zip()
+    if os.path.exists("/tmp/manifest_test_incremental_bundles.json"):
+      os.remove("/tmp/manifest_test_incremental_bundles.json")
+
+    bundle = sync(cards)
+    self.assertEqual(bundle.changeset["added"], ["board", "1", "2", "3"])
+    self.assertEqual(len(bundle.changeset["resources"]["added"]), 1)
+    self.assertEqual(len(downloads), 1)
+    self.assertEqual(len(responses.calls), 2)
+    with zipfile.ZipFile("/tmp/collection_test_incremental_bundles.zip") as zip_file:
+      first_zip = {name: zip_file.read(name) for name in zip_file.namelist()}
+
+    # if nothing changed, nothing is redone or uploaded and the zip file is the same.
+    bundle = sync(cards)
+    self.assertEqual(bundle.changeset["unchanged"], ["board", "1", "2", "3"])
+    self.assertFalse(bundle.has_changes)
+    self.assertEqual(len(downloads), 1)
+    self.assertEqual(len(responses.calls), 2)
+    self.assertEqual(bundle.node("1").content, '<p>card 1 <a href="cards/3">card 3</a></p>')
+    with zipfile.ZipFile("/tmp/collection_test_incremental_bundles.zip") as zip_file:
+      self.assertEqual({name: zip_file.read(name) for name in zip_file.namelist()}, first_zip)
+
+    # removing card 3 changes the board and card 1, whose link isn't a card-to-card link anymore.
+    bundle = sync([cards[0], ("2", "<p>no image</p>")])
+    self.assertEqual(bundle.changeset["changed"], ["board", "1", "2"])
+    self.assertEqual(bundle.changeset["removed"], ["3"])
+    self.assertEqual(len(bundle.changeset["resources"]["removed"]), 1)
+    self.assertEqual(len(responses.calls), 4)
+    self.assertEqual(read_html("/tmp/test_incremental_bundles/cards/1.html"), '<p>card 1 <a href="https://www.example.com/3">card 3</a></p>')
+    self.assertFalse(os.path.exists("/tmp/test_incremental_bundles/cards/3.html"))
+    self.assertEqual(os.listdir("/tmp/test_incremental_bundles/resources"), [])
+    with zipfile.ZipFile("/tmp/collection_test_incremental_bundles.zip") as zip_file:
+      self.assertEqual(sorted(zip_file.namelist()), ["boards/board.yaml", "cards/1.html", "cards/1.yaml", "cards/2.html", "cards/2.yaml", "collection.yaml"])
+
+  @use_guru()
+  @responses.activate
+  def test_resource_store(self, g):
+    # the same image is at two urls and only one of them has an etag.
+    responses.add(responses.GET, "https://www.example.com/logo.png", body=b"image data", headers={"ETag": '"v1"'})
+    responses.add(responses.GET, "https://www.example.com/logo.png", status=304)
+    responses.add(responses.GET, "https://cdn.example.com/logo-copy.png", body=b"image data")
+    responses.add(responses.GET, "https://cdn.example.com/logo-copy.png", body=b"image data")
+
+    if os.path.exists("/tmp/test_resource_store_files"):
+      shutil.rmtree("/tmp/test_resource_store_files")
+    store = guru.ResourceStore("/tmp/test_resource_store_files")
+    resource_id = hashlib.sha256(b"image data").hexdigest() + ".png"
+
+    def download_func(url, filename, bundle, node):
+      return bundle.download_file(url, filename)
+
+    for run in range(2):
+      bundle = g.bundle("test_resource_store", resource_store=store)
+      bundle.node(id="1", title="card 1", content='<p><img src="https://www.example.com/logo.png"/></p>')
+      bundle.node(id="2", title="card 2", content='<p><img src="https://cdn.example.com/logo-copy.png"/></p>')
+      bundle.zip(download_func=download_func)
+
+      # both cards use the same file and it's only in the zip once.
+      for id in ["1", "2"]:
+        self.assertEqual(read_html("/tmp/test_resource_store/cards/%s.html" % id), '<p><img src="resources/%s"/></p>' % resource_id)
+      with zipfile.ZipFile("/tmp/collection_test_resource_store.zip") as zip_file:
+        self.assertEqual([name for name in zip_file.namelist() if name.startswith("resources/")], ["resources/%s" % resource_id])
+      self.assertTrue(os.path.samefile("/tmp/test_resource_store/resources/%s" % resource_id, store.get_path(resource_id[0:-4])))
+
+    # the second time we asked if the first url changed and reused the file we had.
+    calls = [call.request for call in responses.calls if call.request.url == "https://www.example.com/logo.png"]
+    self.assertEqual([call.headers.get("If-None-Match") for call in calls], [None, '"v1"'])
+    self.assertEqual(store.stats(), {"hits": 1, "misses": 3, "urls": 2})
+
+    # a new store object loads the index we saved.
+    self.assertEqual(guru.ResourceStore("/tmp/test_resource_store_files").stats()["urls"], 2)
+
+  @use_guru()
+  def test_resource_store_with_local_files(self, g):
+    if os.path.exists("/tmp/test_resource_store_local_files"):
+      shutil.rmtree("/tmp/test_resource_store_local_files")
+    store = guru.ResourceStore("/tmp/test_resource_store_local_files")
+
+    with open("./tests/test_sync_with_local_files_test.png", "rb") as file_in:
+      resource_id = hashlib.sha256(file_in.read()).hexdigest() + ".png"
+
+    for run in range(2):
+      bundle = g.bundle("test_resource_store_with_local_files", resource_store=store)
+      html_file = "./tests/test_sync_with_local_files_node1.html"
+      bundle.node(id="1", url=html_file, title="node 1", content=read_html(html_file))
+      bundle.zip()
+
+      self.assertEqual(read_html("/tmp/test_resource_store_with_local_files/cards/1.html"), """<p>
+<img src="resources/%s"/>
+</p>""" % resource_id)
+
+    # the file was only read the first time.
+    self.assertEqual(store.stats(), {"hits": 1, "misses": 1, "urls": 1})
+
+  def test_resource_store_link_when_the_file_is_removed(self):
+    if os.path.exists("/tmp/test_resource_store_link"):
+      shutil.rmtree("/tmp/test_resource_store_link")
+    store = guru.ResourceStore("/tmp/test_resource_store_link/store")
+    content_hash = store.add_file("./tests/test_sync_with_local_files_test.png")
+    filename = "/tmp/test_resource_store_link/bundle/test.png"
+    os.makedirs(os.path.dirname(filename))
+    with open(filename, "w") as file_out:
+      file_out.write("old file")
+
+    # another thread removes the old file right before we do.
+    remove = os.remove
+    def remove_twice(path):
+      remove(path)
+      raise FileNotFoundError(path)
+
+    with patch("os.remove", side_effect=remove_twice):
+      store.link(content_hash, filename)
+    self.assertTrue(os.path.samefile(filename, store.get_path(content_hash)))
+
+  @responses.activate
+  def test_upload_progress_and_retries(self):
+    g = guru.Guru("user@example.com", "abcd1234", silent=True, retry=guru.RetryPolicy(backoff=0))
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/collections", json=[{"id": "1111", "name": "test"}])
+
+    # the first attempt reads part of the file then the connection drops.
+    bodies = []
+    def callback(request):
+      if not bodies:
+        bodies.append(next(iter(request.body)))
+        raise requests.exceptions.ConnectionError("connection dropped")
+      bodies.append(b"".join(request.body))
+      return (200, {}, json.dumps({"id": "1"}))
+    responses.add_callback(responses.POST, "https://api.getguru.com/app/contentsyncupload?collectionId=1111", callback=callback)
+
+    bundle = g.bundle("test_upload_progress_and_retries")
+    bundle.node(id="1", title="card 1", content="<p>card 1</p>")
+    bundle.zip()
+
+    updates = []
+    result = bundle.upload(collection_id="1111", is_sync=True, progress=lambda p: updates.append((p.attempt, p.bytes_sent, p.percent)))
+    self.assertEqual(result, {"id": "1"})
+
+    # the retry sent the whole zip file again with its size in the headers.
+    with open("/tmp/collection_test_upload_progress_and_retries.zip", "rb") as file_in:
+      zip_data = file_in.read()
+    request = responses.calls[-1].request
+    self.assertEqual(len(bodies), 2)
+    self.assertIn(b'name="file"; filename="collection_test_upload_progress_and_retries.zip"', bodies[1])
+    self.assertIn(b"\r\n\r\n" + zip_data + b"\r\n--", bodies[1])
+    self.assertEqual(request.headers["Content-Length"], str(len(bodies[1])))
+    self.assertTrue(request.headers["Content-Type"].startswith("multipart/form-data; boundary="))
+
+    # progress started over for the second attempt and got to 100%.
+    self.assertEqual(updates[0], (2, len(bodies[0]), 100.0 * len(bodies[0]) / len(bodies[1])))
+    self.assertEqual(updates[-1], (2, len(bodies[1]), 100.0))
+    self.assertEqual(bundle.upload_stats["bytes"], len(bodies[1]))
+    self.assertEqual(bundle.upload_stats["attempts"], 2)
+
+  @use_guru()
+  @responses.activate
+  def test_zip_and_upload(self, g):
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/collections", json=[{"id": "1111", "name": "test"}])
+    bodies = []
+    def callback(request):
+      bodies.append((request.headers, b"".join(request.body)))
+      return (200, {}, json.dumps({}))
+    responses.add_callback(responses.POST, "https://api.getguru.com/app/contentsyncupload?collectionId=1111", callback=callback)
+
+    def make_bundle(name):
+      bundle = g.bundle(name, incremental=True)
+      html_file = "./tests/test_sync_with_local_files_node1.html"
+      bundle.node(id="1", url=html_file, title="local", content=read_html(html_file))
+      bundle.node(id="2", title="card 2", content="<p>card 2</p>")
+      return bundle
+
+    # start from scratch in case the manifest is left over from an earlier run.
+    if os.path.exists("/tmp/manifest_test_zip_and_upload.json"):
+      os.remove("/tmp/manifest_test_zip_and_upload.json")
+
+    make_bundle("test_zip_without_uploading").zip(stream=True)
+    make_bundle("test_zip_and_upload").zip_and_upload(collection_id="1111", is_sync=True)
+
+    # we didn't know the size when we started so the body was sent in chunks and it's the zip file on disk.
+    headers, body = bodies[0]
+    self.assertEqual(headers["Transfer-Encoding"], "chunked")
+    self.assertNotIn("Content-Length", headers)
+    with open("/tmp/collection_test_zip_and_upload.zip", "rb") as file_in:
+      zip_data = file_in.read()
+    self.assertIn(b"\r\n\r\n" + zip_data + b"\r\n--", body)
+
+    # it has the same files as a zip file we didn't upload, but the image is deflated without compression.
+    files = []
+    for name in ["test_zip_without_uploading", "test_zip_and_upload"]:
+      with zipfile.ZipFile("/tmp/collection_%s.zip" % name) as zip_file:
+        files.append({info.filename: (zip_file.read(info), info.compress_type) for info in zip_file.infolist()})
+    self.assertEqual({k: v[0] for k, v in files[0].items()}, {k: v[0] for k, v in files[1].items()})
+    for filename, (content, compress_type) in files[1].items():
+      self.assertEqual(compress_type, zipfile.ZIP_DEFLATED)
+
+    # when nothing changed, the sync isn't uploaded again.
+    make_bundle("test_zip_and_upload").zip_and_upload(collection_id="1111", is_sync=True)
+    self.assertEqual(len(bodies), 1)
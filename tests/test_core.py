@@ -4,6 +4,8 @@ import yaml
 import unittest
 import responses
 
+from unittest.mock import Mock
+
 from tests.util import use_guru, get_calls
 
 import guru
@@ -118,3 +120,226 @@ class TestCore(unittest.TestCase):
       "method": "GET",
       "url": "https://api.getguru.com/api/v1/teams/abcd/analytics?token=1"
     }])
+
+  @use_guru()
+  @responses.activate
+  def test_calls_share_a_pooled_session(self, g):
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/collections", json=[])
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/cards/1111/extended", json={
+      "id": "1111"
+    })
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/cards/1111/pdf", body=b"%PDF")
+
+    g.get_collections()
+    g.download_card_as_pdf("1111", "/tmp/test_calls_share_a_pooled_session.pdf")
+
+    # every call, including the pdf download, goes through the session so
+    # they all have our auth and tracking headers.
+    for call in responses.calls:
+      self.assertTrue(call.request.headers["Authorization"].startswith("Basic "))
+      self.assertEqual(call.request.headers["X-Guru-Application"], "sdk")
+
+    self.assertEqual(len(responses.calls), 3)
+    self.assertEqual(g.session.get_adapter("https://api.getguru.com")._pool_maxsize, 10)
+
+  @use_guru()
+  @responses.activate
+  def test_429_responses_are_retried(self, g):
+    # the first call is rate limited and tells us to retry right away.
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/collections", status=429, headers={
+      "Retry-After": "0"
+    })
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/collections", json=[{
+      "id": "1234",
+      "name": "General"
+    }])
+
+    collections = g.get_collections()
+    self.assertEqual(len(collections), 1)
+    self.assertEqual(get_calls(), [{
+      "method": "GET",
+      "url": "https://api.getguru.com/api/v1/collections"
+    }, {
+      "method": "GET",
+      "url": "https://api.getguru.com/api/v1/collections"
+    }])
+
+  @responses.activate
+  def test_server_errors_are_only_retried_for_idempotent_calls(self):
+    g = guru.Guru("user@example.com", "abcd1234", silent=True, retry=guru.RetryPolicy(backoff=0))
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/groups", status=503)
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/groups", json=[])
+    responses.add(responses.POST, "https://api.getguru.com/api/v1/groups", status=503, json={})
+
+    # the get call is retried and succeeds, the post call isn't retried.
+    self.assertEqual(g.get_groups(), [])
+    g.make_group("Experts")
+
+    self.assertEqual([c["method"] for c in get_calls()], ["GET", "GET", "GET", "POST"])
+
+  @responses.activate
+  def test_pagination_errors_keep_loaded_pages(self):
+    g = guru.Guru("user@example.com", "abcd1234", silent=True, retry=False)
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/members?search=", json=[
+      {}, {}, {}
+    ], headers={
+      "Link": "< https://api.getguru.com/api/v1/members?token=1>"
+    })
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/members?token=1", status=500)
+
+    with self.assertRaises(guru.PaginationError) as context:
+      g.get_members()
+
+    self.assertEqual(len(context.exception.results), 3)
+    self.assertEqual(context.exception.url, "https://api.getguru.com/api/v1/members?token=1")
+
+  def test_rate_limiter(self):
+    limiter = guru.RateLimiter(100, burst=5)
+
+    # the first five calls use up the burst, the next five wait for tokens to refill.
+    waited = sum([limiter.acquire() for i in range(10)])
+    self.assertGreater(waited, 0.03)
+
+    # after a pause, no tokens are handed out until the pause is over.
+    limiter.pause(0.05)
+    self.assertGreaterEqual(limiter.acquire(), 0.04)
+
+  def test_retry_policy(self):
+    policy = guru.RetryPolicy(max_attempts=3, backoff=1, jitter=False)
+    self.assertTrue(policy.should_retry("GET", 1, 503))
+    self.assertTrue(policy.should_retry("GET", 1))
+    self.assertTrue(policy.should_retry("POST", 1, 429))
+    self.assertTrue(policy.should_retry("POST", 1, 503, idempotent=True))
+    self.assertFalse(policy.should_retry("POST", 1, 503))
+    self.assertFalse(policy.should_retry("GET", 1, 404))
+    self.assertFalse(policy.should_retry("GET", 3, 503))
+    self.assertEqual(policy.get_delay(1), 1)
+    self.assertEqual(policy.get_delay(3), 4)
+
+    # the Retry-After header is used but not past max_backoff.
+    policy = guru.RetryPolicy(max_backoff=30)
+    self.assertEqual(policy.get_delay(1, Mock(headers={"Retry-After": "5"})), 5)
+    self.assertEqual(policy.get_delay(1, Mock(headers={"Retry-After": "3600"})), 30)
+
+  @responses.activate
+  def test_pagination_with_prefetching(self):
+    g = guru.Guru("user@example.com", "abcd1234", silent=True, prefetch_pages=2)
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/members?search=", json=[
+      {}, {}, {}, {}, {}
+    ], headers={
+      "Link": "< https://api.getguru.com/api/v1/members?token=1>"
+    })
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/members?token=1", json=[
+      {}, {}, {}, {}
+    ], headers={
+      "Link": "< https://api.getguru.com/api/v1/members?token=2>"
+    })
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/members?token=2", json=[
+      {}, {}
+    ])
+    responses.add(responses.POST, "https://api.getguru.com/api/v1/search/cardmgr", match_querystring=True, json=[
+      {"id": "1111"}, {"id": "2222"}
+    ], headers={
+      "Link": "< https://api.getguru.com/api/v1/search/cardmgr?token=1>"
+    })
+    responses.add(responses.POST, "https://api.getguru.com/api/v1/search/cardmgr?token=1", json=[
+      {"id": "3333"}
+    ])
+
+    self.assertEqual(len(g.get_members()), 11)
+    self.assertEqual([c.id for c in g.find_cards()], ["1111", "2222", "3333"])
+    self.assertEqual([c["url"] for c in get_calls()], [
+      "https://api.getguru.com/api/v1/members?search=",
+      "https://api.getguru.com/api/v1/members?token=1",
+      "https://api.getguru.com/api/v1/members?token=2",
+      "https://api.getguru.com/api/v1/search/cardmgr",
+      "https://api.getguru.com/api/v1/search/cardmgr?token=1"
+    ])
+
+  @responses.activate
+  def test_pagination_errors_with_prefetching(self):
+    g = guru.Guru("user@example.com", "abcd1234", silent=True, retry=False, prefetch_pages=2)
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/members?search=", json=[
+      {}, {}, {}
+    ], headers={
+      "Link": "< https://api.getguru.com/api/v1/members?token=1>"
+    })
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/members?token=1", status=500)
+
+    with self.assertRaises(guru.PaginationError) as context:
+      g.get_members()
+
+    self.assertEqual(len(context.exception.results), 3)
+
+    # the iter_* methods already yielded the first page so they don't keep it.
+    members = []
+    with self.assertRaises(guru.PaginationError) as context:
+      for member in g.iter_members():
+        members.append(member)
+
+    self.assertEqual(len(members), 3)
+    self.assertEqual(context.exception.results, [])
+    self.assertEqual(context.exception.url, "https://api.getguru.com/api/v1/members?token=1")
+
+    # find_cards() returns a list so it keeps the cards it loaded.
+    responses.add(responses.POST, "https://api.getguru.com/api/v1/search/cardmgr", match_querystring=True, json=[
+      {"id": "1111"}, {"id": "2222"}
+    ], headers={
+      "Link": "< https://api.getguru.com/api/v1/search/cardmgr?token=1>"
+    })
+    responses.add(responses.POST, "https://api.getguru.com/api/v1/search/cardmgr?token=1", status=500)
+    with self.assertRaises(guru.PaginationError) as context:
+      g.find_cards()
+
+    self.assertEqual([c.id for c in context.exception.results], ["1111", "2222"])
+
+  @use_guru()
+  @responses.activate
+  def test_iterating_stops_early(self, g):
+    responses.add(responses.POST, "https://api.getguru.com/api/v1/search/cardmgr", match_querystring=True, json=[
+      {"id": "1111"}, {"id": "2222"}
+    ], headers={
+      "Link": "< https://api.getguru.com/api/v1/search/cardmgr?token=1>"
+    })
+    responses.add(responses.POST, "https://api.getguru.com/api/v1/search/cardmgr?token=1", json=[
+      {"id": "3333"}
+    ])
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/members?search=", json=[
+      {"user": {"email": "user1@example.com"}}
+    ], headers={
+      "Link": "< https://api.getguru.com/api/v1/members?token=1>"
+    })
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/members?token=1", json=[
+      {"user": {"email": "user2@example.com"}}
+    ])
+
+    # find_card only needs the first page.
+    self.assertEqual(g.find_card().id, "1111")
+    self.assertEqual([c.id for c in g.iter_cards()], ["1111", "2222", "3333"])
+    self.assertEqual([u.email for u in g.iter_members()], ["user1@example.com", "user2@example.com"])
+
+    self.assertEqual([c["url"] for c in get_calls()], [
+      "https://api.getguru.com/api/v1/search/cardmgr",
+      "https://api.getguru.com/api/v1/search/cardmgr",
+      "https://api.getguru.com/api/v1/search/cardmgr?token=1",
+      "https://api.getguru.com/api/v1/members?search=",
+      "https://api.getguru.com/api/v1/members?token=1"
+    ])
+
+  @use_guru()
+  @responses.activate
+  def test_iter_folders_and_items(self, g):
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/folders", match_querystring=True, json=[
+      {"id": "abcd", "title": "Folder 1"}
+    ], headers={
+      "Link": "< https://api.getguru.com/api/v1/folders?token=1>"
+    })
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/folders?token=1", json=[
+      {"id": "efgh", "title": "Folder 2"}
+    ])
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/folders/abcd/items?cardDetail=FULL", json=[
+      {"type": "card", "id": "1111"}, {"type": "folder", "id": "efgh"}
+    ])
+
+    self.assertEqual([f.title for f in g.iter_folders()], ["Folder 1", "Folder 2"])
+    self.assertEqual([i["id"] for i in g.iter_folder_items("abcd")], ["1111", "efgh"])
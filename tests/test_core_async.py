@@ -0,0 +1,136 @@
+import json
+import time
+import asyncio
+import threading
+import unittest
+import responses
+
+from unittest.mock import Mock
+
+from tests.util import get_calls
+
+import guru
+
+
+class TestCoreAsync(unittest.TestCase):
+  @responses.activate
+  def test_calls_run_concurrently(self):
+    # the callback keeps track of how many calls are in flight at once.
+    lock = threading.Lock()
+    in_flight = [0, 0]
+    def callback(request):
+      with lock:
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+      time.sleep(0.05)
+      with lock:
+        in_flight[0] -= 1
+      card_id = request.url.split("/")[-2]
+      return (200, {}, json.dumps({"id": card_id, "preferredPhrase": "card %s" % card_id}))
+
+    for i in range(8):
+      responses.add_callback(responses.GET, "https://api.getguru.com/api/v1/cards/%s/extended" % i, callback=callback)
+
+    async def main():
+      async with guru.AsyncGuru("user@example.com", "abcd1234", silent=True, concurrency=4) as g:
+        return await asyncio.gather(*[g.get_card(str(i)) for i in range(8)])
+
+    start = time.time()
+    cards = asyncio.run(main())
+
+    # results are in order, at most 4 calls were in flight, and they didn't run one at a time.
+    self.assertEqual([c.title for c in cards], ["card %s" % i for i in range(8)])
+    self.assertEqual(in_flight[1], 4)
+    self.assertLess(time.time() - start, 0.3)
+
+  @responses.activate
+  def test_async_iteration(self):
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/members?search=", match_querystring=True, json=[
+      {"user": {"email": "user1@example.com"}}
+    ], headers={
+      "Link": "< https://api.getguru.com/api/v1/members?token=1>"
+    })
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/members?token=1", json=[
+      {"user": {"email": "user2@example.com"}}
+    ])
+
+    async def main():
+      async with guru.AsyncGuru("user@example.com", "abcd1234", silent=True) as g:
+        return [u.email async for u in g.iter_members()]
+
+    self.assertEqual(asyncio.run(main()), ["user1@example.com", "user2@example.com"])
+
+  @responses.activate
+  def test_dry_run(self):
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/groups", json=[
+      {"id": "1234", "name": "Experts"}
+    ])
+
+    async def main():
+      async with guru.AsyncGuru("user@example.com", "abcd1234", silent=True, dry_run=True) as g:
+        self.assertTrue(g.dry_run)
+        return await g.delete_group("Experts")
+
+    self.assertTrue(asyncio.run(main()))
+    self.assertEqual(get_calls(), [{
+      "method": "GET",
+      "url": "https://api.getguru.com/api/v1/groups"
+    }])
+
+  def test_cancelling_async_iteration(self):
+    # the generator is closed once the thread getting its second item is done.
+    closed = threading.Event()
+    def slow_items():
+      try:
+        yield 1
+        time.sleep(0.2)
+        yield 2
+      finally:
+        closed.set()
+
+    async def main(g):
+      items = []
+      async def consume():
+        async for item in g.iterate(slow_items):
+          items.append(item)
+
+      task = asyncio.create_task(consume())
+      await asyncio.sleep(0.1)
+      task.cancel()
+      with self.assertRaises(asyncio.CancelledError):
+        await task
+      return items
+
+    g = guru.Guru("user@example.com", "abcd1234", silent=True)
+    async_guru = guru.AsyncGuru(guru=g)
+    self.assertEqual(asyncio.run(main(async_guru)), [1])
+    self.assertTrue(closed.wait(1))
+    async_guru.close()
+
+  def test_using_it_in_more_than_one_event_loop(self):
+    # it's made outside of any event loop and each asyncio.run() call makes a new one.
+    async_guru = guru.AsyncGuru(guru=guru.Guru("user@example.com", "abcd1234", silent=True), concurrency=1)
+
+    async def main():
+      return await asyncio.gather(*[async_guru.run(time.sleep, 0.01) for i in range(3)])
+
+    for run in range(2):
+      self.assertEqual(asyncio.run(main()), [None, None, None])
+    async_guru.close()
+
+  def test_closing_a_guru_object_we_were_given(self):
+    g = guru.Guru("user@example.com", "abcd1234", silent=True)
+    g.close = Mock()
+
+    async def main():
+      async with guru.AsyncGuru(guru=g):
+        pass
+
+    # the caller might still be using it so we don't close it.
+    asyncio.run(main())
+    g.close.assert_not_called()
+
+    async_guru = guru.AsyncGuru("user@example.com", "abcd1234", silent=True)
+    async_guru.guru.close = Mock()
+    async_guru.close()
+    async_guru.guru.close.assert_called_once_with()
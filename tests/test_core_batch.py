@@ -0,0 +1,85 @@
+import json
+import time
+import threading
+import unittest
+import responses
+
+from tests.util import use_guru, get_calls
+
+import guru
+
+
+class TestCoreBatch(unittest.TestCase):
+  @responses.activate
+  def test_map(self):
+    g = guru.Guru("user@example.com", "abcd1234", silent=True, retry=False)
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/cards/1111/extended", json={"id": "1111"})
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/cards/2222/extended", json={"id": "2222"})
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/cards/3333/extended", json={"id": "3333"})
+
+    # 4444 isn't mocked so it raises an exception but the other calls still go through.
+    cards = g.map(g.get_card, ["1111", "2222", "4444", "3333"], workers=3)
+
+    self.assertEqual([c.id if c else None for c in cards], ["1111", "2222", None, "3333"])
+    self.assertFalse(cards.ok)
+    self.assertEqual(list(cards.errors), [2])
+    self.assertEqual(cards.failed[0][0], "4444")
+    with self.assertRaises(BaseException):
+      cards.raise_errors()
+
+  @use_guru()
+  def test_batch(self, g):
+    # the calls take 0.1 seconds each so if they weren't running at once, this would take 0.5 seconds.
+    lock = threading.Lock()
+    calls = []
+    def slow_call(value, suffix=""):
+      time.sleep(0.1)
+      with lock:
+        calls.append(value)
+      if value == 3:
+        raise BaseException("failed")
+      return "%s%s" % (value, suffix)
+
+    start = time.time()
+    with g.batch(workers=5) as batch:
+      for i in range(5):
+        batch.add(slow_call, i, suffix="!")
+
+    self.assertLess(time.time() - start, 0.4)
+    self.assertEqual(sorted(calls), [0, 1, 2, 3, 4])
+    self.assertEqual(batch.results, ["0!", "1!", "2!", None, "4!"])
+    self.assertEqual(str(batch.results.errors[3]), "failed")
+    self.assertEqual(batch.results.failed[0][0], ((3,), {"suffix": "!"}))
+
+  def test_batch_only_collects_errors_from_the_sdk(self):
+    def fail(error):
+      raise error
+
+    # exceptions and the sdk's own errors go in the results.
+    batch = guru.Batch(workers=2)
+    batch.add(fail, ValueError("bad value"))
+    batch.add(fail, guru.PaginationError(None, [1, 2], "https://api.getguru.com/api/v1/cards"))
+    batch.add(fail, BaseException("failed"))
+    results = batch.wait()
+    self.assertIsInstance(results.errors[0], ValueError)
+    self.assertEqual(results.errors[1].results, [1, 2])
+    self.assertIsInstance(results.errors[1], guru.GuruError)
+    self.assertEqual(str(results.errors[2]), "failed")
+
+    # things like ctrl+c and sys.exit() are raised by wait().
+    for error in [KeyboardInterrupt(), SystemExit(1), GeneratorExit()]:
+      batch = guru.Batch(workers=2)
+      batch.add(fail, error)
+      with self.assertRaises(type(error)):
+        batch.wait()
+
+  @responses.activate
+  def test_map_uses_the_rate_limiter(self):
+    g = guru.Guru("user@example.com", "abcd1234", silent=True, rate_limit=guru.RateLimiter(20, burst=1))
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/groups", json=[])
+
+    # the first call goes right away and the other 4 wait 0.05 seconds each.
+    start = time.time()
+    results = g.map(lambda i: g.get_groups(), range(5), workers=5)
+    self.assertEqual(results, [[], [], [], [], []])
+    self.assertGreaterEqual(time.time() - start, 0.19)
@@ -130,8 +130,11 @@ class TestCore(unittest.TestCase):
     responses.add(responses.GET, "https://api.getguru.com/api/v1/boards/1234", json={
       "items": board_items
     })
-    responses.add(responses.POST, "https://api.getguru.com/api/v1/cards/bulk", json=first_batch)
-    responses.add(responses.POST, "https://api.getguru.com/api/v1/cards/bulk", json=second_batch)
+    # the two batches are loaded at the same time so we respond based on which IDs were requested.
+    def load_batch(request):
+      ids = json.loads(request.body)["ids"]
+      return (200, {}, json.dumps(first_batch if ids[0] == "50" else second_batch))
+    responses.add_callback(responses.POST, "https://api.getguru.com/api/v1/cards/bulk", callback=load_batch)
 
     board = g.get_board("test")
 
@@ -140,13 +143,17 @@ class TestCore(unittest.TestCase):
     self.assertEqual(board.cards[75].title, "card 75")
     self.assertEqual(board.cards[105].title, "card 105")
 
-    self.assertEqual(get_calls(), [{
+    self.assertEqual(board.cards[75].guru, g)
+
+    calls = get_calls()
+    self.assertEqual(calls[:2], [{
       "method": "GET",
       "url": "https://api.getguru.com/api/v1/boards"
     }, {
       "method": "GET",
       "url": "https://api.getguru.com/api/v1/boards/1234"
-    }, {
+    }])
+    self.assertEqual(sorted(calls[2:], key=lambda c: len(c["body"]["ids"]), reverse=True), [{
       "method": "POST",
       "url": "https://api.getguru.com/api/v1/cards/bulk",
       "body": {
@@ -160,6 +167,16 @@ class TestCore(unittest.TestCase):
       }
     }])
 
+    # loading the board again loads its cards again unless we say the cached ones are ok.
+    def count_bulk_calls():
+      return len([c for c in get_calls() if c["url"].endswith("/cards/bulk")])
+
+    g.get_board("test")
+    self.assertEqual(count_bulk_calls(), 4)
+    board = g.get_board("test", cache_cards=True)
+    self.assertEqual(count_bulk_calls(), 4)
+    self.assertEqual(board.cards[105].title, "card 105")
+
   @use_guru()
   @responses.activate
   def test_make_board(self, g):
@@ -1,6 +1,8 @@
 
+import os
 import json
 import yaml
+import tempfile
 import unittest
 import responses
 
@@ -103,3 +105,146 @@ class TestCoreCache(unittest.TestCase):
         "user@example.com"
       ]
     }])
+
+  @use_guru()
+  @responses.activate
+  def test_that_changes_clear_the_cache(self, g):
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/collections", json=[{
+      "id": "1234",
+      "name": "General"
+    }])
+    responses.add(responses.DELETE, "https://api.getguru.com/api/v1/collections/1234", status=204)
+
+    g.get_collections()
+    g.get_collection("General", cache=True)
+
+    # deleting the collection clears the cached list of collections so this makes another call.
+    g.delete_collection("General")
+    g.get_collections(cache=True)
+
+    self.assertEqual([c["method"] for c in get_calls()], ["GET", "DELETE", "GET"])
+    self.assertEqual(g.response_cache.stats()["hits"], 2)
+
+  def test_response_cache_expiration(self):
+    cache = guru.ResponseCache(ttl=60, ttls={r"/whoami$": 0, r"/collections$": None})
+    cache.set("user /folders", guru.CachedResponse(200, {}, b"[]", "/folders"))
+    cache.set("user /whoami", guru.CachedResponse(200, {}, b"{}", "/whoami"))
+    cache.set("user /collections", guru.CachedResponse(200, {}, b"[]", "/collections"))
+
+    self.assertEqual(cache.get("user /folders").json(), [])
+    self.assertIsNone(cache.get("user /whoami"))
+    self.assertEqual(cache.get("user /collections").json(), [])
+    self.assertEqual(cache.stats()["hits"], 2)
+    self.assertEqual(cache.stats()["misses"], 1)
+    self.assertEqual(cache.stats()["entries"], 2)
+
+  def test_response_cache_size_limit(self):
+    cache = guru.ResponseCache(max_bytes=250)
+    for key in ["a", "b", "c"]:
+      cache.set(key, guru.CachedResponse(200, {}, b"x" * 100, ""))
+      # using "a" makes it the most recently used so "b" is the one that gets dropped.
+      cache.get("a")
+
+    self.assertIn("a", cache)
+    self.assertNotIn("b", cache)
+    self.assertIn("c", cache)
+    self.assertEqual(cache.stats()["evictions"], 1)
+    self.assertEqual(cache.stats()["bytes"], 200)
+
+    # a response bigger than the whole cache isn't stored.
+    cache.set("d", guru.CachedResponse(200, {}, b"x" * 300, ""))
+    self.assertNotIn("d", cache)
+
+  @responses.activate
+  def test_sqlite_response_cache(self):
+    with tempfile.TemporaryDirectory() as directory:
+      filename = os.path.join(directory, "cache.db")
+      responses.add(responses.GET, "https://api.getguru.com/api/v1/whoami", json={
+        "team": {"id": "abcd"}
+      })
+      responses.add(responses.GET, "https://api.getguru.com/api/v1/collections", json=[{
+        "id": "1234",
+        "name": "General"
+      }])
+
+      # the second Guru object is like a second script using the same file.
+      g1 = guru.Guru("user@example.com", "abcd1234", silent=True, response_cache=guru.SqliteResponseCache(filename))
+      g2 = guru.Guru("user@example.com", "abcd1234", silent=True, response_cache=guru.SqliteResponseCache(filename))
+      g3 = guru.Guru("other@example.com", "abcd1234", silent=True, response_cache=guru.SqliteResponseCache(filename))
+
+      self.assertEqual(g1.get_team_id(), "abcd")
+      self.assertEqual(g1.get_collections(cache=True)[0].name, "General")
+      self.assertEqual(g2.get_team_id(), "abcd")
+      self.assertEqual(g2.get_collections(cache=True)[0].name, "General")
+      self.assertEqual(g2.response_cache.stats()["hits"], 2)
+
+      # responses aren't shared between users.
+      g3.get_team_id()
+
+      self.assertEqual([c["url"] for c in get_calls()], [
+        "https://api.getguru.com/api/v1/whoami",
+        "https://api.getguru.com/api/v1/collections",
+        "https://api.getguru.com/api/v1/whoami"
+      ])
+
+      g1.response_cache.invalidate("user@example.com https://api.getguru.com/api/v1/collections")
+      self.assertNotIn("user@example.com https://api.getguru.com/api/v1/collections", g2.response_cache)
+      self.assertEqual(g2.response_cache.stats()["entries"], 2)
+
+      for g in [g1, g2, g3]:
+        g.response_cache.close()
+
+  def test_sqlite_response_cache_limits(self):
+    with tempfile.TemporaryDirectory() as directory:
+      cache = guru.SqliteResponseCache(os.path.join(directory, "cache.db"), max_bytes=100, ttls={r"/whoami$": 0})
+      cache.set("a", guru.CachedResponse(200, {}, os.urandom(60), ""))
+      cache.set("b", guru.CachedResponse(200, {}, os.urandom(60), ""))
+      cache.set("/whoami", guru.CachedResponse(200, {}, b"{}", ""))
+
+      # "a" was stored first so it's dropped to make room for "b", and /whoami expired right away.
+      self.assertIsNone(cache.get("a"))
+      self.assertEqual(len(cache.get("b").content), 60)
+      self.assertIsNone(cache.get("/whoami"))
+      self.assertEqual(cache.stats()["evictions"], 1)
+      cache.close()
+
+  @responses.activate
+  def test_conditional_requests(self):
+    # with a ttl of 0 every response is expired right away so we always revalidate.
+    g = guru.Guru("user@example.com", "abcd1234", silent=True, response_cache=guru.ResponseCache(ttl=0, ttls={}))
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/groups", json=[{
+      "id": "1234",
+      "name": "Experts"
+    }], headers={"ETag": "\"v1\""})
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/groups", status=304)
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/groups", status=304)
+    responses.add(responses.GET, "https://api.getguru.com/api/v1/groups", json=[], headers={"ETag": "\"v2\""})
+
+    self.assertEqual(g.get_group("Experts").id, "1234")
+    self.assertEqual(g.get_group("Experts", cache=True).id, "1234")
+    self.assertEqual(g.get_group("Experts").id, "1234")
+
+    # the response changed so we get the new one.
+    self.assertIsNone(g.get_group("Experts", cache=True))
+
+    self.assertEqual([c.request.headers.get("If-None-Match") for c in responses.calls], [
+      None, "\"v1\"", "\"v1\"", "\"v1\""
+    ])
+    stats = g.response_cache.stats()
+    self.assertEqual((stats["hits"], stats["misses"], stats["revalidations"]), (2, 1, 2))
+
+  @responses.activate
+  def test_conditional_requests_with_sqlite(self):
+    with tempfile.TemporaryDirectory() as directory:
+      cache = guru.SqliteResponseCache(os.path.join(directory, "cache.db"), ttl=0, ttls={})
+      g = guru.Guru("user@example.com", "abcd1234", silent=True, response_cache=cache)
+      responses.add(responses.GET, "https://api.getguru.com/api/v1/folders/abcd/items?cardDetail=FULL", json=[
+        {"type": "card", "id": "1111"}
+      ], headers={"Last-Modified": "Wed, 21 Oct 2026 07:28:00 GMT"})
+      responses.add(responses.GET, "https://api.getguru.com/api/v1/folders/abcd/items?cardDetail=FULL", status=304)
+
+      self.assertEqual(len(g.get_folder_items("abcd", cache=True)), 1)
+      self.assertEqual(len(g.get_folder_items("abcd", cache=True)), 1)
+      self.assertEqual(responses.calls[1].request.headers.get("If-Modified-Since"), "Wed, 21 Oct 2026 07:28:00 GMT")
+      self.assertEqual(cache.stats()["revalidations"], 1)
+      cache.close()
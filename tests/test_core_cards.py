@@ -1503,3 +1503,28 @@ this card has a <a href="https://www.example.com">guru markdown block</a>.
       "method": "GET",
       "url": "https://api.getguru.com/api/v1/cards/bulkop/2222"
     }])
+
+  @use_guru()
+  @responses.activate
+  def test_get_cards(self, g):
+    def load_batch(request):
+      ids = json.loads(request.body)["ids"]
+      return (200, {}, json.dumps({id: {"id": id, "preferredPhrase": "card %s" % id} for id in ids}))
+    responses.add_callback(responses.POST, "https://api.getguru.com/api/v1/cards/bulk", callback=load_batch)
+    responses.add(responses.PUT, "https://api.getguru.com/api/v1/cards/7", json={"id": "7"})
+
+    # duplicate IDs are only loaded once, so this is 2 batches (50 + 10).
+    ids = [str(i) for i in range(60)]
+    cards = g.get_cards(ids + ids[:5])
+    self.assertEqual(len(cards), 60)
+    self.assertEqual(cards["42"].title, "card 42")
+    self.assertEqual(cards["42"].guru, g)
+
+    # with cache=True we reuse the cards we just loaded, except the one we saved.
+    g.save_card(cards["7"])
+    cards = g.get_cards(["3", "7", "12"], cache=True)
+    self.assertEqual(sorted(cards), ["12", "3", "7"])
+
+    bulk_calls = [c for c in get_calls() if c["url"].endswith("/bulk")]
+    self.assertEqual(sorted(len(c["body"]["ids"]) for c in bulk_calls), [1, 10, 50])
+    self.assertEqual(bulk_calls[-1]["body"], {"ids": ["7"]})
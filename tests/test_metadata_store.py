@@ -0,0 +1,109 @@
+import os
+import json
+import shutil
+import tempfile
+import threading
+import unittest
+
+import guru
+
+
+class TestMetadataStore(unittest.TestCase):
+  def setUp(self):
+    self.folder = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.folder)
+
+  def test_json_store(self):
+    filename = os.path.join(self.folder, "publisher.json")
+    store = guru.JsonMetadataStore(filename)
+    store.set("1", {"type": "card", "external_id": "a"})
+    store.set("2", {"type": "board", "external_id": "b"})
+    store.set("1", {"type": "card", "external_id": "c"})
+    store.delete("2")
+    store.commit()
+
+    # changes go in the journal, one line each, and the .json file isn't written yet.
+    self.assertFalse(os.path.exists(filename))
+    with open(store.JOURNAL_PATH) as file_in:
+      self.assertEqual(len(file_in.readlines()), 4)
+
+    # if the process dies partway through writing a line, that line is ignored.
+    with open(store.JOURNAL_PATH, "a") as file_out:
+      file_out.write('{"id": "3", "val')
+
+    # loading it again replays the journal and merges it into the .json file.
+    store = guru.JsonMetadataStore(filename)
+    self.assertEqual(store.get("1"), {"type": "card", "external_id": "c"})
+    self.assertEqual(store.keys(), ["1"])
+    self.assertFalse(os.path.exists(store.JOURNAL_PATH))
+    with open(filename) as file_in:
+      self.assertEqual(json.load(file_in), {"1": {"type": "card", "external_id": "c"}})
+
+    store.set("4", {"type": "card"})
+    store.close()
+    self.assertFalse(os.path.exists(store.JOURNAL_PATH))
+    with open(filename) as file_in:
+      self.assertEqual(sorted(json.load(file_in)), ["1", "4"])
+
+  def test_json_store_with_data(self):
+    filename = os.path.join(self.folder, "publisher.json")
+    with open(filename, "w") as file_out:
+      json.dump({"old": {"type": "card"}}, file_out)
+
+    # data you pass in replaces the file's contents when the first change is saved.
+    data = {"1": {"type": "card"}}
+    store = guru.JsonMetadataStore(filename, data=data)
+    self.assertEqual(store.keys(), ["1"])
+    store.set("2", {"type": "board"})
+    self.assertEqual(data, {"1": {"type": "card"}, "2": {"type": "board"}})
+    with open(filename) as file_in:
+      self.assertEqual(json.load(file_in), data)
+
+  def test_json_store_with_threads(self):
+    filename = os.path.join(self.folder, "publisher.json")
+    store = guru.JsonMetadataStore(filename)
+
+    # threads save changes while another one compacts the store.
+    def save(thread):
+      for i in range(200):
+        store.set("%s-%s" % (thread, i), {"type": "card"})
+
+    threads = [threading.Thread(target=save, args=(t,)) for t in range(4)]
+    for thread in threads:
+      thread.start()
+    for i in range(5):
+      store.compact()
+    for thread in threads:
+      thread.join()
+    store.close()
+
+    self.assertEqual(len(guru.JsonMetadataStore(filename)), 800)
+
+  def test_sqlite_store(self):
+    filename = os.path.join(self.folder, "publisher.db")
+    store = guru.SqliteMetadataStore(filename, batch_size=2)
+    store.set("1", {"type": "card", "external_id": "a"})
+    store.set("2", {"type": "board", "external_id": "b"})
+    store.delete("1")
+
+    # the first two changes were committed as a batch, the delete isn't committed yet.
+    other = guru.SqliteMetadataStore(filename)
+    self.assertEqual(sorted(other.keys()), ["1", "2"])
+    other.close()
+
+    store.commit()
+    other = guru.SqliteMetadataStore(filename)
+    self.assertEqual(other.keys(), ["2"])
+    self.assertEqual(other.get("2"), {"type": "board", "external_id": "b"})
+    self.assertEqual(other.get("1", {}), {})
+    other.close()
+    store.close()
+
+    # an empty database can start with the data from a .json file.
+    store = guru.SqliteMetadataStore(os.path.join(self.folder, "other.db"), data={"1": {"type": "card"}})
+    store.close()
+    store = guru.SqliteMetadataStore(os.path.join(self.folder, "other.db"), data={"ignored": {}})
+    self.assertEqual(store.keys(), ["1"])
+    store.close()
@@ -1,6 +1,13 @@
 
+import json
+import time
+import shutil
+import tempfile
+import threading
 import unittest
 
+from unittest.mock import Mock
+
 from tests.util import use_guru
 
 import os
@@ -429,3 +436,554 @@ class TestPublish(unittest.TestCase):
       "find card Getting Started with the SDK",
       "update card Getting Started with the SDK",
     ])
+
+
+class ConcurrentPublisherTest(guru.Publisher):
+  """this publisher is slow to publish cards so we can check that they're published at the same time."""
+
+  def __init__(self, g, workers, metadata=None):
+    self.calls = []
+    self.active = 0
+    self.max_active = 0
+    self.lock = threading.Lock()
+    self.fail_updates = False
+    self.store = metadata if isinstance(metadata, guru.MetadataStore) else guru.MetadataStore(metadata)
+    super().__init__(g, metadata=self.store, silent=True, workers=workers)
+
+  def create_external_board(self, board, board_group, collection):
+    self.calls.append("create board %s" % board.title)
+    return "board-%s" % board.id
+
+  def create_external_card(self, card, changes, section, board, board_group, collection):
+    with self.lock:
+      self.active += 1
+      self.max_active = max(self.max_active, self.active)
+    time.sleep(0.05)
+    with self.lock:
+      self.active -= 1
+      self.calls.append("create card %s in %s" % (card.title, board.title))
+
+    if card.title == "Broken":
+      raise ValueError("couldn't create card")
+    return "card-%s" % card.id
+
+  def update_external_card(self, external_id, card, changes, section, board, board_group, collection):
+    self.calls.append("update card %s" % card.title)
+    return not self.fail_updates
+
+  def delete_external_card(self, external_id):
+    self.calls.append("delete card %s" % external_id)
+
+  def delete_external_board(self, external_id):
+    self.calls.append("delete board %s" % external_id)
+
+  def delete_external_section(self, external_id):
+    self.calls.append("delete section %s" % external_id)
+
+  def get_external_url(self, external_id, card):
+    self.calls.append("get external url %s" % card.title)
+    return "https://www.example.com/%s" % external_id
+
+
+class ConcurrentPublisherFoldersTest(guru.PublisherFolders):
+  """the same as ConcurrentPublisherTest but for publishing folders."""
+
+  def __init__(self, g, workers, metadata=None):
+    self.calls = []
+    self.active = 0
+    self.max_active = 0
+    self.lock = threading.Lock()
+    self.fail_updates = False
+    self.store = metadata if isinstance(metadata, guru.MetadataStore) else guru.MetadataStore(metadata)
+    super().__init__(g, metadata=self.store, silent=True, workers=workers)
+
+  def create_external_folder(self, folder, collection):
+    self.calls.append("create folder %s" % folder.title)
+    return "folder-%s" % folder.id
+
+  def create_external_card(self, card, changes, folder, collection):
+    with self.lock:
+      self.active += 1
+      self.max_active = max(self.max_active, self.active)
+    time.sleep(0.05)
+    with self.lock:
+      self.active -= 1
+      self.calls.append("create card %s in %s" % (card.title, folder.title))
+
+    if card.title == "Broken":
+      raise ValueError("couldn't create card")
+    return "card-%s" % card.id
+
+  def update_external_card(self, external_id, card, changes, folder, collection):
+    self.calls.append("update card %s in %s" % (card.title, folder.title))
+    return not self.fail_updates
+
+  def delete_external_card(self, external_id):
+    self.calls.append("delete card %s" % external_id)
+
+  def delete_external_folder(self, external_id):
+    self.calls.append("delete folder %s" % external_id)
+
+  def get_external_url(self, external_id, card):
+    self.calls.append("get external url %s" % card.title)
+    return "https://www.example.com/%s" % external_id
+
+
+def make_home_board(*items):
+  return Mock(items=list(items), boards=[item for item in items if item.type == "board"])
+
+
+def make_card(id, title, links=None, last_modified_date="2021-01-01", folders=None):
+  content = "<p>%s</p>" % title
+  for link in links or []:
+    content += '<p><a data-ghq-guru-card-id="%s">link</a></p>' % link
+
+  # a card's folders are loaded from the api when they're used.
+  g = None
+  if folders is not None:
+    g = Mock(html_parser="auto")
+    g.get_folders_for_card.return_value = folders
+
+  card = guru.Card({
+    "id": id,
+    "preferredPhrase": title,
+    "slug": id,
+    "content": content,
+    "verificationState": "TRUSTED",
+    "lastModified": last_modified_date
+  }, guru=g)
+  card.boards = []
+  return card
+
+
+class TestConcurrentPublish(unittest.TestCase):
+  def test_publishing_cards_concurrently(self):
+    boards = {
+      "b1": Mock(id="b1", title="First", type="board", items=[make_card("c%s" % i, "Card %s" % i) for i in range(4)]),
+      "b2": Mock(id="b2", title="Second", type="board", items=[make_card("c4", "Broken"), make_card("c5", "Card 5")])
+    }
+    g = Mock()
+    g.get_collection.return_value = Mock(id="coll", title="Engineering")
+    g.get_home_board.return_value = make_home_board(Mock(id="b1", type="board"), Mock(id="b2", type="board"))
+    g.get_board.side_effect = lambda board, collection=None: boards[board if isinstance(board, str) else board.id]
+
+    publisher = ConcurrentPublisherTest(g, workers=4)
+    publisher.publish_collection("Engineering")
+
+    # cards were published at the same time but boards are still done before their cards.
+    self.assertGreater(publisher.max_active, 1)
+    self.assertEqual(publisher.calls[0:2], ["create board First", "create board Second"])
+    self.assertEqual(len(publisher.calls), 8)
+
+    # the broken card's exception is kept and the other cards are still published.
+    self.assertEqual(list(publisher.errors), ["c4"])
+    self.assertIsInstance(publisher.errors["c4"], ValueError)
+    self.assertEqual(publisher.get_external_id("c5"), "card-c5")
+    self.assertEqual(publisher.get_external_id("c4"), None)
+
+    # boards are saved as they're published, then cards are saved in the order we found them.
+    self.assertEqual(publisher.store.keys(), ["b1", "b2", "c0", "c1", "c2", "c3", "c5"])
+
+  def test_publishing_a_card_on_two_boards_concurrently(self):
+    def make_shared_card():
+      card = make_card("c1", "Shared")
+      card.boards = [Mock(title="First"), Mock(title="Second")]
+      return card
+
+    boards = {
+      "b1": Mock(id="b1", title="First", type="board", items=[make_shared_card(), make_card("c2", "Card 2")]),
+      "b2": Mock(id="b2", title="Second", type="board", items=[make_shared_card(), make_card("c3", "Card 3")])
+    }
+    g = Mock()
+    g.get_collection.return_value = Mock(id="coll", title="Engineering")
+    g.get_home_board.return_value = make_home_board(Mock(id="b1", type="board"), Mock(id="b2", type="board"))
+    g.get_board.side_effect = lambda board, collection=None: boards[board if isinstance(board, str) else board.id]
+
+    # the card is only created once, its second place sees the metadata from the first.
+    publisher = ConcurrentPublisherTest(g, workers=4)
+    publisher.publish_collection("Engineering")
+    self.assertEqual(sorted(publisher.calls[2:]), [
+      "create card Card 2 in First",
+      "create card Card 3 in Second",
+      "create card Shared in First"
+    ])
+    self.assertEqual(publisher.get_external_id("c1"), "card-c1")
+
+  def test_json_file_is_up_to_date_after_publishing(self):
+    board = Mock(id="b1", title="First", type="board", items=[make_card("c%s" % i, "Card %s" % i) for i in range(3)])
+    g = Mock()
+    g.get_board.return_value = board
+
+    folder = tempfile.mkdtemp()
+    try:
+      store = guru.JsonMetadataStore(os.path.join(folder, "publisher.json"))
+      publisher = ConcurrentPublisherTest(g, workers=4, metadata=store)
+      publisher.publish_board(board)
+
+      # the journal was merged when the publish finished, without calling close().
+      self.assertFalse(os.path.exists(store.JOURNAL_PATH))
+      with open(store.filename) as file_in:
+        self.assertEqual(sorted(json.load(file_in)), ["b1", "c0", "c1", "c2"])
+    finally:
+      shutil.rmtree(folder)
+
+  def test_loading_linked_cards_in_bulk(self):
+    board = Mock(id="b1", title="First", type="board", items=[
+      make_card("c1", "Card 1", links=["c2", "other1", "published"]),
+      Mock(type="section", id="s1", title="Section", items=[
+        make_card("c2", "Card 2", links=["c1", "other1", "other2", "missing"])
+      ])
+    ])
+    g = Mock()
+    g.get_board.return_value = board
+    g.get_cards.return_value = {"other1": make_card("other1", "Other 1"), "other2": make_card("other2", "Other 2")}
+
+    # we published this card before so we can make its link without loading it.
+    publisher = ConcurrentPublisherTest(g, workers=1, metadata={
+      "published": {"type": "card", "external_id": "p1", "title": "Published", "slug": "Tbbqo5pc"}
+    })
+    publisher.publish_board(board)
+
+    # the cards on the board didn't need to be loaded and the others were loaded in one call.
+    g.get_cards.assert_called_once_with(["other1", "other2", "missing"])
+    g.get_card.assert_not_called()
+    self.assertEqual(publisher.calls, [
+      "create board First",
+      "get external url Card 2",
+      "get external url Other 1",
+      "get external url Published",
+      "create card Card 1 in First",
+      "get external url Card 1",
+      "get external url Other 1",
+      "get external url Other 2",
+      "create card Card 2 in First",
+    ])
+    self.assertEqual(publisher.store.get("c1")["title"], "Card 1")
+
+    # a card that's published on its own doesn't have a run, so links are loaded one at a time.
+    g.get_card.return_value = make_card("other3", "Other 3")
+    publisher.publish_card(make_card("c3", "Card 3", links=["other3", "c1"]), board=board)
+    g.get_card.assert_called_once_with("other3")
+    self.assertEqual(publisher.calls[-3:], ["get external url Other 3", "get external url Card 1", "create card Card 3 in First"])
+
+  def test_skipping_cards_that_look_the_same(self):
+    def make_board(last_modified_date):
+      return Mock(id="b1", title="First", type="board", items=[
+        make_card("c1", "Card 1", links=["other"], last_modified_date=last_modified_date),
+        make_card("c2", "Card 2", last_modified_date=last_modified_date)
+      ])
+
+    g = Mock()
+    g.get_board.side_effect = lambda board, collection=None: board
+    g.get_cards.return_value = {"other": make_card("other", "Other")}
+    publisher = ConcurrentPublisherTest(g, workers=1)
+    publisher.publish_board(make_board("2021-01-01"))
+    self.assertEqual(publisher.calls[-2:], ["create card Card 1 in First", "create card Card 2 in First"])
+
+    # both cards were verified, which changes their last modified date but not what we'd publish.
+    publisher.calls = []
+    publisher.publish_board(make_board("2021-02-01"))
+    self.assertEqual(publisher.calls, ["get external url Other"])
+    self.assertEqual(publisher.avoided_writes, 2)
+    self.assertEqual(publisher.get_last_updated("c1"), "2021-02-01")
+
+    # nothing changed so the card without links is skipped without checking it. the other
+    # one's links are checked but we wouldn't have written it, so it isn't an avoided write.
+    publisher.calls = []
+    publisher.publish_board(make_board("2021-02-01"))
+    self.assertEqual(publisher.calls, ["get external url Other"])
+    self.assertEqual(publisher.avoided_writes, 0)
+
+    # the card it links to was published so the link changes, even though the card didn't.
+    publisher.store.set("other", {"type": "card", "external_id": "o1", "title": "Other"})
+    publisher.calls = []
+    publisher.publish_board(make_board("2021-02-01"))
+    self.assertEqual(publisher.calls, ["get external url Other", "update card Card 1"])
+    self.assertEqual(publisher.avoided_writes, 0)
+
+  def test_skipping_a_linked_card_on_two_boards(self):
+    def make_shared_card(last_modified_date):
+      card = make_card("c1", "Shared", links=["other"], last_modified_date=last_modified_date)
+      card.boards = [Mock(title="First"), Mock(title="Second")]
+      return card
+
+    def make_boards(last_modified_date):
+      return {
+        "b1": Mock(id="b1", title="First", type="board", items=[make_shared_card(last_modified_date)]),
+        "b2": Mock(id="b2", title="Second", type="board", items=[make_shared_card(last_modified_date)])
+      }
+
+    g = Mock()
+    g.get_collection.return_value = Mock(id="coll", title="Engineering")
+    g.get_home_board.return_value = make_home_board(Mock(id="b1", type="board"), Mock(id="b2", type="board"))
+    g.get_cards.return_value = {"other": make_card("other", "Other")}
+    boards = make_boards("2021-01-01")
+    g.get_board.side_effect = lambda board, collection=None: boards[board if isinstance(board, str) else board.id]
+
+    # the card's fingerprint is the same for both boards so neither one rewrites it.
+    publisher = ConcurrentPublisherTest(g, workers=1)
+    publisher.publish_collection("Engineering")
+    self.assertEqual([c for c in publisher.calls if "card Shared" in c], ["create card Shared in First"])
+
+    boards = make_boards("2021-02-01")
+    publisher.calls = []
+    publisher.publish_collection("Engineering")
+    self.assertEqual([c for c in publisher.calls if "card Shared" in c], [])
+
+  def test_publishing_changes_incrementally(self):
+    def make_board(last_modified_date):
+      card1 = make_card("c1", "Card 1")
+      card2 = make_card("c2", "Card 2", last_modified_date=last_modified_date)
+      card1.boards = card2.boards = [Mock(id="b1", title="First")]
+      section = Mock(id="s1", title="Section", type="section", items=[card2])
+      return Mock(id="b1", title="First", type="board", items=[card1, section])
+
+    g = Mock()
+    g.get_collection.return_value = Mock(id="coll", title="Engineering")
+    g.get_home_board.return_value = make_home_board(Mock(id="b1", type="board"))
+    g.get_board.return_value = make_board("2021-01-01")
+
+    # we haven't published this collection before so we publish all of it.
+    publisher = ConcurrentPublisherTest(g, workers=1)
+    publisher.publish_collection("Engineering", incremental=True)
+    self.assertEqual(publisher.calls, ["create board First", "create card Card 1 in First", "create card Card 2 in First"])
+    last_published = publisher.get_last_published("coll")
+    self.assertTrue(last_published)
+    g.find_cards.assert_not_called()
+
+    # the next time it runs, we only load the changed card and the board it's on.
+    board = make_board("2021-02-01")
+    board.items[1].items[0].content = "<p>New content</p>"
+    g.get_board.reset_mock()
+    g.get_board.return_value = board
+    g.find_cards.return_value = [board.items[1].items[0]]
+    publisher = ConcurrentPublisherTest(g, workers=1, metadata=publisher.store.data)
+    publisher.store.set("b2", {"type": "board", "external_id": "board-b2"})
+    publisher.store.set("s2", {"type": "section", "external_id": "section-s2"})
+    publisher.publish_collection("Engineering", incremental=True)
+    g.find_cards.assert_called_once_with(collection="coll", last_modified_after=last_published)
+    g.get_board.assert_called_once_with("b1", g.get_collection.return_value)
+    self.assertEqual(publisher.calls, ["update card Card 2"])
+
+    # card 1 was deleted, we find that by listing the collection's cards. board 2 isn't on
+    # the home board anymore so it's deleted too. we can't tell if sections were deleted.
+    g.iter_cards.return_value = [make_card("c2", "Card 2")]
+    publisher.calls = []
+    publisher.process_deletions()
+    g.iter_cards.assert_called_once_with(collection="coll")
+    self.assertEqual(sorted(publisher.calls), ["delete board board-b2", "delete card card-c1"])
+    self.assertEqual(sorted(publisher.store.keys()), ["b1", "c2", "coll", "s2"])
+
+  def test_incremental_publishing_after_a_dry_run_or_failure(self):
+    board = Mock(id="b1", title="First", type="board", items=[make_card("c1", "Card 1")])
+    board.items[0].boards = [Mock(id="b1", title="First")]
+    g = Mock()
+    g.get_collection.return_value = Mock(id="coll", title="Engineering")
+    g.get_home_board.return_value = make_home_board(Mock(id="b1", type="board"))
+    g.get_board.return_value = board
+
+    # a dry run doesn't count as publishing the collection.
+    publisher = ConcurrentPublisherTest(g, workers=1)
+    publisher.dry_run = True
+    publisher.publish_collection("Engineering", incremental=True)
+    self.assertEqual(publisher.get_last_published("coll"), None)
+
+    publisher = ConcurrentPublisherTest(g, workers=1, metadata=publisher.store.data)
+    publisher.publish_collection("Engineering", incremental=True)
+    last_published = publisher.get_last_published("coll")
+    self.assertTrue(last_published)
+
+    # if a card's update isn't successful we look for changes from the same time next time.
+    for workers in [1, 4]:
+      changed_card = make_card("c1", "Card 1", last_modified_date="2021-02-01")
+      changed_card.boards = [Mock(id="b1", title="First")]
+      changed_card.content = "<p>New content</p>"
+      g.find_cards.return_value = [changed_card]
+      publisher = ConcurrentPublisherTest(g, workers=workers, metadata=publisher.store.data)
+      publisher.store.set("coll", {"last_published": "2021-01-15"})
+      publisher.fail_updates = True
+      publisher.publish_collection("Engineering", incremental=True)
+      self.assertEqual(publisher.calls, ["update card Card 1"])
+      self.assertEqual(publisher.get_last_published("coll"), "2021-01-15")
+
+
+class TestConcurrentPublishFolders(unittest.TestCase):
+  def test_publishing_cards_concurrently(self):
+    folders = {
+      "f1": Mock(id="f1", title="First", type="folder", items=[make_card("c%s" % i, "Card %s" % i, folders=[]) for i in range(4)]),
+      "f2": Mock(id="f2", title="Second", type="folder", items=[make_card("c4", "Broken", folders=[]), make_card("c5", "Card 5", folders=[])])
+    }
+    g = Mock()
+    g.get_collection.return_value = Mock(id="coll", title="Engineering")
+    g.get_home_folder.return_value = Mock(id="home", title="Home", items=[
+      Mock(id="f1", type="folder"),
+      Mock(id="f2", type="folder"),
+      make_card("c6", "Card 6", folders=[])
+    ])
+    g.get_folder.side_effect = lambda folder, collection=None: folders[folder if isinstance(folder, str) else folder.id]
+
+    publisher = ConcurrentPublisherFoldersTest(g, workers=4)
+    publisher.publish_collection("Engineering")
+
+    # cards were published at the same time but folders are still done before their cards.
+    self.assertGreater(publisher.max_active, 1)
+    self.assertEqual(publisher.calls[0:2], ["create folder First", "create folder Second"])
+    self.assertIn("create card Card 6 in Home", publisher.calls)
+    self.assertEqual(len(publisher.calls), 9)
+
+    # the broken card's exception is kept and the other cards are still published.
+    self.assertEqual(list(publisher.errors), ["c4"])
+    self.assertIsInstance(publisher.errors["c4"], ValueError)
+    self.assertEqual(publisher.store.keys(), ["f1", "f2", "c0", "c1", "c2", "c3", "c5", "c6"])
+
+  def test_publishing_a_card_in_two_folders(self):
+    def make_folders(last_modified_date):
+      def make_shared_card():
+        return make_card("c1", "Shared", links=["other"], last_modified_date=last_modified_date,
+          folders=[Mock(id="f1", title="First"), Mock(id="f2", title="Second")])
+
+      return {
+        "f1": Mock(id="f1", title="First", type="folder", items=[make_shared_card(), make_card("c2", "Card 2", folders=[])]),
+        "f2": Mock(id="f2", title="Second", type="folder", items=[make_shared_card()])
+      }
+
+    g = Mock()
+    g.get_collection.return_value = Mock(id="coll", title="Engineering")
+    g.get_home_folder.return_value = Mock(id="home", title="Home", items=[Mock(id="f1", type="folder"), Mock(id="f2", type="folder")])
+    g.get_cards.return_value = {"other": make_card("other", "Other")}
+    folders = make_folders("2021-01-01")
+    g.get_folder.side_effect = lambda folder, collection=None: folders[folder if isinstance(folder, str) else folder.id]
+
+    # with workers the card is only created once, its second place sees the metadata from the first.
+    for workers in [1, 4]:
+      publisher = ConcurrentPublisherFoldersTest(g, workers=workers)
+      publisher.publish_collection("Engineering")
+      self.assertEqual([c for c in publisher.calls if "card Shared" in c], ["create card Shared in First"])
+      self.assertEqual(publisher.get_external_id("c1"), "card-c1")
+
+    # its fingerprint is the same for both folders so being verified doesn't rewrite it.
+    folders = make_folders("2021-02-01")
+    publisher.calls = []
+    publisher.publish_collection("Engineering")
+    self.assertEqual([c for c in publisher.calls if "card Shared" in c], [])
+    # by the time it's published for its second folder, its saved date is up to date.
+    self.assertEqual(publisher.avoided_writes, 1)
+    self.assertEqual(publisher.get_last_updated("c1"), "2021-02-01")
+
+  def test_loading_linked_cards_in_bulk(self):
+    folder = Mock(id="f1", title="First", type="folder", items=[
+      make_card("c1", "Card 1", links=["c2", "other1", "published"], folders=[]),
+      make_card("c2", "Card 2", links=["c1", "other1", "other2", "missing"], folders=[])
+    ])
+    g = Mock()
+    g.get_folder.return_value = folder
+    # a card's folders are an api call so they're loaded when it's published, not before this.
+    def get_cards(card_ids):
+      for card in folder.items:
+        card.guru.get_folders_for_card.assert_not_called()
+      return {"other1": make_card("other1", "Other 1"), "other2": make_card("other2", "Other 2")}
+    g.get_cards.side_effect = get_cards
+
+    publisher = ConcurrentPublisherFoldersTest(g, workers=1, metadata={
+      "published": {"type": "card", "external_id": "p1", "title": "Published", "slug": "Tbbqo5pc"}
+    })
+    publisher.publish_folder(folder)
+
+    # the cards in the folder and the published one weren't loaded and the others were loaded in one call.
+    g.get_cards.assert_called_once_with(["other1", "other2", "missing"])
+    g.get_card.assert_not_called()
+    self.assertEqual(publisher.calls, [
+      "create folder First",
+      "get external url Card 2",
+      "get external url Other 1",
+      "get external url Published",
+      "create card Card 1 in First",
+      "get external url Card 1",
+      "get external url Other 1",
+      "get external url Other 2",
+      "create card Card 2 in First",
+    ])
+
+  def test_publishing_changes_incrementally(self):
+    home_folder = Mock(id="home", title="Home", type="folder")
+    first = Mock(id="f1", title="First", type="folder")
+
+    def make_cards(last_modified_date):
+      return [
+        make_card("c1", "Card 1", last_modified_date=last_modified_date, folders=[home_folder]),
+        make_card("c2", "Card 2", last_modified_date=last_modified_date, folders=[first]),
+        make_card("c3", "Card 3", last_modified_date=last_modified_date, folders=[home_folder, first])
+      ]
+
+    cards = make_cards("2021-01-01")
+    home_folder.items = [first, cards[0], cards[2]]
+    first.items = [cards[1], cards[2]]
+    g = Mock()
+    g.get_collection.return_value = Mock(id="coll", title="Engineering")
+    g.get_home_folder.return_value = home_folder
+    g.get_folder.return_value = first
+    g.get_folders.return_value = [first]
+
+    # we haven't published this collection before so we publish all of it.
+    publisher = ConcurrentPublisherFoldersTest(g, workers=1)
+    publisher.publish_collection("Engineering", incremental=True)
+    self.assertEqual(publisher.calls, [
+      "create folder First",
+      "create card Card 2 in First",
+      "create card Card 3 in First",
+      "create card Card 1 in Home"
+    ])
+    last_published = publisher.get_last_published("coll")
+    self.assertTrue(last_published)
+    g.find_cards.assert_not_called()
+
+    # the next time it runs, we only load the folders the changed cards are in. cards in the
+    # home folder are published there and it's not loaded like the other folders.
+    cards = make_cards("2021-02-01")
+    for card in cards:
+      card.content = "<p>New content</p>"
+    g.get_folder.reset_mock()
+    g.find_cards.return_value = cards
+    publisher = ConcurrentPublisherFoldersTest(g, workers=1, metadata=publisher.store.data)
+    publisher.publish_collection("Engineering", incremental=True)
+    g.find_cards.assert_called_once_with(collection="coll", last_modified_after=last_published)
+    g.get_folder.assert_called_once_with("f1", g.get_collection.return_value)
+    self.assertEqual(publisher.calls, [
+      "update card Card 1 in Home",
+      "update card Card 2 in First",
+      "update card Card 3 in First"
+    ])
+    self.assertGreaterEqual(publisher.get_last_published("coll"), last_published)
+
+    # card 1 was deleted, we find that by listing the collection's cards.
+    # folder 2 isn't in the collection's list of folders anymore so it's deleted too.
+    g.find_cards.return_value = []
+    g.iter_cards.return_value = cards[1:]
+    publisher = ConcurrentPublisherFoldersTest(g, workers=1, metadata=publisher.store.data)
+    publisher.store.set("f2", {"type": "folder", "external_id": "folder-f2"})
+    publisher.publish_collection("Engineering", incremental=True)
+    publisher.process_deletions()
+    g.iter_cards.assert_called_once_with(collection="coll")
+    g.get_folders.assert_called_with("coll")
+    self.assertEqual(sorted(publisher.calls), ["delete card card-c1", "delete folder folder-f2"])
+    self.assertEqual(sorted(publisher.store.keys()), ["c2", "c3", "coll", "f1"])
+
+  def test_incremental_publishing_after_a_failure(self):
+    folder = Mock(id="f1", title="First", type="folder", items=[])
+    g = Mock()
+    g.get_collection.return_value = Mock(id="coll", title="Engineering")
+    g.get_home_folder.return_value = Mock(id="home", title="Home", items=[])
+    g.get_folder.return_value = folder
+    g.find_cards.return_value = [make_card("c1", "Card 1", folders=[folder])]
+    g.get_folders.return_value = [folder]
+
+    # if a card isn't published we look for changes from the same time next time.
+    for workers in [1, 4]:
+      publisher = ConcurrentPublisherFoldersTest(g, workers=workers, metadata={
+        "coll": {"last_published": "2021-01-15"},
+        "c1": {"type": "card", "external_id": "card-c1", "last_updated": "2021-01-01"}
+      })
+      publisher.fail_updates = True
+      publisher.publish_collection("Engineering", incremental=True)
+      self.assertEqual(publisher.calls, ["create folder First", "update card Card 1 in First"])
+      self.assertEqual(publisher.get_last_published("coll"), "2021-01-15")
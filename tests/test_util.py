@@ -7,8 +7,14 @@ import responses
 
 import guru
 
+from guru.bundle import clean_up_html
 from tests.util import use_guru, get_calls
 
+try:
+  import lxml
+except ImportError:
+  lxml = None
+
 def read_html(filename):
   with open(filename) as file_in:
     return file_in.read()
@@ -188,3 +194,54 @@ class TestUtil(unittest.TestCase):
       "method": "POST",
       "url": "https://www.example.com/http_post"
     }])
+
+  def test_html_parser_settings(self):
+    self.assertEqual(guru.Guru(silent=True).html_parser, "html.parser")
+    self.assertEqual(guru.Guru(silent=True, html_parser="auto").html_parser, "lxml" if lxml else "html.parser")
+    with self.assertRaises(ValueError):
+      guru.Guru(silent=True, html_parser="html5lib")
+
+    # bundles use the guru object's parser unless you pass one.
+    g = guru.Guru(silent=True, html_parser="auto")
+    self.assertEqual(g.bundle("test_html_parser_settings").html_parser, g.html_parser)
+    self.assertEqual(g.bundle("test_html_parser_settings", html_parser="html.parser").html_parser, "html.parser")
+
+  @unittest.skipUnless(lxml, "lxml isn't installed")
+  def test_html_parsers_give_the_same_results(self):
+    samples = [
+      read_html("tests/example.html"),
+      "card content",
+      "  text with <b>bold</b> and a tail ",
+      "<p>one</p>\n<p>two<br>three</p>",
+      "<p>&amp; &lt; &nbsp; \u00e9</p>",
+      "<ul><li>one<ul><li>two</li></ul></li></ul>",
+      "<table><tr><td colspan=\"2\">cell</td></tr></table>",
+      "<p><img src=\"https://www.example.com/image.png\"><iframe src=\"https://www.example.com/embed\"></iframe></p>",
+      "<pre><code>line 1\n  line 2</code></pre>",
+      "<div class=\"ghq-card-content__markdown\" data-ghq-card-content-type=\"MARKDOWN\" data-ghq-card-content-markdown-content=\"%2A%2Abold%2A%2A\"><p><strong>bold</strong></p></div>"
+    ]
+    for html in samples:
+      self.assertEqual(str(guru.parse_html(html, "lxml")), str(guru.parse_html(html, "html.parser")))
+      self.assertEqual(clean_up_html(html, "lxml"), clean_up_html(html, "html.parser"))
+
+      card1 = guru.Card({"content": html}, guru=guru.Guru(silent=True))
+      card2 = guru.Card({"content": html}, guru=guru.Guru(silent=True, html_parser="lxml"))
+      self.assertEqual(str(card1.doc), str(card2.doc))
+      self.assertEqual(sorted(card1.find_urls()), sorted(card2.find_urls()))
+
+  @unittest.skipUnless(lxml, "lxml isn't installed")
+  def test_html_parsers_fix_broken_html_differently(self):
+    # lxml closes tags the way a browser would and html.parser nests them.
+    samples = [
+      ("<p>one<p>two</p></p>", "<p>one</p><p>two</p>", "<p>one<p>two</p></p>"),
+      ("<ul><li>one<li>two</ul>", "<ul><li>one</li><li>two</li></ul>", "<ul><li>one<li>two</li></li></ul>"),
+      ("<select><option>a<option>b</select>", "<select><option>a</option><option>b</option></select>",
+       "<select><option>a<option>b</option></option></select>")
+    ]
+    for html, lxml_html, html_parser_html in samples:
+      self.assertEqual(str(guru.parse_html(html, "lxml")), lxml_html)
+      self.assertEqual(str(guru.parse_html(html, "html.parser")), html_parser_html)
+      self.assertNotEqual(clean_up_html(html, "lxml"), clean_up_html(html, "html.parser"))
+
+    # either way, a fragment isn't wrapped in <html> and <body> tags.
+    self.assertEqual(str(guru.parse_html("text <b>bold</b>", "lxml")), "text <b>bold</b>")
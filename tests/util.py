@@ -21,9 +21,13 @@ def get_calls():
       "url": call.request.url
     }
     if call.request.method != "GET" and call.request.body:
+      body = call.request.body
+      # file uploads are streamed so we read the whole body to check it.
+      if not isinstance(body, (str, bytes)):
+        body = b"".join(body)
       try:
-        c["body"] = json.loads(call.request.body)
+        c["body"] = json.loads(body)
       except:
-        c["body"] = call.request.body
+        c["body"] = body
     calls.append(c)
   return calls